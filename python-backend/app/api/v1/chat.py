@@ -1,7 +1,12 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from app.models.chat import ChatMessage, ChatResponse
+from app.core.config import settings
 from app.services.chat_service import ChatService
+from app.services.conversation_service import conversation_service
+from app.utils.streaming import SSE_HEADERS, sse_token_stream
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -25,9 +30,12 @@ async def chat_endpoint(request: ChatMessage):
         )
 
     try:
-        logger.info(f"Received chat request: {request.message[:100]}...")
+        logger.info("Received chat request: %.100s...", request.message, extra={"sample_key": "/chat"})
         response = await chat_service.process_chat(request)
-        logger.info(f"Generated response: {response.response[:100]}...")
+        logger.info("Generated response: %.100s...", response.response, extra={"sample_key": "/chat"})
+        if settings.CONVERSATION_PERSISTENCE_ENABLED and not response.error:
+            # Queued for a batched write; the response does not wait on MongoDB
+            await conversation_service.store_conversation(request.message, response.response, request.context)
         return response
         
     except Exception as e:
@@ -49,3 +57,27 @@ async def chat_endpoint(request: ChatMessage):
                 status_code=500,
                 detail="An unexpected error occurred. Please try again."
             )
+
+@router.post("/chat/stream", response_class=StreamingResponse)
+async def chat_stream_endpoint(request: ChatMessage):
+    """
+    Stream chat responses as Server-Sent Events.
+    """
+    started_at = time.perf_counter()
+    if chat_service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Chat service is not available. Please try again later."
+        )
+
+    logger.info("Received streaming chat request: %.100s...", request.message, extra={"sample_key": "/chat/stream"})
+    on_complete = None
+    if settings.CONVERSATION_PERSISTENCE_ENABLED:
+        def on_complete(text: str) -> None:
+            conversation_service.queue_conversation(request.message, text, request.context)
+
+    return StreamingResponse(
+        sse_token_stream(chat_service.stream_chat(request), started_at, on_complete=on_complete),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
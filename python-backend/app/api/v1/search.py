@@ -1,15 +1,31 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-from database.pinecone_client import index
+from app.core.cache import embedding_cache
+from app.core.config import settings
+from app.core.exceptions import DependencyUnavailable
+from app.core.metrics import errors
+from app.core.resilience import guarded
+from app.core.resources import lazy_resource
+from app.core.tracing import span
+from app.database.vector_store import vector_store
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.keyword_search import keyword_search, reciprocal_rank_fusion
 import logging
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+@lazy_resource
+def get_model():
+    """Load the sentence transformer model on first use"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(MODEL_NAME)
+
+# Coalesce concurrent queries into batched encode calls
+batcher = EmbeddingBatcher(lambda texts: get_model().encode(texts, batch_size=len(texts)).tolist())
 
 router = APIRouter()
 
@@ -20,34 +36,64 @@ class SearchQuery(BaseModel):
 class SearchResult(BaseModel):
     score: float
     text: str
+    source: str = "vector"  # "vector", "keyword" (BM25 fast path) or "hybrid" (rank fusion)
+
+async def _encode(text: str) -> list:
+    """Encode text with the shared SentenceTransformer as part of a micro-batch"""
+    return await batcher.embed(text)
+
+def _format(matches: list, source: str) -> list[SearchResult]:
+    """Format index matches as search results"""
+    with span("format"):
+        return [
+            SearchResult(
+                score=match.score,
+                text=match.metadata.get('text', 'No text available'),
+                source=source
+            )
+            for match in matches
+        ]
 
 @router.post("/search", response_model=list[SearchResult])
 async def semantic_search(search_query: SearchQuery):
     """
     Perform semantic search on the product database
+    
+    With the keyword index enabled, exact product names and SKUs are answered
+    from it directly; other queries fuse its candidates with the vector matches.
     """
     try:
-        # Generate embedding for the query
-        query_embedding = model.encode(search_query.query).tolist()
+        keyword_matches = []
+        if settings.KEYWORD_INDEX_ENABLED:
+            keyword_matches, strong = keyword_search(
+                search_query.query, max(search_query.top_k, settings.KEYWORD_CANDIDATES), endpoint="search"
+            )
+            if strong:
+                return _format(keyword_matches[:search_query.top_k], "keyword")
         
-        # Search in Pinecone
-        results = index.query(
-            vector=query_embedding,
-            top_k=search_query.top_k,
-            include_metadata=True
-        )
+        # Generate embedding for the query, reusing cached embeddings for repeated queries
+        query_embedding = await embedding_cache.get_or_embed(search_query.query, MODEL_NAME, _encode)
         
-        # Format results
-        formatted_results = [
-            SearchResult(
-                score=match.score,
-                text=match.metadata.get('text', 'No text available')
-            )
-            for match in results.matches
-        ]
+        # Search in Pinecone
+        try:
+            with span("vector"):
+                matches = await guarded("pinecone", "vector", lambda: vector_store.query(query_embedding, top_k=search_query.top_k))
+        except DependencyUnavailable as e:
+            if not keyword_matches:
+                raise
+            # Degrade to keyword results rather than failing the search
+            logger.warning(f"Serving keyword results only: {e.message}")
+            return _format(keyword_matches[:search_query.top_k], "keyword")
         
-        return formatted_results
+        if keyword_matches:
+            return _format(reciprocal_rank_fusion([matches, keyword_matches], search_query.top_k), "hybrid")
+        return _format(matches, "vector")
     
+    except DependencyUnavailable as e:
+        errors.labels(stage="search").inc()
+        logger.warning(f"Semantic search failed fast: {e.message}")
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
+        errors.labels(stage="search").inc()
         logger.error(f"Error during semantic search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import cache_hits, cache_misses, embedding_duration, errors
+from app.core.tracing import span
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after a fixed TTL.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Insert a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Remove a single entry if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different spellings share a cache key."""
+    return " ".join(text.lower().split())
+
+class EmbeddingCache(TTLCache):
+    """
+    Cache of query embeddings keyed on normalized text and embedding model.
+
+    Concurrent misses for the same key share a single embedding call.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__(maxsize, ttl)
+        self._pending: Dict[Tuple[str, str], "asyncio.Future[List[float]]"] = {}
+
+    async def get_or_embed(
+        self,
+        text: str,
+        model: str,
+        embed: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        """
+        Get the embedding for a query, computing it on a miss.
+
+        Args:
+            text: Raw query text
+            model: Name of the embedding model, part of the cache key
+            embed: Coroutine function producing the embedding for the raw text
+
+        Returns:
+            List[float]: The query embedding
+        """
+        with span("embed"):
+            return await self._get_or_embed(text, model, embed)
+
+    async def _get_or_embed(
+        self,
+        text: str,
+        model: str,
+        embed: Callable[[str], Awaitable[List[float]]]
+    ) -> List[float]:
+        key = (model, normalize_query(text))
+        while True:
+            cached = self.get(key)
+            if cached is not None:
+                cache_hits.labels(cache="embedding").inc()
+                return cached
+
+            pending = self._pending.get(key)
+            if pending is None:
+                break
+            try:
+                embedding = await asyncio.shield(pending)
+            except _EmbedAbandoned:
+                # The request computing it was cancelled; one of its waiters takes over
+                continue
+            cache_hits.labels(cache="embedding").inc()
+            return embedding
+
+        cache_misses.labels(cache="embedding").inc()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            with embedding_duration.labels(model=model).time():
+                embedding = await embed(text)
+            self.set(key, embedding)
+            future.set_result(embedding)
+            return embedding
+        except asyncio.CancelledError:
+            # Only this request was cancelled: never cancel the waiters sharing the call
+            future.set_exception(_EmbedAbandoned())
+            future.exception()
+            raise
+        except Exception as e:
+            errors.labels(stage="embedding").inc()
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+class _EmbedAbandoned(Exception):
+    """Set on a shared embedding call whose owning request was cancelled before it finished."""
+
+embedding_cache = EmbeddingCache(
+    maxsize=settings.EMBEDDING_CACHE_SIZE,
+    ttl=settings.EMBEDDING_CACHE_TTL_SECONDS
+)
@@ -0,0 +1,126 @@
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+from groq import AsyncGroq
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.core.resources import lazy_resource
+
+logger = logging.getLogger(__name__)
+
+# Upstream hosts whose HTTP connection pools are shared by every SDK client
+UPSTREAMS = ("openai", "groq")
+
+_http_clients: Dict[str, httpx.AsyncClient] = {}
+_http_clients_lock = threading.Lock()
+
+def http2_available() -> bool:
+    """Whether HTTP/2 is enabled and the optional h2 package is installed"""
+    return settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, and so the connection pool, for an upstream host.
+
+    The pool keeps up to `{UPSTREAM}_POOL_SIZE` connections open (by default
+    the dependency's concurrency limit, so every in-flight call can reuse a
+    warm connection) for HTTP_KEEPALIVE_SECONDS after their last use.
+    HTTP/2 is negotiated when h2 is installed, multiplexing calls over a
+    few TLS sessions.
+
+    Args:
+        upstream: Upstream name, e.g. "openai" or "groq"
+
+    Returns:
+        httpx.AsyncClient: The process-wide client for that upstream
+    """
+    with _http_clients_lock:
+        if upstream not in _http_clients:
+            pool_size = settings.http_pool_size(upstream)
+            _http_clients[upstream] = httpx.AsyncClient(
+                http2=http2_available(),
+                limits=httpx.Limits(
+                    max_connections=pool_size,
+                    max_keepalive_connections=pool_size,
+                    keepalive_expiry=settings.HTTP_KEEPALIVE_SECONDS,
+                ),
+                timeout=http_timeout(),
+            )
+        return _http_clients[upstream]
+
+def http_timeout() -> httpx.Timeout:
+    """Timeout for upstream HTTP calls; resilience.guarded usually gives up sooner"""
+    return httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS)
+
+@lazy_resource
+def get_openai_client() -> AsyncOpenAI:
+    """Get the shared OpenAI client, used for embeddings and chat completions."""
+    return AsyncOpenAI(
+        api_key=os.getenv("OPENAI_API_KEY"),
+        http_client=get_http_client("openai"),
+        timeout=http_timeout(),
+    )
+
+@lazy_resource
+def get_groq_client() -> AsyncGroq:
+    """Get the shared Groq client."""
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        raise RuntimeError("Failed to initialize API clients: GROQ_API_KEY environment variable not set")
+    return AsyncGroq(
+        api_key=groq_api_key,
+        http_client=get_http_client("groq"),
+        timeout=http_timeout(),
+    )
+
+_SDK_CLIENTS = {"openai": get_openai_client, "groq": get_groq_client}
+
+async def warm_connections(connections: Optional[int] = None) -> Dict[str, int]:
+    """
+    Open connections to every upstream ahead of the first request.
+
+    Each connection costs one cheap HEAD request to the API's base URL; its
+    status does not matter, only that the TCP and TLS handshakes are done
+    before a user request needs the connection.
+
+    Args:
+        connections: Connections to open per upstream, HTTP_WARM_CONNECTIONS by default
+
+    Returns:
+        Dict[str, int]: Connections opened per upstream
+    """
+    connections = settings.HTTP_WARM_CONNECTIONS if connections is None else connections
+    # One HTTP/2 connection carries every concurrent request
+    connections = min(connections, 1) if http2_available() else connections
+    opened: Dict[str, int] = {}
+
+    async def warm(upstream: str) -> None:
+        try:
+            base_url = str(_SDK_CLIENTS[upstream]().base_url)
+        except Exception as e:
+            logger.warning(f"Not warming {upstream} connections: {e}")
+            return
+        http = get_http_client(upstream)
+        results = await asyncio.gather(*(http.head(base_url) for _ in range(connections)), return_exceptions=True)
+        opened[upstream] = sum(1 for result in results if not isinstance(result, Exception))
+        logger.info(f"Warmed {opened[upstream]}/{connections} {upstream} connections")
+
+    if connections > 0:
+        await asyncio.gather(*(warm(upstream) for upstream in UPSTREAMS))
+    return opened
+
+async def close_clients() -> None:
+    """Close every shared HTTP connection pool."""
+    with _http_clients_lock:
+        clients = list(_http_clients.values())
+        _http_clients.clear()
+    get_openai_client.reset()
+    get_groq_client.reset()
+    for client in clients:
+        await client.aclose()
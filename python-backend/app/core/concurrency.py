@@ -0,0 +1,121 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Mapping, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.exceptions import DeadlineExceeded, DependencyUnavailable
+from app.core.metrics import branch_timeouts, errors
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_limits: Dict[str, asyncio.Semaphore] = {}
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Get the shared, bounded executor used for blocking SDK calls.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BLOCKING_EXECUTOR_WORKERS,
+            thread_name_prefix="botify-io"
+        )
+    return _executor
+
+def get_limit(dependency: str) -> asyncio.Semaphore:
+    """
+    Get the concurrency limit for an upstream dependency.
+
+    Args:
+        dependency: Dependency name, e.g. "openai", "groq", "pinecone" or "embedding"
+
+    Returns:
+        asyncio.Semaphore: Semaphore bounding in-flight calls to that dependency
+    """
+    if dependency not in _limits:
+        _limits[dependency] = asyncio.Semaphore(settings.dependency_concurrency(dependency))
+    return _limits[dependency]
+
+@asynccontextmanager
+async def dependency_slot(dependency: str) -> AsyncIterator[None]:
+    """
+    Hold one concurrency slot for a dependency for the duration of the block.
+    """
+    async with get_limit(dependency):
+        yield
+
+async def run_blocking(dependency: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking call on the shared executor without stalling the event loop.
+
+    Args:
+        dependency: Dependency name used to pick the concurrency limit
+        func: Blocking callable, e.g. a Pinecone index.query
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The return value of func
+    """
+    loop = asyncio.get_running_loop()
+    async with get_limit(dependency):
+        return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+async def fan_out(
+    branches: Mapping[str, Awaitable[Any]],
+    timeouts: Mapping[str, float],
+    defaults: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run independent awaitables concurrently, each under its own timeout.
+
+    A branch that times out or raises is dropped and yields its default
+    instead, so one slow dependency costs at most its own timeout and never
+    fails the others. Branches that enforce their own timeout, e.g. through
+    resilience.guarded, can be left out of `timeouts`.
+
+    Args:
+        branches: Awaitables keyed by branch name, e.g. {"retrieval": ..., "history": ...}
+        timeouts: Seconds allowed per branch name; branches without an entry are not limited
+        defaults: Results for dropped branches, None when not given
+
+    Returns:
+        Dict[str, Any]: The result or default of every branch, keyed by name
+    """
+    defaults = defaults or {}
+
+    async def run(name: str, awaitable: Awaitable[Any]) -> Any:
+        timeout = timeouts.get(name)
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            branch_timeouts.labels(branch=name).inc()
+            logger.warning("Dropped %s branch after %.0f ms", name, timeout * 1000)
+        except DeadlineExceeded as e:
+            branch_timeouts.labels(branch=name).inc()
+            logger.warning("Dropped %s branch: %s", name, e.message)
+        except DependencyUnavailable as e:
+            errors.labels(stage=name).inc()
+            logger.warning("Dropped %s branch: %s", name, e.message)
+        except Exception:
+            errors.labels(stage=name).inc()
+            logger.exception("Dropped %s branch after an error", name)
+        return defaults.get(name)
+
+    results = await asyncio.gather(*(run(name, awaitable) for name, awaitable in branches.items()))
+    return dict(zip(branches, results))
+
+def shutdown_executor() -> None:
+    """
+    Shut down the shared executor, waiting for in-flight calls.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
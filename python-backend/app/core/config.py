@@ -23,6 +23,9 @@ class Settings(BaseSettings):
     
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60 if ENVIRONMENT == "production" else 200
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()  # "memory" or "redis"
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
     
     # CORS Settings
     BACKEND_CORS_ORIGINS: List[str] = [
@@ -44,6 +47,132 @@ class Settings(BaseSettings):
     PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY", "")
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us-west-2")
     PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "botify-index")
+    
+    # Vector Backend: "pinecone" or "local" (in-process index, see database/local_index.py)
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+    
+    # Upstream Concurrency Settings
+    BLOCKING_EXECUTOR_WORKERS: int = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "32"))
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "64"))
+    GROQ_MAX_CONCURRENCY: int = int(os.getenv("GROQ_MAX_CONCURRENCY", "64"))
+    PINECONE_MAX_CONCURRENCY: int = int(os.getenv("PINECONE_MAX_CONCURRENCY", "32"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+    DEFAULT_MAX_CONCURRENCY: int = int(os.getenv("DEFAULT_MAX_CONCURRENCY", "16"))
+
+    # Query Embedding Cache
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+    EMBEDDING_CACHE_TTL_SECONDS: float = float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+
+    # Semantic Response Cache (opt-in)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    RESPONSE_CACHE_SIMILARITY: float = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95"))
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "900"))
+    RESPONSE_CACHE_MAX_PER_CONTEXT: int = int(os.getenv("RESPONSE_CACHE_MAX_PER_CONTEXT", "64"))
+
+    # Embedding Micro-batching (/search)
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "2"))
+    EMBED_MAX_BATCH_SIZE: int = int(os.getenv("EMBED_MAX_BATCH_SIZE", "32"))
+
+    # Vector Writes (store_product_embedding queues vectors and upserts them in batches)
+    VECTOR_UPSERT_BATCH_SIZE: int = int(os.getenv("VECTOR_UPSERT_BATCH_SIZE", os.getenv("UPSERT_BATCH_SIZE", "100")))
+    VECTOR_FLUSH_INTERVAL_MS: float = float(os.getenv("VECTOR_FLUSH_INTERVAL_MS", "500"))
+    VECTOR_UPSERT_CONCURRENCY: int = int(os.getenv("VECTOR_UPSERT_CONCURRENCY", os.getenv("UPSERT_WORKERS", "4")))
+    VECTOR_UPSERT_RETRIES: int = int(os.getenv("VECTOR_UPSERT_RETRIES", "3"))
+
+    # Conversation Persistence (write-behind to MongoDB)
+    CONVERSATION_PERSISTENCE_ENABLED: bool = os.getenv("CONVERSATION_PERSISTENCE_ENABLED", "false").lower() == "true"
+    CONVERSATION_BATCH_SIZE: int = int(os.getenv("CONVERSATION_BATCH_SIZE", "100"))
+    CONVERSATION_FLUSH_INTERVAL_MS: float = float(os.getenv("CONVERSATION_FLUSH_INTERVAL_MS", "500"))
+    CONVERSATION_QUEUE_SIZE: int = int(os.getenv("CONVERSATION_QUEUE_SIZE", "10000"))
+    CONVERSATION_ENQUEUE_TIMEOUT_MS: float = float(os.getenv("CONVERSATION_ENQUEUE_TIMEOUT_MS", "50"))
+    CONVERSATION_FLUSH_RETRIES: int = int(os.getenv("CONVERSATION_FLUSH_RETRIES", "3"))
+
+    # Chat Context Fan-out (each branch runs concurrently; one that overruns its timeout is left out of the prompt)
+    CONTEXT_NAMESPACES: str = os.getenv("CONTEXT_NAMESPACES", "")  # comma-separated; empty means the default namespace
+    RETRIEVAL_TIMEOUT_MS: float = float(os.getenv("RETRIEVAL_TIMEOUT_MS", "1500"))
+    NAMESPACE_QUERY_TIMEOUT_MS: float = float(os.getenv("NAMESPACE_QUERY_TIMEOUT_MS", "800"))
+    USER_CONTEXT_TIMEOUT_MS: float = float(os.getenv("USER_CONTEXT_TIMEOUT_MS", "150"))
+    HISTORY_TIMEOUT_MS: float = float(os.getenv("HISTORY_TIMEOUT_MS", "150"))
+    CHAT_PERSONALIZATION_ENABLED: bool = os.getenv("CHAT_PERSONALIZATION_ENABLED", "false").lower() == "true"
+    CHAT_HISTORY_TURNS: int = int(os.getenv("CHAT_HISTORY_TURNS", "3"))
+
+    # Keyword Search (BM25 index kept in sync by data/mongo_to_pinecone.py)
+    KEYWORD_INDEX_ENABLED: bool = os.getenv("KEYWORD_INDEX_ENABLED", "false").lower() == "true"
+    KEYWORD_FAST_PATH_STRENGTH: float = float(os.getenv("KEYWORD_FAST_PATH_STRENGTH", "0.75"))  # above 1 disables the fast path
+    KEYWORD_CANDIDATES: int = int(os.getenv("KEYWORD_CANDIDATES", "20"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+
+    # Document Store (memory-mapped vector metadata written by the ingestion scripts; enable for ingestion too)
+    DOCUMENT_STORE_ENABLED: bool = os.getenv("DOCUMENT_STORE_ENABLED", "false").lower() == "true"
+
+    # Prompt Assembly (tiktoken counts tokens when installed, otherwise they are estimated)
+    PROMPT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_CONTEXT_TOKEN_BUDGET", "1500"))
+    PROMPT_DEDUP_SIMILARITY: float = float(os.getenv("PROMPT_DEDUP_SIMILARITY", "0.8"))
+    PROMPT_TOKENIZER_ENCODING: str = os.getenv("PROMPT_TOKENIZER_ENCODING", "cl100k_base")
+
+    # LLM Gateway (providers are ranked by rolling time to first token; hedging is opt-in)
+    LLM_PROVIDERS: str = os.getenv("LLM_PROVIDERS", "groq,openai")  # preference order before latencies are known
+    GROQ_MODEL: str = os.getenv("GROQ_MODEL", "mixtral-8x7b-32768")
+    OPENAI_CHAT_MODEL: str = os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo")
+    LLM_STATS_WINDOW_SECONDS: float = float(os.getenv("LLM_STATS_WINDOW_SECONDS", "300"))
+    LLM_MIN_SAMPLES: int = int(os.getenv("LLM_MIN_SAMPLES", "10"))
+    LLM_MAX_ERROR_RATE: float = float(os.getenv("LLM_MAX_ERROR_RATE", "0.5"))
+    LLM_HEDGING_ENABLED: bool = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95"))
+    LLM_HEDGE_MIN_DELAY_MS: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_MS", "100"))
+    LLM_HEDGE_DEFAULT_DELAY_MS: float = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_MS", "1000"))
+
+    # Resilience (per-dependency circuit breakers; per-request deadline from the X-Request-Deadline-Ms header)
+    CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # consecutive failures that open a circuit
+    CIRCUIT_RECOVERY_SECONDS: float = float(os.getenv("CIRCUIT_RECOVERY_SECONDS", "30"))
+    CIRCUIT_HALF_OPEN_CALLS: int = int(os.getenv("CIRCUIT_HALF_OPEN_CALLS", "1"))
+    REQUEST_DEADLINE_MS: float = float(os.getenv("REQUEST_DEADLINE_MS", "30000"))  # default and upper bound for the header
+    EMBED_TIMEOUT_MS: float = float(os.getenv("EMBED_TIMEOUT_MS", "1000"))
+    VECTOR_TIMEOUT_MS: float = float(os.getenv("VECTOR_TIMEOUT_MS", "2000"))
+    MONGO_TIMEOUT_MS: float = float(os.getenv("MONGO_TIMEOUT_MS", "1000"))
+    LLM_TIMEOUT_MS: float = float(os.getenv("LLM_TIMEOUT_MS", "10000"))  # until the first token
+    # Fraction of the time left on the request deadline that a stage may use
+    EMBED_DEADLINE_SHARE: float = float(os.getenv("EMBED_DEADLINE_SHARE", "0.25"))
+    VECTOR_DEADLINE_SHARE: float = float(os.getenv("VECTOR_DEADLINE_SHARE", "0.4"))
+    MONGO_DEADLINE_SHARE: float = float(os.getenv("MONGO_DEADLINE_SHARE", "0.25"))
+    LLM_DEADLINE_SHARE: float = float(os.getenv("LLM_DEADLINE_SHARE", "1.0"))
+
+    # Upstream Connection Pools (one keep-alive pool per host shared by every SDK client; HTTP/2 needs h2 installed)
+    OPENAI_POOL_SIZE: int = int(os.getenv("OPENAI_POOL_SIZE", os.getenv("OPENAI_MAX_CONCURRENCY", "64")))
+    GROQ_POOL_SIZE: int = int(os.getenv("GROQ_POOL_SIZE", os.getenv("GROQ_MAX_CONCURRENCY", "64")))
+    PINECONE_POOL_SIZE: int = int(os.getenv("PINECONE_POOL_SIZE", os.getenv("PINECONE_MAX_CONCURRENCY", "32")))
+    HTTP2_ENABLED: bool = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+    HTTP_KEEPALIVE_SECONDS: float = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "120"))
+    HTTP_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+    HTTP_WARM_CONNECTIONS: int = int(os.getenv("HTTP_WARM_CONNECTIONS", "4"))  # opened per host at start-up
+
+    # Return the per-request span tree to clients sending "X-Debug-Timing: 1"
+    SERVER_TIMING_DEBUG: bool = os.getenv("SERVER_TIMING_DEBUG", "false").lower() == "true"
+
+    # Start-up
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"
+
+    def dependency_concurrency(self, dependency: str) -> int:
+        """Maximum in-flight calls allowed for an upstream dependency"""
+        return getattr(self, f"{dependency.upper()}_MAX_CONCURRENCY", self.DEFAULT_MAX_CONCURRENCY)
+
+    def http_pool_size(self, upstream: str) -> int:
+        """Connections kept open to an upstream host"""
+        return getattr(self, f"{upstream.upper()}_POOL_SIZE", self.dependency_concurrency(upstream))
+
+    def stage_timeout_ms(self, stage: str) -> float:
+        """Timeout of one request stage ("embed", "vector", "mongo" or "llm")"""
+        return getattr(self, f"{stage.upper()}_TIMEOUT_MS")
+
+    def deadline_share(self, stage: str) -> float:
+        """Fraction of the remaining request deadline a stage may use"""
+        return getattr(self, f"{stage.upper()}_DEADLINE_SHARE", 1.0)
+
+    def context_namespaces(self) -> List[str]:
+        """Vector index namespaces searched for chat context"""
+        return [namespace.strip() for namespace in self.CONTEXT_NAMESPACES.split(",")]
 
     class Config:
         case_sensitive = True
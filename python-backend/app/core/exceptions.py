@@ -71,3 +71,38 @@ class AuthorizationError(BotifyException):
             error_code="AUTHORIZATION_ERROR",
             status_code=403
         )
+
+class DependencyUnavailable(BotifyException):
+    """Raised when an upstream dependency is failing fast or out of time"""
+    def __init__(
+        self,
+        message: str,
+        error_code: str = "DEPENDENCY_UNAVAILABLE",
+        status_code: int = 503,
+        details: Optional[Dict[str, Any]] = None
+    ):
+        super().__init__(
+            message=message,
+            error_code=error_code,
+            status_code=status_code,
+            details=details
+        )
+
+class CircuitOpenError(DependencyUnavailable):
+    """Raised instead of calling a dependency whose circuit breaker is open"""
+    def __init__(self, dependency: str):
+        super().__init__(
+            message=f"{dependency} is unavailable",
+            error_code="CIRCUIT_OPEN",
+            details={"dependency": dependency}
+        )
+
+class DeadlineExceeded(DependencyUnavailable):
+    """Raised when a stage runs out of its share of the request deadline"""
+    def __init__(self, stage: str):
+        super().__init__(
+            message=f"Request deadline exceeded during {stage}",
+            error_code="DEADLINE_EXCEEDED",
+            status_code=504,
+            details={"stage": stage}
+        )
@@ -1,11 +1,160 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Mapping, Optional
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG if os.getenv("ENVIRONMENT") == "development" else logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+# Headers whose values never reach the logs
+REDACTED_HEADERS = frozenset({
+    "authorization",
+    "proxy-authorization",
+    "cookie",
+    "set-cookie",
+    "x-api-key",
+})
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sample_key"}
+
+def redact_headers(headers: Mapping[str, str]) -> Dict[str, str]:
+    """
+    Copy request headers for logging with credentials masked.
+
+    Args:
+        headers: Request headers
+
+    Returns:
+        Dict[str, str]: Headers with sensitive values replaced by "[REDACTED]"
+    """
+    return {
+        name: "[REDACTED]" if name.lower() in REDACTED_HEADERS else value
+        for name, value in headers.items()
+    }
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including fields passed via `extra`"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of verbose records.
+
+    Records logged with `extra={"sample_key": ...}` (typically the route) are
+    kept with the rate configured for that key, or `default_rate`. Warnings
+    and errors, and records without a sample key, are always kept.
+    """
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.default_rate = default_rate
+        self.rates = rates or {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None or record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(key, self.default_rate)
+        return rate >= 1.0 or random.random() < rate
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to the log listener thread without formatting them.
+
+    The stock QueueHandler formats each message on the calling thread so
+    records can be pickled; the queue here is in-process, so formatting is
+    left to the listener. When the queue is full the record is dropped
+    rather than blocking the event loop.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def _parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "route=rate,route=rate" into a dict, e.g. "/chat=0.1,/search=0.01" """
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        key, _, rate = item.rpartition("=")
+        rates[key] = float(rate)
+    return rates
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+def configure_logging() -> None:
+    """
+    Route all logging through a bounded queue drained by a background thread.
+
+    Configured from the environment:
+        LOG_LEVEL: Root level, defaults to DEBUG in development and INFO otherwise
+        LOG_FORMAT: "json" (default) or "text"
+        LOG_QUEUE_SIZE: Records buffered before new ones are dropped
+        LOG_SAMPLE_RATE: Fraction of sampled records kept by default
+        LOG_SAMPLE_RATES: Per-key overrides, e.g. "/chat=0.1,/search=0.01"
+
+    Safe to call more than once; only the first call installs handlers.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        default_level = "DEBUG" if os.getenv("ENVIRONMENT") == "development" else "INFO"
+        level = os.getenv("LOG_LEVEL", default_level).upper()
+
+        output = logging.StreamHandler(sys.stdout)
+        if os.getenv("LOG_FORMAT", "json").lower() == "text":
+            output.setFormatter(logging.Formatter(
+                "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+                datefmt="%Y-%m-%d %H:%M:%S",
+            ))
+        else:
+            output.setFormatter(JsonFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter(
+            default_rate=float(os.getenv("LOG_SAMPLE_RATE", "1.0")),
+            rates=_parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", "")),
+        ))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+configure_logging()
 
 logger = logging.getLogger(__name__)
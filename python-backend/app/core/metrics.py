@@ -0,0 +1,312 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, tuned for LLM and network round trips
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: LabelValues) -> str:
+    """Render labels in Prometheus text format, e.g. {stage="embed"}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class _Metric(ABC):
+    """Shared label handling: each distinct label set gets its own child metric."""
+    type = "untyped"
+
+    def __init__(self, name: str, description: str = "", label_values: LabelValues = ()):
+        self.name = name
+        self.description = description
+        self.label_values = label_values
+        self._children: Dict[LabelValues, "_Metric"] = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _new_child(self, label_values: LabelValues) -> "_Metric":
+        """Create the child metric for one set of label values."""
+
+    def labels(self, **labels: str) -> "_Metric":
+        """Get the child metric for a set of label values, e.g. cache_hits.labels(cache="embedding")."""
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            if key not in self._children:
+                self._children[key] = self._new_child(key)
+            return self._children[key]
+
+    def _observed(self) -> bool:
+        return True
+
+    def _series(self) -> List["_Metric"]:
+        """This metric, unless it only serves as the parent of labelled children, then its children."""
+        with self._lock:
+            children = list(self._children.values())
+        return ([self] if self._observed() or not children else []) + children
+
+    def _series_name(self) -> str:
+        return self.name + _format_labels(self.label_values)
+
+    @abstractmethod
+    def _render_samples(self) -> List[str]:
+        """Prometheus sample lines of this series."""
+
+class Histogram(_Metric):
+    """Thread-safe cumulative histogram of observed values."""
+    type = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS, label_values: LabelValues = ()):
+        super().__init__(name, description, label_values)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def _new_child(self, label_values: LabelValues) -> "Histogram":
+        return Histogram(self.name, self.description, self.buckets, label_values)
+
+    def _observed(self) -> bool:
+        return self._count > 0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+            self._count += 1
+
+    def time(self) -> "Timer":
+        """Observe the duration of the enclosed `with` or `async with` block, including when it raises."""
+        return Timer(self)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Return count, sum and cumulative bucket counts."""
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        cumulative["+Inf"] = count
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def _render_samples(self) -> List[str]:
+        snapshot = self.snapshot()
+        labels = _format_labels(self.label_values)
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.label_values + (('le', bound),))} {count}"
+            for bound, count in snapshot["buckets"].items()
+        ]
+        lines.append(f"{self.name}_sum{labels} {_format_value(snapshot['sum'])}")
+        lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+class Timer:
+    """Context manager recording elapsed time into a histogram; usable with `with` and `async with`."""
+    __slots__ = ("histogram", "started_at")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self) -> "Timer":
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started_at)
+
+    async def __aenter__(self) -> "Timer":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.__exit__(*exc_info)
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. cache hits or errors."""
+    type = "counter"
+
+    def __init__(self, name: str, description: str = "", label_values: LabelValues = ()):
+        super().__init__(name, description, label_values)
+        self._value = 0.0
+
+    def _new_child(self, label_values: LabelValues) -> "Counter":
+        return Counter(self.name, self.description, label_values)
+
+    def _observed(self) -> bool:
+        return self._value > 0
+
+    def inc(self, amount: float = 1) -> None:
+        """Increase the count."""
+        with self._lock:
+            self._value += amount
+
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"value": self._value}
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self._series_name()} {_format_value(self._value)}"]
+
+class Gauge(_Metric):
+    """Current value of something, either set explicitly or read from a callback."""
+    type = "gauge"
+
+    def __init__(self, name: str, description: str = "", label_values: LabelValues = ()):
+        super().__init__(name, description, label_values)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def _new_child(self, label_values: LabelValues) -> "Gauge":
+        return Gauge(self.name, self.description, label_values)
+
+    def set(self, value: float) -> None:
+        """Set the current value."""
+        self._value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from `function` whenever the gauge is sampled."""
+        self._function = function
+
+    def value(self) -> float:
+        return float(self._function()) if self._function is not None else self._value
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"value": self.value()}
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self._series_name()} {_format_value(self.value())}"]
+
+class MetricsRegistry:
+    """Process-wide registry of named metrics."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name: str, description: str, **kwargs) -> _Metric:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = metric_class(name, description, **kwargs)
+            metric = self._metrics[name]
+        if not isinstance(metric, metric_class):
+            raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+        return metric
+
+    def histogram(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram by name."""
+        return self._get_or_create(Histogram, name, description, buckets=buckets)
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        """Get or create a counter by name."""
+        return self._get_or_create(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        """Get or create a gauge by name."""
+        return self._get_or_create(Gauge, name, description)
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Return a snapshot of every registered metric, keyed by name and labels."""
+        with self._lock:
+            registered = list(self._metrics.values())
+        return {
+            series._series_name(): series.snapshot()
+            for metric in registered
+            for series in metric._series()
+        }
+
+    def render_prometheus(self) -> str:
+        """Render every registered metric in the Prometheus text exposition format."""
+        with self._lock:
+            registered = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in registered:
+            if metric.description:
+                lines.append(f"# HELP {metric.name} {_escape(metric.description)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for series in metric._series():
+                lines.extend(series._render_samples())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+# Per-stage latency of the request path
+embedding_duration = metrics.histogram(
+    "embedding_duration_seconds",
+    "Time spent computing query embeddings on cache misses, by model",
+)
+vector_query_duration = metrics.histogram(
+    "vector_query_duration_seconds",
+    "Time spent querying the vector index",
+)
+llm_time_to_first_token = metrics.histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from receiving a chat request to the first streamed LLM token",
+)
+llm_duration = metrics.histogram(
+    "llm_duration_seconds",
+    "Total time of an LLM completion, by provider",
+)
+mongo_operation_duration = metrics.histogram(
+    "mongo_operation_duration_seconds",
+    "Time spent in MongoDB operations, by operation",
+)
+prompt_context_tokens = metrics.histogram(
+    "prompt_context_tokens",
+    "Tokens of retrieved, page and user context placed in a prompt",
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192),
+)
+vector_upsert_batch_size = metrics.histogram(
+    "vector_upsert_batch_size",
+    "Vectors written per batched upsert",
+    buckets=(1, 10, 25, 50, 100, 200, 500, 1000),
+)
+
+cache_hits = metrics.counter("cache_hits_total", "Cache hits, by cache")
+cache_misses = metrics.counter("cache_misses_total", "Cache misses, by cache")
+errors = metrics.counter("errors_total", "Errors on the request path, by stage")
+keyword_fast_path = metrics.counter(
+    "keyword_fast_path_total",
+    "Queries answered from the keyword index without a vector search, by endpoint",
+)
+prompt_tokens_saved = metrics.counter(
+    "prompt_tokens_saved_total",
+    "Context tokens left out of prompts as near-duplicates or over the token budget",
+)
+llm_requests = metrics.counter(
+    "llm_requests_total",
+    "LLM provider requests, by provider and outcome (won, lost to a hedged request, error)",
+)
+llm_hedges = metrics.counter("llm_hedges_total", "Hedged LLM requests sent because the first token was late")
+branch_timeouts = metrics.counter(
+    "branch_timeouts_total",
+    "Concurrent request branches dropped for exceeding their timeout, by branch",
+)
+document_store_misses = metrics.counter(
+    "document_store_misses_total",
+    "Vector matches whose metadata was not in the document store and was fetched from the index",
+)
+circuit_transitions = metrics.counter(
+    "circuit_transitions_total",
+    "Circuit breaker state changes, by dependency and new state",
+)
+
+circuit_state = metrics.gauge(
+    "circuit_state",
+    "Circuit breaker state by dependency (0 closed, 1 half-open, 2 open)",
+)
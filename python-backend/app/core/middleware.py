@@ -1,111 +1,273 @@
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+import json
 import time
-import asyncio
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from app.core.config import settings
 from app.core.exceptions import RateLimitExceeded
 from app.core.logger import logger
+from app.core.rate_limiter import SlidingWindowRateLimiter, create_rate_limit_backend
+from app.core.resilience import deadline_scope
+from app.core.tracing import server_timing_header, trace_request
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.rate_limit = settings.RATE_LIMIT_PER_MINUTE
-        self.window = 60  # 1 minute window
-        self.requests: Dict[str, list] = {}
-        self._cleanup_task = asyncio.create_task(self._cleanup_old_requests())
-
-    async def _cleanup_old_requests(self):
-        while True:
-            current_time = datetime.now()
-            for ip in list(self.requests.keys()):
-                self.requests[ip] = [
-                    timestamp for timestamp in self.requests[ip]
-                    if current_time - timestamp < timedelta(seconds=self.window)
-                ]
-                if not self.requests[ip]:
-                    del self.requests[ip]
-            await asyncio.sleep(10)  # Cleanup every 10 seconds
-
-    def _get_ip(self, request: Request) -> str:
-        forwarded = request.headers.get("X-Forwarded-For")
-        if forwarded:
-            return forwarded.split(",")[0]
-        return request.client.host if request.client else "unknown"
-
-    async def dispatch(self, request: Request, call_next) -> Response:
-        # Skip rate limiting for health check
-        if request.url.path == "/health":
-            return await call_next(request)
+# Pure ASGI middleware: unlike BaseHTTPMiddleware, these never wrap the
+# response body in a new stream or spawn a task per request, so streaming
+# responses pass through untouched and headers are set on http.response.start.
 
-        ip = self._get_ip(request)
-        now = datetime.now()
+def send_with_headers(send: Send, headers: Callable[[], Dict[str, str]]) -> Send:
+    """
+    Wrap `send` so extra headers are added to the response start message.
 
-        # Initialize request list for IP if not exists
-        if ip not in self.requests:
-            self.requests[ip] = []
+    Args:
+        send: The downstream ASGI send callable
+        headers: Called once when the response starts, returns the headers to set
 
-        # Remove old requests outside the window
-        self.requests[ip] = [
-            timestamp for timestamp in self.requests[ip]
-            if now - timestamp < timedelta(seconds=self.window)
-        ]
+    Returns:
+        Send: A send callable that forwards every message unchanged apart from the headers
+    """
+    async def wrapped(message: Message) -> None:
+        if message["type"] == "http.response.start":
+            response_headers = MutableHeaders(scope=message)
+            for name, value in headers().items():
+                response_headers[name] = value
+        await send(message)
+    return wrapped
 
-        # Check rate limit
-        if len(self.requests[ip]) >= self.rate_limit:
-            logger.warning(f"Rate limit exceeded for IP: {ip}")
-            raise RateLimitExceeded()
+def client_ip(scope: Scope) -> str:
+    """Get the client IP, preferring the first X-Forwarded-For hop"""
+    for name, value in scope.get("headers", []):
+        if name == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
 
-        # Add current request
-        self.requests[ip].append(now)
+class SecurityHeadersMiddleware:
+    """Add fixed security headers (e.g. Content-Security-Policy) to every HTTP response"""
+    def __init__(self, app: ASGIApp, headers: Dict[str, str]):
+        self.app = app
+        self.headers = dict(headers)
 
-        # Process request and measure timing
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-
-        # Add custom headers
-        response.headers["X-Process-Time"] = str(process_time)
-        response.headers["X-Rate-Limit-Limit"] = str(self.rate_limit)
-        response.headers["X-Rate-Limit-Remaining"] = str(
-            self.rate_limit - len(self.requests[ip])
-        )
-        response.headers["X-Rate-Limit-Reset"] = str(
-            int(self.window - (time.time() % self.window))
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, send_with_headers(send, lambda: self.headers))
+
+class RateLimitMiddleware:
+    """Reject clients over RATE_LIMIT_PER_MINUTE with a 429 and report the limit in response headers"""
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[SlidingWindowRateLimiter] = None,
+        exempt_paths: Iterable[str] = ("/health",)
+    ):
+        self.app = app
+        self.limiter = limiter or SlidingWindowRateLimiter(
+            limit=settings.RATE_LIMIT_PER_MINUTE,
+            window=60,  # 1 minute window
+            backend=create_rate_limit_backend(),
         )
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Skip rate limiting for health check
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        ip = client_ip(scope)
+        result = await self.limiter.check(ip)
+        if not result.allowed:
+            logger.warning("Rate limit exceeded for IP: %s", ip)
+            error = RateLimitExceeded()
+            response = JSONResponse(
+                {"detail": error.message, "error_code": error.error_code},
+                status_code=error.status_code,
+                headers={
+                    "Retry-After": str(int(result.reset_after) + 1),
+                    "X-Rate-Limit-Limit": str(result.limit),
+                    "X-Rate-Limit-Remaining": "0",
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        start_time = time.time()
+        await self.app(scope, receive, send_with_headers(send, lambda: {
+            "X-Process-Time": str(time.time() - start_time),
+            "X-Rate-Limit-Limit": str(result.limit),
+            "X-Rate-Limit-Remaining": str(result.remaining),
+            "X-Rate-Limit-Reset": str(int(result.reset_after)),
+        }))
 
-        return response
+class RequestLoggingMiddleware:
+    """Log each request and, once the body has been sent, its status and duration"""
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next) -> Response:
         start_time = time.time()
-        
-        # Log request
+        path = scope["path"]
+        client = scope.get("client")
+
+        # Log request; sampled per route via LOG_SAMPLE_RATES
         logger.info(
-            f"Request: {request.method} {request.url.path} "
-            f"Client: {request.client.host if request.client else 'unknown'}"
+            "Request: %s %s", scope["method"], path,
+            extra={"client": client[0] if client else "unknown", "sample_key": path}
         )
-        
+
+        status_code = 500
+
+        async def logging_send(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Log response
+                logger.info(
+                    "Response: %s %s", status_code, path,
+                    extra={"status_code": status_code, "duration_ms": round((time.time() - start_time) * 1000, 1), "sample_key": path}
+                )
+
         try:
-            response = await call_next(request)
-            process_time = time.time() - start_time
-            
-            # Log response
-            logger.info(
-                f"Response: {response.status_code} "
-                f"Process Time: {process_time:.3f}s "
-                f"Path: {request.url.path}"
-            )
-            
-            return response
+            await self.app(scope, receive, logging_send)
         except Exception as e:
             process_time = time.time() - start_time
             logger.error(
-                f"Error: {str(e)} "
-                f"Process Time: {process_time:.3f}s "
-                f"Path: {request.url.path}",
+                "Error: %s Path: %s", e, path,
+                extra={"duration_ms": round(process_time * 1000, 1)},
                 exc_info=True
             )
             raise
+
+class ServerTimingMiddleware:
+    """
+    Add a Server-Timing header breaking traced requests down by stage.
+
+    Stages are the span() blocks entered while handling the request, e.g.
+    embed, vector, format, llm and db. When `debug` is enabled and the client
+    sends "X-Debug-Timing: 1", JSON responses also carry the span tree under
+    a "timing" key (non-object bodies are wrapped as {"data": ..., "timing": ...}).
+    Streaming responses only get the header, covering the stages before the
+    first byte.
+    """
+    def __init__(self, app: ASGIApp, paths: Iterable[str], debug: bool = False):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        with trace_request(scope["path"]) as root:
+            debug = self.debug and (b"x-debug-timing", b"1") in scope.get("headers", [])
+            if not debug:
+                await self.app(scope, receive, send_with_headers(
+                    send, lambda: {"Server-Timing": server_timing_header(root)}
+                ))
+                return
+
+            start_message: Optional[Message] = None
+            body: List[bytes] = []
+
+            async def buffering_send(message: Message) -> None:
+                nonlocal start_message
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    if not headers.get("content-type", "").startswith("application/json"):
+                        # Not JSON (e.g. an event stream): pass through with the header only
+                        headers["Server-Timing"] = server_timing_header(root)
+                        start_message = message
+                        await send(message)
+                        return
+                    start_message = {**message, "buffered": True}
+                    return
+                if not (start_message or {}).get("buffered"):
+                    await send(message)
+                    return
+                body.append(message.get("body", b""))
+                if message.get("more_body", False):
+                    return
+
+                payload = json.loads(b"".join(body) or b"null")
+                timing = root.to_dict(root.start)
+                payload = {**payload, "timing": timing} if isinstance(payload, dict) else {"data": payload, "timing": timing}
+                encoded = json.dumps(payload).encode()
+
+                response_start = {key: value for key, value in start_message.items() if key != "buffered"}
+                headers = MutableHeaders(scope=response_start)
+                headers["Content-Length"] = str(len(encoded))
+                headers["Server-Timing"] = server_timing_header(root)
+                await send(response_start)
+                await send({"type": "http.response.body", "body": encoded})
+
+            await self.app(scope, receive, buffering_send)
+
+class DeadlineMiddleware:
+    """
+    Give each request a deadline that dependency calls are budgeted against.
+
+    Clients may send "X-Request-Deadline-Ms" with the milliseconds they are
+    willing to wait; it can shorten but never extend `default_ms`. The
+    deadline covers everything up to the first LLM token; tokens already
+    streaming are not cut off.
+    """
+    def __init__(self, app: ASGIApp, default_ms: float):
+        self.app = app
+        self.default_ms = default_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget_ms = self.default_ms
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-deadline-ms":
+                try:
+                    budget_ms = min(budget_ms, max(0.0, float(value)))
+                except ValueError:
+                    pass
+                break
+
+        with deadline_scope(budget_ms / 1000):
+            await self.app(scope, receive, send)
+
+def add_middleware_stack(
+    app,
+    security_headers: Optional[Dict[str, str]] = None,
+    rate_limit: bool = True,
+    request_logging: bool = True
+) -> None:
+    """
+    Register the core middleware on a Starlette/FastAPI app in a fixed order.
+
+    Security headers are outermost so they are also set on rejected
+    requests, and request logging wraps rate limiting so rejections are logged.
+
+    Args:
+        app: The application to configure
+        security_headers: Headers to add to every response, if any
+        rate_limit: Whether to enable per-IP rate limiting
+        request_logging: Whether to log requests and responses
+    """
+    # add_middleware wraps outermost last, so register innermost first
+    layers: List[Tuple[type, Dict]] = []
+    if rate_limit:
+        layers.append((RateLimitMiddleware, {}))
+    if request_logging:
+        layers.append((RequestLoggingMiddleware, {}))
+    if security_headers:
+        layers.append((SecurityHeadersMiddleware, {"headers": security_headers}))
+    for middleware_class, options in layers:
+        app.add_middleware(middleware_class, **options)
@@ -1,7 +1,13 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
 from fastapi import Request
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
+from app.core.config import settings
+
 # Create a limiter instance
 limiter = Limiter(key_func=get_remote_address)
 
@@ -12,3 +18,139 @@ def rate_limit(calls_per_minute: int = 30):
     Default: 30 calls per minute
     """
     return limiter.limit(f"{calls_per_minute}/minute")
+
+class RateLimitResult(NamedTuple):
+    """Outcome of a rate limit check"""
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float
+
+class InMemoryRateLimitBackend:
+    """
+    Per-process sliding-window counters.
+
+    Each key holds only the current and previous window counts, and at most
+    `max_keys` keys are kept (least recently seen keys are evicted first), so
+    memory is bounded regardless of traffic.
+    """
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, window_id: int, window: int) -> Tuple[int, int]:
+        """
+        Count a request in the given window.
+
+        Returns:
+            Tuple[int, int]: (count in the current window, count in the previous window)
+        """
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = [window_id, 0, 0]
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+            if counter[0] != window_id:
+                # Roll the window; anything older than the previous window counts as zero
+                counter[2] = counter[1] if counter[0] == window_id - 1 else 0
+                counter[1] = 0
+                counter[0] = window_id
+
+        counter[1] += 1
+        return counter[1], counter[2]
+
+    async def undo(self, key: str, window_id: int) -> None:
+        """Take back a request counted by hit() in the given window."""
+        counter = self._counters.get(key)
+        if counter is not None and counter[0] == window_id and counter[1] > 0:
+            counter[1] -= 1
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+class RedisRateLimitBackend:
+    """
+    Sliding-window counters shared by every worker through Redis.
+
+    Works with any client exposing the redis.asyncio pipeline API, so an
+    in-process stand-in can replace the server in tests.
+    """
+    def __init__(self, client, prefix: str = "ratelimit"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisRateLimitBackend":
+        """Create a backend connected to the Redis server at `url`"""
+        import redis.asyncio as redis
+        return cls(redis.from_url(url), **kwargs)
+
+    async def hit(self, key: str, window_id: int, window: int) -> Tuple[int, int]:
+        """
+        Count a request in the given window with one round trip.
+
+        Returns:
+            Tuple[int, int]: (count in the current window, count in the previous window)
+        """
+        current_key = f"{self.prefix}:{key}:{window_id}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incr(current_key)
+        pipe.expire(current_key, window * 2)
+        pipe.get(f"{self.prefix}:{key}:{window_id - 1}")
+        current, _, previous = await pipe.execute()
+        return int(current), int(previous or 0)
+
+    async def undo(self, key: str, window_id: int) -> None:
+        """Take back a request counted by hit() in the given window."""
+        await self.client.decr(f"{self.prefix}:{key}:{window_id}")
+
+class SlidingWindowRateLimiter:
+    """
+    Constant-time sliding-window-counter rate limiter.
+
+    The request rate is estimated as the current window's count plus the
+    previous window's count weighted by how much of it still overlaps the
+    sliding window. Each check is O(1) and needs two integers per key.
+    """
+    def __init__(self, limit: int, window: int = 60, backend=None):
+        self.limit = limit
+        self.window = window
+        self.backend = backend if backend is not None else InMemoryRateLimitBackend()
+
+    async def check(self, key: str, now: Optional[float] = None) -> RateLimitResult:
+        """
+        Decide whether a request for `key` is allowed, counting it only if it is.
+
+        Rejected requests do not count towards the limit, so a client
+        retrying above it is let back in once its earlier requests age out.
+
+        Args:
+            key: Client identifier, e.g. the IP address
+            now: Current UNIX time, defaults to time.time()
+
+        Returns:
+            RateLimitResult: Whether the request is allowed plus header values
+        """
+        now = time.time() if now is None else now
+        window_id, offset = divmod(now, self.window)
+        current, previous = await self.backend.hit(key, int(window_id), self.window)
+
+        estimated = previous * (1 - offset / self.window) + current
+        allowed = estimated <= self.limit
+        if not allowed:
+            await self.backend.undo(key, int(window_id))
+        return RateLimitResult(
+            allowed=allowed,
+            limit=self.limit,
+            remaining=max(0, int(self.limit - estimated)),
+            reset_after=self.window - offset,
+        )
+
+def create_rate_limit_backend():
+    """Create the backend selected by RATE_LIMIT_BACKEND ("memory" or "redis")"""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisRateLimitBackend.from_url(settings.RATE_LIMIT_REDIS_URL)
+    return InMemoryRateLimitBackend(max_keys=settings.RATE_LIMIT_MAX_KEYS)
@@ -0,0 +1,227 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.exceptions import CircuitOpenError, DeadlineExceeded
+from app.core.metrics import circuit_state, circuit_transitions
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+class CircuitBreaker:
+    """
+    Fail fast on a dependency that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    are refused without touching the dependency. Once `recovery_timeout`
+    seconds have passed it is half-open: up to `half_open_max_calls` trial
+    calls go through, the first success closes it again and a failure
+    re-opens it.
+
+    Args:
+        name: Dependency name, used for metrics and logs
+        failure_threshold: Consecutive failures that open the circuit
+        recovery_timeout: Seconds the circuit stays open before a trial call
+        half_open_max_calls: Trial calls allowed at once while half-open
+    """
+    def __init__(self, name: str, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+        circuit_state.labels(dependency=name).set(_STATE_VALUES[CLOSED])
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the recovery timeout has passed"""
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == self._state:
+            return
+        logger.warning("Circuit for %s is now %s", self.name, state)
+        self._state = state
+        self._trials = 0
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._failures = 0
+        circuit_state.labels(dependency=self.name).set(_STATE_VALUES[state])
+        circuit_transitions.labels(dependency=self.name, state=state).inc()
+
+    def available(self) -> bool:
+        """Whether a call would currently be allowed, without taking a trial slot."""
+        with self._lock:
+            self._refresh()
+            return self._state == CLOSED or (self._state == HALF_OPEN and self._trials < self.half_open_max_calls)
+
+    def allow(self) -> bool:
+        """Ask to make a call; every allowed call must end in record_success, record_failure or release."""
+        with self._lock:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._trials < self.half_open_max_calls:
+                self._trials += 1
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def release(self) -> None:
+        """Give back a trial slot for a call that was cancelled before it had an outcome."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials:
+                self._trials -= 1
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(dependency: str) -> CircuitBreaker:
+    """
+    Get the circuit breaker for an upstream dependency.
+
+    Args:
+        dependency: Dependency name, e.g. "openai", "groq", "pinecone" or "mongo"
+
+    Returns:
+        CircuitBreaker: The process-wide breaker for that dependency
+    """
+    with _breakers_lock:
+        if dependency not in _breakers:
+            _breakers[dependency] = CircuitBreaker(
+                dependency,
+                failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+                recovery_timeout=settings.CIRCUIT_RECOVERY_SECONDS,
+                half_open_max_calls=settings.CIRCUIT_HALF_OPEN_CALLS,
+            )
+        return _breakers[dependency]
+
+# Absolute time.monotonic() deadline of the request being handled, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("deadline", default=None)
+
+@contextmanager
+def deadline_scope(seconds: float) -> Iterator[None]:
+    """
+    Give the work done inside the block `seconds` in total.
+
+    A scope nested inside another cannot extend the outer deadline.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None outside a deadline scope."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def stage_timeout(stage: str, limit: Optional[float] = None) -> float:
+    """
+    Seconds a stage may take: its own timeout, capped by its share of the time left.
+
+    Args:
+        stage: "embed", "vector", "llm" or "mongo"
+        limit: Tighter timeout in seconds set by the caller, if any
+
+    Raises:
+        DeadlineExceeded: If the request has no time left
+    """
+    timeout = settings.stage_timeout_ms(stage) / 1000
+    if limit is not None:
+        timeout = min(timeout, limit)
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded(stage)
+    return min(timeout, left * settings.deadline_share(stage))
+
+async def guarded(
+    dependency: str,
+    stage: str,
+    call: Callable[[], Awaitable[T]],
+    timeout: Optional[float] = None
+) -> T:
+    """
+    Call a dependency through its circuit breaker and within the stage's time budget.
+
+    Errors and timeouts count against the breaker, except timeouts caused by
+    a short request deadline rather than the dependency's own timeout, so one
+    impatient client cannot open the circuit for everyone.
+
+    Args:
+        dependency: Dependency name, used to pick the circuit breaker
+        stage: Request stage, used to pick the timeout and deadline share
+        call: Zero-argument coroutine function making the call; not called when the circuit is open
+        timeout: Tighter timeout in seconds than the stage's own, if any
+
+    Returns:
+        The result of the call
+
+    Raises:
+        CircuitOpenError: If the dependency's circuit is open
+        DeadlineExceeded: If the call did not finish within its budget
+    """
+    own_timeout = settings.stage_timeout_ms(stage) / 1000
+    if timeout is not None:
+        own_timeout = min(own_timeout, timeout)
+    budget = stage_timeout(stage, own_timeout)
+    breaker = get_breaker(dependency)
+    if not breaker.allow():
+        raise CircuitOpenError(dependency)
+    try:
+        result = await asyncio.wait_for(call(), budget)
+    except asyncio.TimeoutError:
+        if budget < own_timeout:
+            breaker.release()
+        else:
+            breaker.record_failure()
+        raise DeadlineExceeded(stage) from None
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
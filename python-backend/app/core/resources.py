@@ -0,0 +1,93 @@
+import asyncio
+import functools
+import threading
+import time
+from typing import Any, Callable, Dict, TypeVar
+
+from app.core.concurrency import run_blocking
+from app.core.logger import logger
+
+T = TypeVar("T")
+
+def lazy_resource(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Turn a zero-argument factory into a thread-safe, create-once getter.
+
+    The resource is built on the first call, from whichever thread makes it,
+    instead of when the defining module is imported. A failed build is not
+    cached, so the next call retries.
+    """
+    lock = threading.Lock()
+    instance: Dict[str, T] = {}
+
+    @functools.wraps(factory)
+    def get() -> T:
+        if "value" not in instance:
+            with lock:
+                if "value" not in instance:
+                    instance["value"] = factory()
+        return instance["value"]
+
+    def reset() -> None:
+        with lock:
+            instance.clear()
+
+    get.is_initialized = lambda: "value" in instance
+    get.reset = reset
+    return get
+
+async def warm_up(initializers: Dict[str, Callable[[], Any]]) -> Dict[str, float]:
+    """
+    Run blocking resource initializers concurrently on the shared executor.
+
+    Failures are logged rather than raised so that one unavailable dependency
+    does not prevent the worker from starting; it is retried on first use.
+
+    Args:
+        initializers: Mapping of resource name to zero-argument initializer
+
+    Returns:
+        Dict[str, float]: Seconds spent initializing each resource that succeeded
+    """
+    durations: Dict[str, float] = {}
+
+    async def _run(name: str, initializer: Callable[[], Any]) -> None:
+        started_at = time.perf_counter()
+        try:
+            await run_blocking("warmup", initializer)
+        except Exception as e:
+            logger.error(f"Warm-up of {name} failed: {e}")
+            return
+        durations[name] = time.perf_counter() - started_at
+        logger.info(f"Warmed up {name} in {durations[name] * 1000:.0f}ms")
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(_run(name, initializer) for name, initializer in initializers.items()))
+    logger.info(f"Warm-up finished in {(time.perf_counter() - started_at) * 1000:.0f}ms")
+    return durations
+
+_refreshes: Dict[str, "asyncio.Task"] = {}
+
+def refresh_in_background(name: str, refresh: Callable[[], Any]) -> None:
+    """
+    Run a resource's blocking refresh on the shared executor, unless one is already running.
+
+    Callers keep using the resource as it is until the refresh swaps in the
+    newer copy. Outside an event loop (scripts, tests) the refresh runs inline.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        refresh()
+        return
+    running = _refreshes.get(name)
+    if running is not None and not running.done():
+        return
+
+    async def _run() -> None:
+        try:
+            await run_blocking("refresh", refresh)
+        except Exception as e:
+            logger.error(f"Refresh of {name} failed: {e}")
+
+    _refreshes[name] = loop.create_task(_run())
@@ -0,0 +1,96 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+class Span:
+    """A timed stage of a request; child spans are stages nested inside it."""
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str, start: float):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """Render the span tree with offsets relative to `origin`, in milliseconds."""
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            "children": [child.to_dict(origin) for child in self.children],
+        }
+
+# The span new stages attach to. Tasks copy the context they are created in,
+# so concurrent branches of one request each nest under their own parent.
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+@contextmanager
+def trace_request(name: str = "request") -> Iterator[Span]:
+    """
+    Collect spans for the enclosed request handling.
+
+    Yields:
+        Span: The root span, finished when the block exits
+    """
+    root = Span(name, time.perf_counter())
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        root.end = time.perf_counter()
+        _current_span.reset(token)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time the enclosed block as a stage of the current request.
+
+    Does nothing outside a traced request, so it is safe to use anywhere.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield
+        return
+
+    child = Span(name, time.perf_counter())
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+def stage_durations(root: Span) -> Dict[str, float]:
+    """
+    Total time per stage name, in seconds.
+
+    A stage nested inside a stage of the same name is not counted twice.
+    """
+    totals: Dict[str, float] = {}
+
+    def visit(node: Span, enclosing: frozenset) -> None:
+        for child in node.children:
+            if child.name not in enclosing:
+                totals[child.name] = totals.get(child.name, 0.0) + child.duration
+            visit(child, enclosing | {child.name})
+
+    visit(root, frozenset())
+    return totals
+
+def server_timing_header(root: Span) -> str:
+    """
+    Format the stages of a trace as a Server-Timing header value.
+
+    Example:
+        embed;dur=12.4, vector;dur=30.1, llm;dur=812.0, total;dur=860.2
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stage_durations(root).items()]
+    entries.append(f"total;dur={root.duration * 1000:.1f}")
+    return ", ".join(entries)
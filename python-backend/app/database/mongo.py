@@ -1,6 +1,7 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from app.core.config import settings
 from app.core.logger import logger
+from app.models.conversation import Conversation
 
 class MongoDB:
     client: AsyncIOMotorClient = None
@@ -40,16 +41,14 @@ class MongoDB:
     
     async def store_conversation(self, user_message: str, bot_response: str):
         """
-        Store a conversation in MongoDB.
+        Queue a conversation for a batched write to MongoDB.
         """
+        # Imported here to avoid a circular import; the writer uses this client
+        from app.services.conversation_writer import conversation_writer
         try:
-            collection = self.get_collection(settings.MONGODB_COLLECTION)
-            await collection.insert_one({
-                "user_message": user_message,
-                "bot_response": bot_response,
-                "timestamp": datetime.utcnow()
-            })
-            logger.info("Stored conversation in MongoDB")
+            await conversation_writer.submit(
+                Conversation(user_message=user_message, bot_response=bot_response)
+            )
         except Exception as e:
             logger.error(f"Error storing conversation: {e}")
             # Don't raise the exception to avoid interrupting chat flow
@@ -1,72 +1,238 @@
-from pinecone import Pinecone, ServerlessSpec
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Set
+
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.concurrency import run_blocking
+from app.core.metrics import document_store_misses, errors, vector_query_duration, vector_upsert_batch_size
+from app.core.resources import lazy_resource
+from database.document_store import DocumentStore, open_document_store
+from database.pinecone_client import get_index
 
-class VectorStore:
-    def __init__(self):
-        self.pc = None
-        self.index = None
-        self.init_pinecone()
-    
-    def init_pinecone(self):
+@lazy_resource
+def get_document_store() -> DocumentStore:
+    """Open the document store written by the ingestion scripts"""
+    return open_document_store()
+
+class VectorMatch(NamedTuple):
+    """One vector query match: the vector id, its similarity score and its metadata, if requested."""
+    id: str
+    score: float
+    metadata: Optional[Dict[str, Any]] = None
+
+class VectorWriter:
+    """
+    Auto-batching upsert queue for one vector index.
+
+    Vectors added with add() are held until `max_batch_size` of them are
+    pending, or `flush_interval_ms` after the first one arrived, and then
+    written with a single upsert. Writing the same id twice before a flush
+    sends only the latest vector. At most `max_in_flight` batches are written
+    at once; add() waits for one of them to finish beyond that, so a fast
+    producer cannot queue up unbounded memory.
+
+    Args:
+        upsert: Blocking callable writing a list of vector dicts, run on the shared executor
+        max_batch_size: Vectors per upsert
+        flush_interval_ms: Longest a vector waits for its batch to fill
+        max_in_flight: Batches written concurrently
+        max_retries: Retries of a failed upsert, with exponential backoff
+    """
+    def __init__(
+        self,
+        upsert: Callable[[List[Dict[str, Any]]], Any],
+        max_batch_size: int = settings.VECTOR_UPSERT_BATCH_SIZE,
+        flush_interval_ms: float = settings.VECTOR_FLUSH_INTERVAL_MS,
+        max_in_flight: int = settings.VECTOR_UPSERT_CONCURRENCY,
+        max_retries: int = settings.VECTOR_UPSERT_RETRIES
+    ):
+        self.upsert = upsert
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def add(self, vector: Dict[str, Any]) -> None:
         """
-        Initialize Pinecone client and index.
+        Queue one vector ({"id", "values", "metadata"}) for the next batch.
+
+        Returns as soon as the vector is queued; call flush() to wait for it to be written.
         """
-        try:
-            # Initialize Pinecone
-            self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-            
-            # Check if index exists
-            existing_indexes = self.pc.list_indexes()
-            
-            # Create index if it doesn't exist
-            if settings.PINECONE_INDEX_NAME not in existing_indexes:
-                self.pc.create_index(
-                    name=settings.PINECONE_INDEX_NAME,
-                    dimension=1536,  # OpenAI text-embedding-3-small dimension
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-west-2")
-                )
-                logger.info(f"Created Pinecone index: {settings.PINECONE_INDEX_NAME}")
-            
-            # Get index
-            self.index = self.pc.Index(settings.PINECONE_INDEX_NAME)
-            logger.info("Successfully initialized Pinecone")
-            
-        except Exception as e:
-            logger.error(f"Error initializing Pinecone: {e}")
-            raise
-    
-    async def store_product_embedding(self, product_id: str, embedding: list, metadata: dict):
+        self._pending[vector["id"]] = vector
+        if len(self._pending) >= self.max_batch_size:
+            while len(self._in_flight) >= self.max_in_flight:
+                await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+            self._start_batch()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._start_batch)
+
+    def _start_batch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending = {}
+        task = asyncio.create_task(self._write(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        """Upsert one batch, retrying failures; a batch that keeps failing is reported by the next flush()"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await run_blocking("pinecone", self.upsert, batch)
+                self.written += len(batch)
+                self.batches += 1
+                vector_upsert_batch_size.observe(len(batch))
+                return
+            except Exception as e:
+                errors.labels(stage="vector_upsert").inc()
+                if attempt == self.max_retries:
+                    self.failed += len(batch)
+                    self._error = e
+                    logger.error(f"Dropping {len(batch)} vectors after {attempt + 1} upsert attempts: {e}")
+                    return
+                delay = min(5.0, 0.1 * 2 ** attempt)
+                logger.warning(f"Vector upsert failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def flush(self) -> None:
         """
-        Store product embedding in Pinecone.
+        Write everything pending and wait for all batches in flight.
+
+        Raises:
+            Exception: The last upsert error since the previous flush, if any batch was dropped
         """
-        try:
-            self.index.upsert(
-                vectors=[{
-                    "id": product_id,
-                    "values": embedding,
-                    "metadata": metadata
-                }]
-            )
-            logger.info(f"Stored embedding for product: {product_id}")
-        except Exception as e:
-            logger.error(f"Error storing embedding: {e}")
-            raise
-    
-    async def search_similar_products(self, query_embedding: list, top_k: int = 5):
+        self._start_batch()
+        while self._in_flight:
+            await asyncio.gather(*list(self._in_flight))
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+class VectorStore:
+    """
+    The product vector index: typed query results and batched writes.
+
+    Wraps the index connected by database/pinecone_client.py (Pinecone or the
+    local index, per VECTOR_BACKEND). Blocking SDK calls run on the shared
+    executor under the Pinecone concurrency limit.
+
+    With DOCUMENT_STORE_ENABLED, queries ask the index for ids and scores
+    only and read the metadata from the local document store.
+
+    Args:
+        get_index: Zero-argument getter for the index, the shared one by default
+        get_documents: Zero-argument getter for the document store, the shared one by default
+    """
+    def __init__(
+        self,
+        get_index: Callable[[], Any] = get_index,
+        get_documents: Callable[[], DocumentStore] = get_document_store
+    ):
+        self.get_index = get_index
+        self.get_documents = get_documents
+        self.writer = VectorWriter(lambda vectors: self.get_index().upsert(vectors=vectors))
+
+    @property
+    def index(self):
+        """Index, connected on first use."""
+        return self.get_index()
+
+    async def query(
+        self,
+        vector: List[float],
+        top_k: int = 5,
+        namespace: str = "",
+        include_metadata: bool = True
+    ) -> List[VectorMatch]:
         """
-        Search for similar products using embedding.
+        Find the vectors nearest to a query vector.
+
+        Args:
+            vector: Query embedding
+            top_k: Number of matches to return
+            namespace: Index namespace, the default one when empty
+            include_metadata: Whether matches carry their metadata
+
+        Returns:
+            List[VectorMatch]: Matches ordered by descending score
         """
-        try:
-            results = self.index.query(
-                vector=query_embedding,
+        hydrate = include_metadata and settings.DOCUMENT_STORE_ENABLED
+        with vector_query_duration.time():
+            response = await run_blocking(
+                "pinecone",
+                self.get_index().query,
+                vector=vector,
                 top_k=top_k,
-                include_metadata=True
+                include_metadata=include_metadata and not hydrate,
+                namespace=namespace
             )
-            return results
-        except Exception as e:
-            logger.error(f"Error searching similar products: {e}")
-            raise
+        matches = [VectorMatch(match.id, match.score, match.metadata) for match in response.matches]
+        return await self._hydrate(matches, namespace) if hydrate else matches
+
+    async def _hydrate(self, matches: List[VectorMatch], namespace: str) -> List[VectorMatch]:
+        """
+        Attach the metadata of each match from the document store.
+
+        Matches the store does not know yet (vectors written without it, or
+        after its last save) get the metadata stored in the index instead,
+        and an empty dict when the index has none either.
+        """
+        ids = [match.id for match in matches]
+        # Off the event loop: reads fault in pages of the data file, and a miss may reload the manifest
+        metadata = dict(zip(ids, await run_blocking("documents", self.get_documents().get_many, ids)))
+        missing = [match_id for match_id, found in metadata.items() if found is None]
+        if missing:
+            document_store_misses.inc(len(missing))
+            response = await run_blocking("pinecone", self.get_index().fetch, ids=missing, namespace=namespace)
+            vectors = response["vectors"]
+            for match_id in missing:
+                if match_id in vectors:
+                    metadata[match_id] = vectors[match_id].get("metadata")
+        return [match._replace(metadata=metadata.get(match.id) or {}) for match in matches]
+
+    async def store_product_embedding(self, product_id: str, embedding: list, metadata: dict) -> None:
+        """
+        Queue a product embedding for a batched upsert.
+
+        Call flush() after a catalog update to wait for the writes.
+        """
+        await self.writer.add({
+            "id": product_id,
+            "values": embedding,
+            "metadata": metadata
+        })
+
+    # Name used by the former PineconeService
+    store_product = store_product_embedding
+
+    async def flush(self) -> None:
+        """Write every queued embedding, raising if a batch could not be written."""
+        started_at = time.perf_counter()
+        pending = self.writer.pending
+        await self.writer.flush()
+        if pending:
+            logger.info(f"Flushed {pending} product embeddings in {(time.perf_counter() - started_at) * 1000:.0f}ms")
+
+    async def search_similar_products(self, query_embedding: list, top_k: int = 5) -> List[VectorMatch]:
+        """
+        Search for similar products using embedding.
+        """
+        return await self.query(query_embedding, top_k=top_k)
 
 vector_store = VectorStore()
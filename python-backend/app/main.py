@@ -1,14 +1,31 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
+from app.api import metrics
+from app.api.v1 import search
+from app.api.v1.api import api_router
+from app.core.clients import close_clients, get_openai_client, warm_connections
+from app.core.concurrency import shutdown_executor
+from app.core.config import settings
+from app.core.logger import configure_logging
+from app.core.middleware import DeadlineMiddleware, ServerTimingMiddleware, add_middleware_stack
+from app.core.resources import warm_up
+from app.database.mongo import mongodb
+from app.database.vector_store import get_document_store, vector_store
+from app.services.conversation_writer import conversation_writer
+from app.services.keyword_search import get_keyword_index
+from database.pinecone_client import get_index
 
-# Configure basic logging
-logging.basicConfig(level=logging.INFO)
+# Route logging through the shared queue-based structured logger
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
 app = FastAPI(title="Botify API")
 
+# Request logging and per-IP rate limiting
+add_middleware_stack(app)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +35,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(metrics.router)
+
+# Per-request stage breakdown (embed, vector, format, llm, db) in a Server-Timing header
+app.add_middleware(
+    ServerTimingMiddleware,
+    paths=[f"{settings.API_V1_STR}/chat", f"{settings.API_V1_STR}/chat/stream", f"{settings.API_V1_STR}/search"],
+    debug=settings.SERVER_TIMING_DEBUG
+)
+
+# Per-request deadline, optionally shortened by the client's X-Request-Deadline-Ms header
+app.add_middleware(DeadlineMiddleware, default_ms=settings.REQUEST_DEADLINE_MS)
+
+@app.on_event("startup")
+async def startup_event():
+    """Connect conversation persistence, pre-load the embedding model, vector index and OpenAI client, and open warm connections."""
+    if settings.CONVERSATION_PERSISTENCE_ENABLED:
+        await mongodb.connect_to_database()
+        conversation_writer.start()
+    if settings.WARMUP_ON_STARTUP:
+        await warm_up({
+            "embedding model": search.get_model,
+            "pinecone index": get_index,
+            "openai client": get_openai_client,
+            **({"keyword index": get_keyword_index} if settings.KEYWORD_INDEX_ENABLED else {}),
+            **({"document store": get_document_store} if settings.DOCUMENT_STORE_ENABLED else {}),
+        })
+        await warm_connections()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued conversations and product embeddings, then release upstream connections and the executor used for blocking SDK calls."""
+    try:
+        await vector_store.flush()
+    except Exception as e:
+        logger.error(f"Failed to flush product embeddings: {e}")
+    if settings.CONVERSATION_PERSISTENCE_ENABLED:
+        await conversation_writer.stop()
+        await mongodb.close_database_connection()
+    await close_clients()
+    shutdown_executor()
+
 @app.get("/")
 async def root():
     return {"message": "Botify API is running"}
@@ -13,3 +13,5 @@ class ChatResponse(BaseModel):
     Chat response model.
     """
     response: str
+    cached: bool = False
+    error: bool = False  # The response is an apology because generation failed
@@ -8,6 +8,7 @@ class Conversation(BaseModel):
     bot_response: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     context: Optional[dict] = None
+    user_id: Optional[str] = None
     
     class Config:
         json_encoders = {
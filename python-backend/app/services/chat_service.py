@@ -1,20 +1,30 @@
 from app.models.chat import ChatMessage, ChatResponse
 from app.core.config import settings
 from app.core.logger import logger
-import openai
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator, List
+from app.core.cache import embedding_cache
+from app.core.clients import get_openai_client
+from app.core.concurrency import dependency_slot
+from app.core.exceptions import DependencyUnavailable
+from app.core.metrics import errors
+from app.core.resilience import guarded
+from app.core.tracing import span
+from app.services.llm_gateway import llm_gateway
+from app.services.response_cache import response_cache
+from app.utils.streaming import CachedText
 
 class ChatService:
     def __init__(self):
-        # Initialize OpenAI client
+        # Shared OpenAI client, pooling connections with the rest of the process
         self.openai_client = None
         if not settings.OPENAI_API_KEY:
             raise Exception("OpenAI API key is required")
         
         try:
-            openai.api_key = settings.OPENAI_API_KEY
-            self.openai_client = openai.Client()
-            self.model = "gpt-3.5-turbo"  # Using GPT-3.5 for better cost efficiency
+            self.openai_client = get_openai_client()
+            # Completions go through the shared LLM gateway; this client only embeds queries
+            self.llm = llm_gateway
+            self.embedding_model = "text-embedding-3-small"
             logger.info("OpenAI client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {str(e)}")
@@ -37,26 +47,86 @@ class ChatService:
 
         return system_message
 
+    def _prepare_messages(self, request: ChatMessage) -> List[Dict[str, str]]:
+        """Build the message list sent to OpenAI"""
+        return [
+            {"role": "system", "content": self._prepare_system_message(request.context)},
+            {"role": "user", "content": request.message}
+        ]
+
+    async def _embed_query(self, text: str) -> List[float]:
+        """Embed a query with OpenAI, served from the shared embedding cache when possible"""
+        async def _embed(query: str) -> List[float]:
+            async def call():
+                async with dependency_slot("openai"):
+                    return await self.openai_client.embeddings.create(
+                        model=self.embedding_model,
+                        input=query
+                    )
+            response = await guarded("openai", "embed", call)
+            return response.data[0].embedding
+
+        return await embedding_cache.get_or_embed(text, self.embedding_model, _embed)
+
+    async def _cache_embedding(self, text: str) -> Optional[List[float]]:
+        """Embed a query for the response cache; None when the cache is off or embeddings are unavailable"""
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return None
+        try:
+            return await self._embed_query(text)
+        except DependencyUnavailable as e:
+            logger.warning(f"Skipping the response cache: {e.message}")
+            return None
+
     async def process_chat(self, request: ChatMessage) -> ChatResponse:
-        """Process chat messages using OpenAI"""
+        """Process chat messages with the fastest healthy LLM provider"""
         try:
-            messages = [
-                {"role": "system", "content": self._prepare_system_message(request.context)},
-                {"role": "user", "content": request.message}
-            ]
-
-            response = self.openai_client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1024
-            )
-            
-            return ChatResponse(response=response.choices[0].message.content)
+            query_embedding = await self._cache_embedding(request.message)
+            if query_embedding is not None:
+                cached = response_cache.lookup(query_embedding, request.context)
+                if cached:
+                    logger.info(f"Response cache hit (similarity {cached.similarity:.3f})")
+                    return ChatResponse(response=cached.response, cached=True)
+
+            with span("format"):
+                messages = self._prepare_messages(request)
+
+            with span("llm"):
+                content = await self.llm.complete(messages, temperature=0.7, max_tokens=1024)
+            if query_embedding is not None and content:
+                response_cache.store(query_embedding, request.context, content)
+
+            return ChatResponse(response=content)
 
         except Exception as e:
+            errors.labels(stage="chat").inc()
             logger.error(f"Error in chat service: {str(e)}")
             error_msg = "I apologize, but I'm having trouble processing your request."
-            if "rate_limit" in str(e).lower():
+            if isinstance(e, DependencyUnavailable):
+                error_msg += " Please try again in a moment."
+            elif "rate_limit" in str(e).lower():
                 error_msg += " The service is currently experiencing high demand. Please try again in a moment."
-            return ChatResponse(response=error_msg)
+            return ChatResponse(response=error_msg, error=True)
+
+    async def stream_chat(self, request: ChatMessage) -> AsyncIterator[Optional[str]]:
+        """
+        Stream chat completion tokens as they are generated.
+
+        The LLM gateway holds the chosen provider's concurrency slot until the
+        stream is exhausted.
+        """
+        query_embedding = await self._cache_embedding(request.message)
+        if query_embedding is not None:
+            cached = response_cache.lookup(query_embedding, request.context)
+            if cached:
+                logger.info(f"Response cache hit (similarity {cached.similarity:.3f})")
+                yield CachedText(cached.response)
+                return
+
+        parts: List[str] = []
+        async for token in self.llm.stream(self._prepare_messages(request), temperature=0.7, max_tokens=1024):
+            parts.append(token)
+            yield token
+
+        if query_embedding is not None and parts:
+            response_cache.store(query_embedding, request.context, "".join(parts))
@@ -1,78 +1,108 @@
 from app.models.conversation import Conversation
 from app.database.mongo import mongodb
+from app.core.config import settings
 from app.core.logger import logger
+from app.core.metrics import errors, mongo_operation_duration
+from app.core.resilience import guarded
+from app.core.tracing import span
+from app.services.conversation_writer import conversation_writer
 
 class ConversationService:
     """Service for managing conversations in MongoDB."""
     
     @staticmethod
-    async def store_conversation(user_message: str, bot_response: str, context: dict = None) -> bool:
+    async def store_conversation(user_message: str, bot_response: str, context: dict = None, user_id: str = None) -> bool:
         """
-        Store a conversation in MongoDB.
+        Queue a conversation for a batched write to MongoDB without waiting for the write.
         
         Args:
             user_message: The user's message
             bot_response: The bot's response
             context: Optional context information
+            user_id: Optional user identifier, used to look up the user's history
             
         Returns:
-            bool: True if successful, False otherwise
+            bool: True if queued, False if it was dropped
         """
         try:
             conversation = Conversation(
                 user_message=user_message,
                 bot_response=bot_response,
-                context=context
+                context=context,
+                user_id=user_id
             )
             
-            collection = mongodb.get_collection('conversations')
-            await collection.insert_one(conversation.model_dump())
-            
-            logger.info(f"Stored conversation: {user_message[:50]}...")
-            return True
+            with span("db"):
+                return await conversation_writer.submit(conversation)
             
         except Exception as e:
             logger.error(f"Error storing conversation: {str(e)}")
             return False
     
     @staticmethod
-    async def get_recent_conversations(limit: int = 10):
+    def queue_conversation(user_message: str, bot_response: str, context: dict = None, user_id: str = None) -> bool:
+        """
+        Queue a conversation from synchronous code, e.g. a stream completion callback.
+        
+        Returns:
+            bool: True if queued, False if the queue was full
+        """
+        try:
+            return conversation_writer.submit_nowait(Conversation(
+                user_message=user_message,
+                bot_response=bot_response,
+                context=context,
+                user_id=user_id
+            ))
+        except Exception as e:
+            logger.error(f"Error storing conversation: {str(e)}")
+            return False
+    
+    @staticmethod
+    async def get_recent_conversations(limit: int = 10, user_id: str = None, timeout: float = None):
         """
         Get recent conversations from MongoDB.
         
         Args:
             limit: Maximum number of conversations to retrieve
+            user_id: Only return this user's conversations
+            timeout: Seconds to wait, MONGO_TIMEOUT_MS by default
             
         Returns:
             list: List of recent conversations
         """
         try:
-            collection = mongodb.get_collection('conversations')
-            cursor = collection.find().sort('timestamp', -1).limit(limit)
-            conversations = await cursor.to_list(length=limit)
+            collection = mongodb.get_collection(settings.MONGODB_COLLECTION)
+            with span("db"), mongo_operation_duration.labels(operation="recent_conversations").time():
+                cursor = collection.find({'user_id': user_id} if user_id else {}).sort('timestamp', -1).limit(limit)
+                conversations = await guarded("mongo", "mongo", lambda: cursor.to_list(length=limit), timeout)
             return conversations
             
         except Exception as e:
+            errors.labels(stage="mongo").inc()
             logger.error(f"Error retrieving conversations: {str(e)}")
             return []
     
     @staticmethod
-    async def get_user_context(user_id: str):
+    async def get_user_context(user_id: str, timeout: float = None):
         """
         Get user's conversation context.
         
         Args:
             user_id: The user's identifier
+            timeout: Seconds to wait, MONGO_TIMEOUT_MS by default
             
         Returns:
             dict: User's context information
         """
         try:
             collection = mongodb.get_collection('user_context')
-            context = await collection.find_one({'user_id': user_id})
+            with span("db"), mongo_operation_duration.labels(operation="user_context").time():
+                context = await guarded("mongo", "mongo", lambda: collection.find_one({'user_id': user_id}), timeout)
             return context
             
         except Exception as e:
+            errors.labels(stage="mongo").inc()
             logger.error(f"Error retrieving user context: {str(e)}")
             return None
 
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import errors, metrics, mongo_operation_duration
+from app.database.mongo import mongodb
+from app.models.conversation import Conversation
+
+# Queued after the last conversation on shutdown to wake an idle flush task
+_STOP = object()
+
+conversation_queue_depth = metrics.gauge(
+    "conversation_write_queue_depth",
+    "Conversations waiting to be written to MongoDB",
+)
+conversation_flush_latency = metrics.histogram(
+    "conversation_flush_seconds",
+    "Duration of one batched conversation insert_many, including retries",
+)
+
+class ConversationWriter:
+    """
+    Write-behind queue for conversation records.
+
+    Callers enqueue conversations and return immediately. A background task
+    collects them into batches of up to `max_batch_size`, or whatever arrived
+    within `flush_interval_ms` of the first queued record, and writes each
+    batch with one unordered insert_many.
+
+    The queue is bounded at `max_queue_size`. When MongoDB falls behind,
+    submit() waits up to `enqueue_timeout_ms` for space and then drops the
+    record, so memory stays bounded and responses are never held up for long.
+    """
+    def __init__(
+        self,
+        get_collection: Callable[[], Any],
+        max_batch_size: int = settings.CONVERSATION_BATCH_SIZE,
+        flush_interval_ms: float = settings.CONVERSATION_FLUSH_INTERVAL_MS,
+        max_queue_size: int = settings.CONVERSATION_QUEUE_SIZE,
+        enqueue_timeout_ms: float = settings.CONVERSATION_ENQUEUE_TIMEOUT_MS,
+        max_retries: int = settings.CONVERSATION_FLUSH_RETRIES
+    ):
+        self.get_collection = get_collection
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.enqueue_timeout = enqueue_timeout_ms / 1000
+        self.max_retries = max_retries
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        conversation_queue_depth.set_function(self.queue_depth)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        """Start the background flush task on the running event loop"""
+        if self._task is not None and not self._task.done():
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="conversation-writer")
+        logger.info("Started conversation writer")
+
+    async def submit(self, conversation: Conversation) -> bool:
+        """
+        Queue a conversation for writing, waiting briefly for space if the queue is full.
+
+        Returns:
+            bool: True if queued, False if it was dropped
+        """
+        if self._closing:
+            self.dropped += 1
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait(conversation.model_dump())
+            return True
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(conversation.model_dump()), self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self._drop()
+            return False
+
+    def submit_nowait(self, conversation: Conversation) -> bool:
+        """Queue a conversation without waiting; drops it if the queue is full"""
+        if self._closing:
+            self.dropped += 1
+            return False
+        self.start()
+        try:
+            self._queue.put_nowait(conversation.model_dump())
+            return True
+        except asyncio.QueueFull:
+            self._drop()
+            return False
+
+    def _drop(self) -> None:
+        self.dropped += 1
+        # Log the first drop of every hundred rather than flooding the log while MongoDB is slow
+        if self.dropped % 100 == 1:
+            logger.warning(f"Conversation write queue is full, dropped {self.dropped} conversations so far")
+
+    async def _next_batch(self) -> List[Dict[str, Any]]:
+        """Wait for one record, then collect more until the batch is full or the interval has passed"""
+        batch = []
+        first = await self._queue.get()
+        if first is _STOP:
+            return batch
+        batch.append(first)
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch_size:
+            if self._closing:
+                if self._queue.empty():
+                    break
+                record = self._queue.get_nowait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if record is not _STOP:
+                batch.append(record)
+        return batch
+
+    async def _run(self) -> None:
+        while not (self._closing and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]) -> None:
+        """Write one batch, retrying transient errors; duplicates and bad documents are not retried"""
+        started_at = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    with mongo_operation_duration.labels(operation="insert_conversations").time():
+                        result = await self.get_collection().insert_many(batch, ordered=False)
+                    self.written += len(result.inserted_ids)
+                    return
+                except BulkWriteError as e:
+                    # Unordered: everything but the reported documents was written
+                    write_errors = len(e.details.get("writeErrors", []))
+                    self.written += e.details.get("nInserted", len(batch) - write_errors)
+                    self.failed += write_errors
+                    errors.labels(stage="mongo").inc()
+                    logger.error(f"Failed to write {write_errors} of {len(batch)} conversations: {e}")
+                    return
+                except Exception as e:
+                    errors.labels(stage="mongo").inc()
+                    if attempt == self.max_retries:
+                        self.failed += len(batch)
+                        logger.error(f"Dropping {len(batch)} conversations after {attempt + 1} attempts: {e}")
+                        return
+                    delay = min(5.0, 0.1 * 2 ** attempt)
+                    logger.warning(f"Conversation flush failed ({e}), retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+        finally:
+            conversation_flush_latency.observe(time.perf_counter() - started_at)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop accepting conversations and write everything still queued.
+
+        Args:
+            timeout: Seconds to spend draining before giving up on the rest
+        """
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            self._queue.put_nowait(_STOP)
+        except asyncio.QueueFull:
+            pass  # The flush task is busy and exits once the queue is empty
+
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            lost = 0
+            while not self._queue.empty():
+                lost += self._queue.get_nowait() is not _STOP
+            self.dropped += lost
+            logger.error(f"Timed out draining conversation queue, dropped {lost} conversations")
+        self._task = None
+        logger.info(f"Stopped conversation writer: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        """Return queue depth and write counters"""
+        return {
+            "queued": self.queue_depth(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+conversation_writer = ConversationWriter(lambda: mongodb.get_collection(settings.MONGODB_COLLECTION))
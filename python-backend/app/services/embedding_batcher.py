@@ -0,0 +1,94 @@
+import asyncio
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+from app.core.concurrency import run_blocking
+from app.core.config import settings
+from app.core.logger import logger
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent single-text embedding requests into batched encode calls.
+
+    Requests arriving within `max_wait_ms` of the first queued request, up to
+    `max_batch_size` of them, are encoded together on the shared executor and
+    each caller receives its own vector.
+    """
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Sequence[Sequence[float]]],
+        max_batch_size: int = settings.EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = settings.EMBED_BATCH_WINDOW_MS,
+        dependency: str = "embedding"
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.dependency = dependency
+        self.batches = 0
+        self.items = 0
+        self._pending: List[Tuple[str, "asyncio.Future[List[float]]"]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed a single text as part of the next batch.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            List[float]: The embedding
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._dispatch)
+
+        return await future
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, "asyncio.Future[List[float]]"]]) -> None:
+        # Skip texts whose callers already gave up
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+
+        try:
+            vectors = await run_blocking(self.dependency, self.encode, [text for text, _ in batch])
+        except Exception as e:
+            logger.error(f"Error encoding batch of {len(batch)} texts: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(list(vector))
+
+    def stats(self) -> dict:
+        """Return batch counters and the mean batch size"""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
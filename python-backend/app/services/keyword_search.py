@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from app.core.config import settings
+from app.core.metrics import keyword_fast_path
+from app.core.resources import lazy_resource, refresh_in_background
+from app.core.tracing import span
+from app.database.vector_store import get_document_store
+from database.keyword_index import PRODUCTS_KEYWORD_INDEX, KeywordIndex, open_keyword_index
+from database.local_index import LocalMatch
+
+class KeywordResult(NamedTuple):
+    """Keyword candidates for a query and whether they are strong enough to answer it alone."""
+    matches: List[LocalMatch]
+    strong: bool
+
+@lazy_resource
+def get_keyword_index() -> KeywordIndex:
+    """Load the product keyword index written by the ingestion pipeline; keyword_search() keeps it current"""
+    return open_keyword_index(PRODUCTS_KEYWORD_INDEX)
+
+def keyword_search(query: str, top_k: int, endpoint: str) -> KeywordResult:
+    """
+    Look a query up in the BM25 keyword index.
+
+    The result is strong when the best match scores at least
+    KEYWORD_FAST_PATH_STRENGTH of a document containing every query term,
+    typically for exact product names, brands and SKUs. Strong results can
+    be returned without embedding the query or searching the vector index.
+    With DOCUMENT_STORE_ENABLED, match metadata is read from the document
+    store, keeping the keyword index's own metadata for documents it lacks.
+
+    Args:
+        query: The user's query
+        top_k: Number of candidates to return
+        endpoint: Route name, used to label the fast-path counter
+
+    Returns:
+        KeywordResult: Candidates ordered by BM25 score
+    """
+    with span("keyword"):
+        keyword_index = get_keyword_index()
+        # Pick up products added or removed by an incremental sync or the change-stream watcher,
+        # loading the newer file off the event loop
+        if keyword_index.refresh_due():
+            refresh_in_background("keyword index", keyword_index.refresh)
+        matches, strength = keyword_index.search(query, top_k)
+        if settings.DOCUMENT_STORE_ENABLED and matches:
+            documents = get_document_store()
+            stored = documents.get_many([match.id for match in matches], refresh=False)
+            if None in stored and documents.refresh_due():
+                refresh_in_background("document store", documents.refresh)
+            matches = [
+                LocalMatch(match.id, match.score, metadata=document or match.metadata)
+                for match, document in zip(matches, stored)
+            ]
+    strong = bool(matches) and strength >= settings.KEYWORD_FAST_PATH_STRENGTH
+    if strong:
+        keyword_fast_path.labels(endpoint=endpoint).inc()
+    return KeywordResult(matches, strong)
+
+def reciprocal_rank_fusion(result_lists: Sequence[Sequence[Any]], top_k: int, k: Optional[int] = None) -> List[LocalMatch]:
+    """
+    Merge ranked match lists with reciprocal rank fusion.
+
+    Each match scores sum(1 / (k + rank)) over the lists it appears in, so
+    documents ranked well by both keyword and vector search come first
+    without having to calibrate BM25 scores against cosine similarities.
+
+    Args:
+        result_lists: Lists of matches with `id` and `metadata`, best first
+        top_k: Number of fused matches to return
+        k: Rank damping constant, RRF_K by default
+
+    Returns:
+        List[LocalMatch]: Matches ordered by fused score
+    """
+    k = settings.RRF_K if k is None else k
+    scores: Dict[str, float] = {}
+    metadata: Dict[str, Any] = {}
+    for matches in result_lists:
+        for rank, match in enumerate(matches, start=1):
+            scores[match.id] = scores.get(match.id, 0.0) + 1.0 / (k + rank)
+            if metadata.get(match.id) is None:
+                metadata[match.id] = match.metadata
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [LocalMatch(match_id, score, metadata=metadata[match_id]) for match_id, score in ranked]
@@ -0,0 +1,329 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.clients import get_groq_client, get_openai_client
+from app.core.concurrency import get_limit
+from app.core.config import settings
+from app.core.exceptions import CircuitOpenError
+from app.core.metrics import errors, llm_duration, llm_hedges, llm_requests
+from app.core.resilience import get_breaker, guarded
+
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """
+    Rolling time-to-first-token and error record of one provider.
+
+    Only outcomes from the last `window` seconds count, so a provider that
+    failed a while ago becomes eligible again without manual intervention.
+    """
+    def __init__(self, window: float):
+        self.window = window
+        # (finished_at, time to first token or None for an error)
+        self._samples: Deque[Tuple[float, Optional[float]]] = deque()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._samples and self._samples[0][0] < now - self.window:
+            self._samples.popleft()
+
+    def record_success(self, ttft: float) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, ttft))
+            self._prune(now)
+
+    def record_error(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._samples.append((now, None))
+            self._prune(now)
+
+    def snapshot(self) -> Tuple[List[float], int]:
+        """Sorted successful first-token latencies and the number of errors in the window."""
+        with self._lock:
+            self._prune(time.monotonic())
+            latencies = sorted(ttft for _, ttft in self._samples if ttft is not None)
+            failures = sum(1 for _, ttft in self._samples if ttft is None)
+        return latencies, failures
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """First-token latency at `fraction`, or None without successful samples."""
+        latencies, _ = self.snapshot()
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    def error_rate(self) -> float:
+        latencies, failures = self.snapshot()
+        total = len(latencies) + failures
+        return failures / total if total else 0.0
+
+    def healthy(self) -> bool:
+        """Unhealthy once enough recent calls failed at more than LLM_MAX_ERROR_RATE."""
+        latencies, failures = self.snapshot()
+        total = len(latencies) + failures
+        return total < settings.LLM_MIN_SAMPLES or failures / total <= settings.LLM_MAX_ERROR_RATE
+
+class LLMProvider:
+    """
+    A chat completion backend with an OpenAI-compatible streaming API.
+
+    Args:
+        name: Provider name, also the dependency name for concurrency limits
+        client: Zero-argument getter for the SDK client
+        model: Model requested from this provider
+    """
+    def __init__(self, name: str, client: Callable[[], Any], model: str):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.stats = ProviderStats(settings.LLM_STATS_WINDOW_SECONDS)
+
+class _Attempt:
+    """One streaming completion request to one provider, holding its concurrency slot until closed."""
+    def __init__(self, provider: LLMProvider, messages: List[Dict[str, str]], params: Dict[str, Any]):
+        self.provider = provider
+        self.messages = messages
+        self.params = params
+        self.started_at = time.perf_counter()
+        self._stream = None
+        self._iterator = None
+        self._slot = None
+        self._exhausted = False
+        self._first_token = False
+
+    async def first_token(self) -> str:
+        """
+        Open the stream and wait for the first non-empty text delta.
+
+        The wait goes through the provider's circuit breaker and is bounded by
+        LLM_TIMEOUT_MS and the time left on the request deadline.
+        """
+        try:
+            token = await guarded(self.provider.name, "llm", self._open)
+        except (asyncio.CancelledError, CircuitOpenError):
+            raise
+        except Exception:
+            self.failed()
+            raise
+        self._first_token = True
+        self.provider.stats.record_success(time.perf_counter() - self.started_at)
+        return token
+
+    async def _open(self) -> str:
+        slot = get_limit(self.provider.name)
+        await slot.acquire()
+        self._slot = slot
+        self._stream = await self.provider.client().chat.completions.create(
+            model=self.provider.model,
+            messages=self.messages,
+            stream=True,
+            **self.params
+        )
+        self._iterator = self._stream.__aiter__()
+        while True:
+            try:
+                chunk = await self._iterator.__anext__()
+            except StopAsyncIteration:
+                self._exhausted = True
+                return ""
+            token = chunk.choices[0].delta.content if chunk.choices else None
+            if token:
+                return token
+
+    async def rest(self) -> AsyncIterator[str]:
+        """Yield the remaining text deltas."""
+        if self._exhausted:
+            return
+        async for chunk in self._iterator:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def failed(self) -> None:
+        self.provider.stats.record_error()
+        errors.labels(stage="llm").inc()
+        llm_requests.labels(provider=self.provider.name, outcome="error").inc()
+
+    async def close(self, outcome: str) -> None:
+        """Release the stream and the concurrency slot, recording how the attempt ended."""
+        try:
+            if self._stream is not None:
+                close = getattr(self._stream, "close", None) or getattr(self._stream, "aclose", None)
+                if close is not None:
+                    result = close()
+                    if asyncio.iscoroutine(result):
+                        await result
+        except Exception as e:
+            logger.debug("Error closing %s stream: %s", self.provider.name, e)
+        finally:
+            if self._slot is not None:
+                self._slot.release()
+                self._slot = None
+        if outcome == "lost" and not self._first_token:
+            # The wait so far is a lower bound on this provider's latency; recording
+            # it keeps a provider that keeps losing races from staying ranked first
+            self.provider.stats.record_success(time.perf_counter() - self.started_at)
+        if outcome != "error":
+            llm_requests.labels(provider=self.provider.name, outcome=outcome).inc()
+        if outcome == "won":
+            llm_duration.labels(provider=self.provider.name).observe(time.perf_counter() - self.started_at)
+
+class LLMGateway:
+    """
+    Route chat completions to the fastest healthy provider, with fallback and hedging.
+
+    Providers are ranked by rolling median time to first token, healthy ones
+    first; providers whose circuit breaker is open are skipped. A provider
+    that fails before its first token is replaced by the next one. With
+    hedging enabled, when the chosen provider has not produced a token by
+    its LLM_HEDGE_PERCENTILE first-token latency, the next provider is
+    asked as well; the first to produce a token wins and the other request
+    is cancelled.
+
+    Args:
+        providers: Providers in order of preference when no latency is known yet
+        hedging: Whether to send hedged requests
+    """
+    def __init__(self, providers: List[LLMProvider], hedging: bool = False):
+        self.providers = providers
+        self.hedging = hedging
+
+    def ranked(self) -> List[LLMProvider]:
+        """Providers in the order they should be tried, leaving out those with an open circuit."""
+        def key(indexed: Tuple[int, LLMProvider]):
+            position, provider = indexed
+            median = provider.stats.percentile(0.5)
+            # Providers without samples go first so that they get measured
+            return (not provider.stats.healthy(), median if median is not None else 0.0, position)
+        available = [(position, provider) for position, provider in enumerate(self.providers) if get_breaker(provider.name).available()]
+        return [provider for _, provider in sorted(available, key=key)]
+
+    def hedge_delay(self, provider: LLMProvider) -> float:
+        """Seconds to wait for a first token before sending a hedged request."""
+        latencies, _ = provider.stats.snapshot()
+        if len(latencies) < settings.LLM_MIN_SAMPLES:
+            return settings.LLM_HEDGE_DEFAULT_DELAY_MS / 1000
+        delay = provider.stats.percentile(settings.LLM_HEDGE_PERCENTILE)
+        return max(delay, settings.LLM_HEDGE_MIN_DELAY_MS / 1000)
+
+    async def _race(self, messages: List[Dict[str, str]], params: Dict[str, Any]) -> Tuple[_Attempt, str]:
+        """Run attempts until one produces its first token; cancel the rest."""
+        candidates = self.ranked()
+        if not candidates:
+            raise CircuitOpenError("llm")
+        pending: Dict[asyncio.Task, _Attempt] = {}
+        started_at = time.perf_counter()
+        hedge_at = None
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            attempt = _Attempt(candidates.pop(0), messages, params)
+            pending[asyncio.ensure_future(attempt.first_token())] = attempt
+
+        launch()
+        if self.hedging and candidates:
+            hedge_at = started_at + self.hedge_delay(next(iter(pending.values())).provider)
+
+        try:
+            while pending:
+                timeout = None
+                if hedge_at is not None:
+                    timeout = max(0.0, hedge_at - time.perf_counter())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # The first token is late: ask the next provider as well
+                    hedge_at = None
+                    if candidates:
+                        llm_hedges.inc()
+                        launch()
+                    continue
+
+                for task in done:
+                    attempt = pending.pop(task)
+                    if task.exception() is None:
+                        # Everything else still running has lost the race
+                        return attempt, task.result()
+                    last_error = task.exception()
+                    await attempt.close("error")
+                    logger.warning("LLM provider %s failed: %s", attempt.provider.name, last_error)
+
+                if not pending and candidates:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for attempt in pending.values():
+                await attempt.close("lost")
+
+        raise last_error or RuntimeError("No LLM provider configured")
+
+    async def stream(self, messages: List[Dict[str, str]], **params: Any) -> AsyncIterator[str]:
+        """
+        Stream completion text deltas from the best available provider.
+
+        Args:
+            messages: Chat messages
+            **params: Sampling parameters, e.g. temperature and max_tokens
+
+        Yields:
+            str: Non-empty text deltas
+        """
+        attempt, first = await self._race(messages, params)
+        outcome = "won"
+        try:
+            if first:
+                yield first
+            async for token in attempt.rest():
+                yield token
+        except GeneratorExit:
+            raise
+        except Exception:
+            # Too late to fall back once tokens have been sent
+            get_breaker(attempt.provider.name).record_failure()
+            attempt.failed()
+            outcome = "error"
+            raise
+        finally:
+            await attempt.close(outcome)
+
+    async def complete(self, messages: List[Dict[str, str]], **params: Any) -> str:
+        """Return the full completion text from the best available provider."""
+        return "".join([token async for token in self.stream(messages, **params)])
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Rolling latency and error rate of every provider."""
+        return {
+            provider.name: {
+                "ttft_p50_ms": _ms(provider.stats.percentile(0.5)),
+                "ttft_p95_ms": _ms(provider.stats.percentile(0.95)),
+                "error_rate": provider.stats.error_rate(),
+                "healthy": provider.stats.healthy(),
+                "circuit": get_breaker(provider.name).state,
+            }
+            for provider in self.providers
+        }
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+_PROVIDERS = {
+    "groq": lambda: LLMProvider("groq", get_groq_client, settings.GROQ_MODEL),
+    "openai": lambda: LLMProvider("openai", get_openai_client, settings.OPENAI_CHAT_MODEL),
+}
+
+def create_llm_gateway() -> LLMGateway:
+    """Create the gateway over the providers listed in LLM_PROVIDERS"""
+    names = [name.strip() for name in settings.LLM_PROVIDERS.split(",") if name.strip()]
+    unknown = [name for name in names if name not in _PROVIDERS]
+    if unknown:
+        raise ValueError(f"Unknown LLM providers: {', '.join(unknown)}")
+    return LLMGateway([_PROVIDERS[name]() for name in names], hedging=settings.LLM_HEDGING_ENABLED)
+
+llm_gateway = create_llm_gateway()
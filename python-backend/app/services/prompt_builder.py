@@ -0,0 +1,216 @@
+import functools
+import math
+import re
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.metrics import prompt_context_tokens, prompt_tokens_saved
+
+_WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_CONTEXT_HEADER = "\n\nRelevant Context:\n"
+_USER_HEADER = "\n\nAbout the User:\n"
+
+class TokenCounter:
+    """
+    Count prompt tokens locally.
+
+    Uses tiktoken when it is installed; otherwise estimates from word pieces
+    (about four characters per token), which is close enough to enforce a
+    budget. Counts are cached, since the same product passages are
+    retrieved over and over.
+
+    Args:
+        encoding: tiktoken encoding name
+        cache_size: Number of texts whose counts are remembered
+    """
+    def __init__(self, encoding: str = "cl100k_base", cache_size: int = 10000):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding)
+        except Exception:
+            self._encoding = None
+        self.count = functools.lru_cache(maxsize=cache_size)(self._count)
+
+    @property
+    def exact(self) -> bool:
+        """Whether counts come from a real tokenizer rather than an estimate"""
+        return self._encoding is not None
+
+    def _count(self, text: str) -> int:
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return sum(math.ceil(len(piece) / 4) for piece in _WORD_PATTERN.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text down to at most max_tokens tokens."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text)
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+
+        used = 0
+        for match in _WORD_PATTERN.finditer(text):
+            used += math.ceil(len(match.group()) / 4)
+            if used > max_tokens:
+                return text[:match.start()].rstrip()
+        return text
+
+class Passage(NamedTuple):
+    """A retrieved context passage and its relevance score (higher is better)."""
+    text: str
+    score: float
+
+class PromptStats(NamedTuple):
+    """Token accounting for one assembled prompt."""
+    prompt_tokens: int
+    context_tokens: int
+    tokens_saved: int
+    passages_kept: int
+    duplicates_dropped: int
+    passages_dropped: int
+
+def _shingles(text: str, size: int = 3) -> FrozenSet[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return frozenset([tuple(words)])
+    return frozenset(tuple(words[i:i + size]) for i in range(len(words) - size + 1))
+
+def _similarity(left: FrozenSet, right: FrozenSet) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+class PromptBuilder:
+    """
+    Assemble chat prompts within a token budget for the variable context.
+
+    The static instructions come first and are tokenized once, so every
+    prompt starts with the same prefix. Retrieved passages are deduplicated
+    (word-shingle Jaccard similarity) and added best score first, sharing
+    PROMPT_CONTEXT_TOKEN_BUDGET with the page and user context.
+
+    Args:
+        system_prompt: Static instructions opening every system message
+        context_budget: Maximum tokens of page context, user context and passages
+        dedup_similarity: Passages at least this similar to a better one are dropped
+        counter: Token counter, a shared TokenCounter by default
+    """
+    def __init__(
+        self,
+        system_prompt: str,
+        context_budget: Optional[int] = None,
+        dedup_similarity: Optional[float] = None,
+        counter: Optional[TokenCounter] = None
+    ):
+        self.system_prompt = system_prompt
+        self.context_budget = settings.PROMPT_CONTEXT_TOKEN_BUDGET if context_budget is None else context_budget
+        self.dedup_similarity = settings.PROMPT_DEDUP_SIMILARITY if dedup_similarity is None else dedup_similarity
+        self.counter = counter or get_token_counter()
+        self.prefix_tokens = self.counter.count(system_prompt)
+
+    def _deduplicate(self, passages: Sequence[Passage]) -> Tuple[List[Passage], int]:
+        """Drop empty and near-duplicate passages, keeping the best-scored copy."""
+        kept: List[Tuple[Passage, FrozenSet]] = []
+        duplicates = 0
+        for passage in sorted(passages, key=lambda passage: passage.score, reverse=True):
+            if not passage.text.strip():
+                continue
+            shingles = _shingles(passage.text)
+            if any(_similarity(shingles, other) >= self.dedup_similarity for _, other in kept):
+                duplicates += 1
+                continue
+            kept.append((passage, shingles))
+        return [passage for passage, _ in kept], duplicates
+
+    def build(
+        self,
+        user_message: str,
+        passages: Sequence[Passage] = (),
+        page_context: str = "",
+        user_context: str = "",
+        history: Sequence[Dict[str, Any]] = ()
+    ) -> Tuple[List[Dict[str, str]], PromptStats]:
+        """
+        Build the LLM messages for a chat request.
+
+        User context is added when it fits. Page context is guaranteed up to
+        half of what is left, passages fill the rest best score first, and
+        page context then takes whatever the passages did not use, being
+        truncated if it is still too long. Passages are only added whole.
+
+        Args:
+            user_message: The user's message
+            passages: Retrieved passages, in any order
+            page_context: Formatted context of the page the user is viewing
+            user_context: Formatted stored context about the user
+            history: Recent conversations, newest first, replayed as prior turns
+
+        Returns:
+            Tuple of (messages, token accounting)
+        """
+        remaining = self.context_budget
+        offered = 0
+
+        user_tokens = self.counter.count(user_context) if user_context else 0
+        offered += user_tokens
+        if user_tokens > remaining:
+            user_context, user_tokens = "", 0
+        remaining -= user_tokens
+
+        page_tokens = self.counter.count(page_context) if page_context else 0
+        offered += page_tokens
+        page_reserve = min(page_tokens, remaining // 2)
+
+        unique, duplicates = self._deduplicate(passages)
+        offered += sum(self.counter.count(passage.text) for passage in passages)
+        kept: List[str] = []
+        dropped = 0
+        for passage in unique:
+            tokens = self.counter.count(passage.text)
+            if tokens > remaining - page_reserve:
+                dropped += 1
+                continue
+            kept.append(passage.text)
+            remaining -= tokens
+
+        if page_tokens > remaining:
+            page_context = self.counter.truncate(page_context, remaining)
+            page_tokens = self.counter.count(page_context)
+        remaining -= page_tokens
+
+        system_message = self.system_prompt
+        prompt_tokens = self.prefix_tokens
+        full_context = "\n".join(kept + ([page_context] if page_context else [])).strip()
+        if full_context:
+            system_message += f"{_CONTEXT_HEADER}{full_context}"
+            prompt_tokens += self.counter.count(_CONTEXT_HEADER)
+        if user_context:
+            system_message += f"{_USER_HEADER}{user_context}"
+            prompt_tokens += self.counter.count(_USER_HEADER)
+
+        messages = [{"role": "system", "content": system_message}]
+        for turn in reversed(history):
+            messages.append({"role": "user", "content": turn["user_message"]})
+            messages.append({"role": "assistant", "content": turn["bot_response"]})
+        messages.append({"role": "user", "content": user_message})
+
+        context_tokens = self.context_budget - remaining
+        prompt_tokens += context_tokens + sum(self.counter.count(message["content"]) for message in messages[1:])
+        stats = PromptStats(
+            prompt_tokens=prompt_tokens,
+            context_tokens=context_tokens,
+            tokens_saved=max(0, offered - context_tokens),
+            passages_kept=len(kept),
+            duplicates_dropped=duplicates,
+            passages_dropped=dropped,
+        )
+        prompt_context_tokens.observe(context_tokens)
+        prompt_tokens_saved.inc(stats.tokens_saved)
+        return messages, stats
+
+@functools.lru_cache()
+def get_token_counter() -> TokenCounter:
+    """Get the shared token counter"""
+    return TokenCounter(settings.PROMPT_TOKENIZER_ENCODING)
@@ -0,0 +1,193 @@
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set
+from urllib.parse import urlsplit, urlunsplit
+
+from app.core.cache import normalize_query
+from app.core.config import settings
+from app.core.metrics import cache_hits, cache_misses
+
+class CachedResponse(NamedTuple):
+    """A response served from the semantic cache."""
+    entry_id: str
+    response: str
+    similarity: float
+
+class _Entry:
+    __slots__ = ("entry_id", "context_key", "embedding", "response", "expires_at")
+
+    def __init__(self, entry_id: str, context_key: str, embedding: List[float], response: str, expires_at: float):
+        self.entry_id = entry_id
+        self.context_key = context_key
+        self.embedding = embedding
+        self.response = response
+        self.expires_at = expires_at
+
+def _unit(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    if norm == 0:
+        return list(vector)
+    return [x / norm for x in vector]
+
+def context_key(context: Optional[Dict[str, Any]], user_id: Optional[str] = None) -> str:
+    """
+    Normalize the page context of a chat request into a cache partition key.
+
+    Only the page title and URL are considered; the URL fragment and any
+    trailing slash are dropped and the scheme and host are lower-cased.
+    A user id, given for personalized prompts, gets the user a partition of
+    their own.
+    """
+    user = f"user:{user_id}|" if user_id else ""
+    if not context:
+        return user
+
+    title = normalize_query(str(context.get("title") or ""))
+    url = str(context.get("url") or "").strip()
+    if url:
+        parts = urlsplit(url)
+        url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, ""))
+    return f"{user}{title}|{url}"
+
+class SemanticResponseCache:
+    """
+    Cache of chat responses looked up by query-embedding similarity.
+
+    Entries are partitioned by normalized page context, so a cached answer is
+    only reused for a request about the same page, and by user for answers
+    built from that user's context and history. Memory is bounded by a
+    global LRU limit and a per-context limit, and entries expire after a TTL.
+    """
+    def __init__(self, threshold: float, maxsize: int, ttl: float, max_per_context: int):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_per_context = max_per_context
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_context: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def lookup(
+        self,
+        embedding: Sequence[float],
+        context: Optional[Dict[str, Any]],
+        user_id: Optional[str] = None
+    ) -> Optional[CachedResponse]:
+        """
+        Find the most similar cached response for the same page context.
+
+        Args:
+            embedding: Embedding of the new query
+            context: Page context sent with the request
+            user_id: User whose personalized answers to search, None for shared answers
+
+        Returns:
+            Optional[CachedResponse]: The best match above the threshold, if any
+        """
+        key = context_key(context, user_id)
+        query = _unit(embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best: Optional[_Entry] = None
+            best_similarity = self.threshold
+            for entry_id in list(self._by_context.get(key, ())):
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                similarity = sum(a * b for a, b in zip(query, entry.embedding))
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+
+            if best is None:
+                self.misses += 1
+                cache_misses.labels(cache="response").inc()
+                return None
+
+            self._entries.move_to_end(best.entry_id)
+            self.hits += 1
+            cache_hits.labels(cache="response").inc()
+            return CachedResponse(best.entry_id, best.response, best_similarity)
+
+    def store(
+        self,
+        embedding: Sequence[float],
+        context: Optional[Dict[str, Any]],
+        response: str,
+        user_id: Optional[str] = None
+    ) -> str:
+        """
+        Cache a response for a query embedding and page context.
+
+        Pass the user id when the prompt included that user's context or
+        history, so the answer is only served back to them.
+
+        Returns:
+            str: Identifier of the new entry, usable with invalidate()
+        """
+        key = context_key(context, user_id)
+        entry = _Entry(uuid.uuid4().hex, key, _unit(embedding), response, time.monotonic() + self.ttl)
+
+        with self._lock:
+            bucket = self._by_context.setdefault(key, set())
+            if len(bucket) >= self.max_per_context:
+                # Evict the least recently used entry of this context
+                oldest = next(entry_id for entry_id in self._entries if entry_id in bucket)
+                self._remove(oldest)
+                bucket = self._by_context.setdefault(key, set())
+
+            self._entries[entry.entry_id] = entry
+            bucket.add(entry.entry_id)
+
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+        return entry.entry_id
+
+    def invalidate(self, entry_id: str) -> bool:
+        """Remove a single cached response. Returns True if it existed."""
+        with self._lock:
+            if entry_id not in self._entries:
+                return False
+            self._remove(entry_id)
+            return True
+
+    def invalidate_context(self, context: Optional[Dict[str, Any]], user_id: Optional[str] = None) -> int:
+        """Remove every cached response for a page context. Returns the number removed."""
+        with self._lock:
+            entry_ids = list(self._by_context.get(context_key(context, user_id), ()))
+            for entry_id in entry_ids:
+                self._remove(entry_id)
+            return len(entry_ids)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            return {"size": len(self._entries), "contexts": len(self._by_context), "hits": self.hits, "misses": self.misses}
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id)
+        bucket = self._by_context.get(entry.context_key)
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._by_context[entry.context_key]
+
+response_cache = SemanticResponseCache(
+    threshold=settings.RESPONSE_CACHE_SIMILARITY,
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL_SECONDS,
+    max_per_context=settings.RESPONSE_CACHE_MAX_PER_CONTEXT
+)
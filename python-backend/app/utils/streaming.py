@@ -0,0 +1,91 @@
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.metrics import errors, llm_time_to_first_token
+
+logger = logging.getLogger(__name__)
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # Stop reverse proxies from buffering the stream
+}
+
+class CachedText(str):
+    """Response text served from the response cache rather than generated by an LLM."""
+
+def format_sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """
+    Format a payload as a single Server-Sent Event.
+
+    Args:
+        data: JSON-serialisable payload
+        event: Optional event name, defaults to the generic message event
+
+    Returns:
+        str: Encoded SSE frame
+    """
+    frame = f"data: {json.dumps(data)}\n\n"
+    if event:
+        frame = f"event: {event}\n{frame}"
+    return frame
+
+async def sse_token_stream(
+    tokens: AsyncIterator[Optional[str]],
+    started_at: float,
+    on_complete: Optional[Callable[[str], None]] = None
+) -> AsyncIterator[str]:
+    """
+    Wrap an iterator of LLM tokens as SSE frames and record time-to-first-token.
+
+    A stream answered from the response cache (its tokens are CachedText) is
+    reported with `cached: true` and no time-to-first-token, so cache hits do
+    not skew the LLM TTFT metrics.
+
+    Args:
+        tokens: Async iterator yielding text deltas as the LLM produces them
+        started_at: time.perf_counter() value taken when the request arrived
+        on_complete: Optional callback receiving the full response text once
+            the stream finishes successfully
+
+    Yields:
+        str: One SSE frame per token, followed by a final "done" or "error" event
+    """
+    first_token_at = None
+    cached = False
+    parts: List[str] = []
+    try:
+        async for token in tokens:
+            if not token:
+                continue
+            if isinstance(token, CachedText):
+                cached = True
+            elif first_token_at is None:
+                first_token_at = time.perf_counter()
+                llm_time_to_first_token.observe(first_token_at - started_at)
+            parts.append(token)
+            yield format_sse({"token": token})
+    except Exception as e:
+        errors.labels(stage="stream").inc()
+        logger.error(f"Error while streaming chat response: {e}")
+        yield format_sse({"detail": "Error generating response"}, event="error")
+        return
+
+    if on_complete is not None and parts:
+        on_complete("".join(parts))
+
+    finished_at = time.perf_counter()
+    ttft_ms = (first_token_at - started_at) * 1000 if first_token_at else None
+    logger.info(
+        "Streamed chat response",
+        extra={"ttft_ms": ttft_ms, "cached": cached, "total_ms": round((finished_at - started_at) * 1000, 1)}
+    )
+    yield format_sse(
+        {"ttft_ms": ttft_ms, "cached": cached, "total_ms": (finished_at - started_at) * 1000},
+        event="done",
+    )
+
+async def single_chunk(text: str) -> AsyncIterator[str]:
+    """Present a response from the response cache as a one-token stream."""
+    yield CachedText(text)
@@ -0,0 +1,66 @@
+"""
+Import-time benchmark.
+
+Imports each module in a fresh interpreter and reports the wall-clock cost
+of the import as JSON. With lazy initialization none of these imports
+should touch the network or load a model.
+
+Usage (from python-backend/):
+    python benchmarks/import_time.py [--repeat 5] [module ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "database.pinecone_client",
+    "app.api.v1.search",
+    "app.main",
+    "main",
+    "data.mongo_to_pinecone",
+]
+
+SNIPPET = (
+    "import time; started = time.perf_counter(); "
+    "import {module}; "
+    "print(time.perf_counter() - started)"
+)
+
+def time_import(module, repeat):
+    """Return import durations in milliseconds, or the error output of a failed import"""
+    env = dict(os.environ, PYTHONPATH=str(BACKEND_DIR), WARMUP_ON_STARTUP="false")
+    durations = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=BACKEND_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "import failed"}
+        durations.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return {
+        "median_ms": round(statistics.median(durations), 1),
+        "min_ms": round(min(durations), 1),
+        "max_ms": round(max(durations), 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of backend modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    args = parser.parse_args()
+
+    report = {module: time_import(module, args.repeat) for module in args.modules}
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
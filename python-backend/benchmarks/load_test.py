@@ -0,0 +1,305 @@
+"""
+Offline load test of both FastAPI apps.
+
+Runs main.py and the app/ package in-process against local stand-ins for
+Pinecone, Groq/OpenAI and MongoDB (see benchmarks/stubs.py), drives each
+scenario at a fixed concurrency and reports latency percentiles and
+requests per second as JSON. Streaming scenarios also report time to the
+first chunk. Nothing leaves the machine, so results are comparable between
+runs on the same laptop.
+
+Usage (from python-backend/):
+    python benchmarks/load_test.py [--requests 500] [--concurrency 20] [scenario ...]
+
+Scenarios: root-chat, root-chat-stream, v1-chat, v1-search
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Configure the apps before they are imported
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+SCENARIOS = {
+    "root-chat": ("root", "/chat", False),
+    "root-chat-stream": ("root", "/chat/stream", True),
+    "v1-chat": ("v1", "/api/v1/chat", False),
+    "v1-search": ("v1", "/api/v1/search", False),
+}
+
+QUERIES = [
+    "wireless headphones with noise cancelling",
+    "running shoes under $100",
+    "best budget laptop for students",
+    "compare these two phones",
+    "is this blender dishwasher safe",
+    "gift ideas for a coffee lover",
+    "waterproof hiking backpack",
+    "4k monitor for photo editing",
+]
+
+USERS = 50
+
+def request_body(path: str, i: int, repeat_queries: bool = False, keyword_share: float = 0.0) -> Dict:
+    query = QUERIES[i % len(QUERIES)]
+    if keyword_share and (i * 0.618034) % 1 < keyword_share:
+        # An exact product name, which the keyword index can answer on its own
+        query = f"Product {abs(i) * 7919 % 1000}"
+    elif not repeat_queries:
+        # Unique text per request, so every request pays for its embedding
+        query = f"{query} #{i}"
+    if path.endswith("/search"):
+        return {"query": query, "top_k": 5}
+    return {
+        "message": query,
+        "context": {"title": "Sample product page", "url": "https://shop.example/item"},
+        "user_id": f"user-{i % USERS}",
+    }
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[position]
+
+def summarize(latencies: List[float], elapsed: float, failures: int, first_chunk: Optional[List[float]] = None) -> Dict:
+    summary = {
+        "requests": len(latencies) + failures,
+        "failures": failures,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    if latencies:
+        summary.update({
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        })
+    if first_chunk:
+        summary.update({
+            "first_chunk_p50_ms": round(percentile(first_chunk, 0.50) * 1000, 2),
+            "first_chunk_p95_ms": round(percentile(first_chunk, 0.95) * 1000, 2),
+            "first_chunk_p99_ms": round(percentile(first_chunk, 0.99) * 1000, 2),
+        })
+    return summary
+
+class RequestFailed(Exception):
+    pass
+
+async def asgi_post(app, path: str, payload: Dict, deadline_ms: Optional[float] = None) -> float:
+    """
+    POST JSON straight to an ASGI app and consume the response.
+
+    Talking ASGI directly, rather than through an HTTP client transport that
+    buffers the whole body, lets streaming responses be timed to their first chunk.
+
+    Returns:
+        float: perf_counter() timestamp of the first non-empty body chunk
+    """
+    body = json.dumps(payload).encode()
+    headers = [(b"host", b"bench"), (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    if deadline_ms is not None:
+        headers.append((b"x-request-deadline-ms", str(deadline_ms).encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status = None
+    first_chunk_at = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status, first_chunk_at
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            if first_chunk_at is None and message.get("body"):
+                first_chunk_at = time.perf_counter()
+            if not message.get("more_body", False):
+                response_done.set()
+
+    await app(scope, receive, send)
+    if status is None or status >= 400:
+        raise RequestFailed(f"{path} returned {status}")
+    return first_chunk_at or time.perf_counter()
+
+async def run_scenario(
+    app,
+    path: str,
+    streaming: bool,
+    requests: int,
+    concurrency: int,
+    repeat_queries: bool = False,
+    keyword_share: float = 0.0,
+    deadline_ms: Optional[float] = None
+) -> Dict:
+    """Send `requests` POSTs to `path` with `concurrency` in flight and summarize the latencies"""
+    latencies: List[float] = []
+    first_chunk: List[float] = []
+    failures = 0
+    counter = iter(range(requests))
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            first_chunk_at = await asgi_post(app, path, request_body(path, i, repeat_queries, keyword_share), deadline_ms)
+        except RequestFailed:
+            failures += 1
+            return
+        latencies.append(time.perf_counter() - started)
+        first_chunk.append(first_chunk_at - started)
+
+    async def worker() -> None:
+        for i in counter:
+            await one(i)
+
+    # Warm up route compilation and the index snapshot
+    await asyncio.gather(*(one(-1 - i) for i in range(min(concurrency, requests))))
+    latencies.clear()
+    first_chunk.clear()
+    failures = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return summarize(latencies, elapsed, failures, first_chunk if streaming else None)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmark of the chat and search endpoints")
+    parser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help=f"Scenarios to run: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="Requests in flight")
+    parser.add_argument("--catalog-size", type=int, default=20_000, help="Products in the stub vector index")
+    parser.add_argument("--llm-latency-ms", type=float, default=200, help="Fake LLM delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="Fake LLM generation speed")
+    parser.add_argument("--response-tokens", type=int, default=50, help="Tokens per fake completion")
+    parser.add_argument("--llm-slow-share", type=float, default=0.0, help="Fraction of completions that stall before the first token")
+    parser.add_argument("--llm-slow-latency-ms", type=float, default=2000, help="Extra delay of a stalled completion")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged LLM requests across two fake providers")
+    parser.add_argument("--embedding-latency-ms", type=float, default=30, help="Fake embeddings API latency")
+    parser.add_argument("--vector-latency-ms", type=float, default=0, help="Extra latency added to each vector query")
+    parser.add_argument("--mongo-latency-ms", type=float, default=5, help="Fake MongoDB round-trip latency")
+    parser.add_argument("--persist-conversations", action="store_true", help="Queue chat turns to the in-memory MongoDB")
+    parser.add_argument("--personalize", action="store_true", help="Fetch user context and recent history for root chat requests")
+    parser.add_argument("--repeat-queries", action="store_true", help="Cycle through a few fixed queries so caches can hit")
+    parser.add_argument("--keyword-index", action="store_true", help="Enable the BM25 keyword fast path and rank fusion")
+    parser.add_argument("--keyword-share", type=float, default=0.0, help="Fraction of requests asking for an exact product name")
+    parser.add_argument("--document-store", action="store_true", help="Hydrate match texts from a memory-mapped document store")
+    parser.add_argument("--deadline-ms", type=float, help="Send this request deadline in X-Request-Deadline-Ms")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    import main as root_main
+    from app.main import app as v1_app
+    from benchmarks.stubs import (
+        FakeLLMClient, InMemoryMongoClient, build_catalog, build_document_store, build_keyword_index, install_stubs
+    )
+
+    def fake_llm(seed: int) -> FakeLLMClient:
+        return FakeLLMClient(
+            latency_ms=args.llm_latency_ms,
+            tokens_per_second=args.tokens_per_second,
+            response_tokens=args.response_tokens,
+            embedding_latency_ms=args.embedding_latency_ms,
+            slow_share=args.llm_slow_share,
+            slow_latency_ms=args.llm_slow_latency_ms,
+            seed=seed,
+        )
+
+    # Every gateway provider gets its own fake, so their stalls are independent
+    from app.services.llm_gateway import llm_gateway
+    llm = fake_llm(0)
+    providers = {provider.name: fake_llm(i + 1) for i, provider in enumerate(llm_gateway.providers)}
+    llm_gateway.hedging = args.hedge
+    index = build_catalog(args.catalog_size)
+    mongo = InMemoryMongoClient(args.mongo_latency_ms)
+    keywords = None
+    if args.keyword_index:
+        from app.core.config import settings
+        settings.KEYWORD_INDEX_ENABLED = True
+        keywords = build_keyword_index(index)
+    documents = None
+    if args.document_store:
+        from app.core.config import settings
+        settings.DOCUMENT_STORE_ENABLED = True
+        documents = build_document_store(index, os.path.join(tempfile.mkdtemp(), "catalog.docs"))
+    # Every request comes from the same address; measure the apps rather than the rate limiter
+    from app.core.config import settings
+    settings.RATE_LIMIT_PER_MINUTE = 10 ** 9
+    install_stubs(
+        llm, index, mongo,
+        vector_latency_ms=args.vector_latency_ms, keywords=keywords, documents=documents, providers=providers
+    )
+    if args.persist_conversations:
+        from app.core.config import settings
+        settings.CONVERSATION_PERSISTENCE_ENABLED = True
+    if args.personalize:
+        from app.core.config import settings
+        settings.CHAT_PERSONALIZATION_ENABLED = True
+        user_context = mongo[settings.MONGODB_DB_NAME]["user_context"]
+        user_context.documents.extend(
+            {"_id": f"ctx-{i}", "user_id": f"user-{i}", "preferred_brands": "Acme", "budget": "mid-range"}
+            for i in range(USERS)
+        )
+
+    apps = {"root": root_main.app, "v1": v1_app}
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("scenarios", "output")},
+        "results": {},
+    }
+
+    async def run_all() -> None:
+        # One event loop for every scenario: the apps' semaphores and queues bind to it
+        for name in args.scenarios:
+            app_name, path, streaming = SCENARIOS[name]
+            report["results"][name] = await run_scenario(
+                apps[app_name], path, streaming, args.requests, args.concurrency,
+                args.repeat_queries, args.keyword_share, args.deadline_ms
+            )
+
+    asyncio.run(run_all())
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+if __name__ == "__main__":
+    main()
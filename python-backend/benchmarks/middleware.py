@@ -0,0 +1,141 @@
+"""
+Middleware stack benchmark.
+
+Serves /health and a stubbed /search through the previous
+BaseHTTPMiddleware stack and the pure-ASGI stack, and reports requests per
+second for each as JSON. Requests go through httpx's in-process ASGI
+transport, so no server, network or model is needed; /search runs a query
+against a random in-memory vector index in place of the embedding model
+and Pinecone.
+
+Usage (from python-backend/):
+    python benchmarks/middleware.py [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.middleware import RateLimitMiddleware, RequestLoggingMiddleware, SecurityHeadersMiddleware
+from app.core.rate_limiter import SlidingWindowRateLimiter
+from database.local_index import LocalVectorIndex
+
+CSP = "default-src 'self'"
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        response.headers["Content-Security-Policy"] = CSP
+        return response
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware rate limiter, using the same limiter so only the middleware style differs"""
+    def __init__(self, app, limiter):
+        super().__init__(app)
+        self.limiter = limiter
+
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path == "/health":
+            return await call_next(request)
+        result = await self.limiter.check(request.client.host if request.client else "unknown")
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        response.headers["X-Rate-Limit-Limit"] = str(result.limit)
+        response.headers["X-Rate-Limit-Remaining"] = str(result.remaining)
+        response.headers["X-Rate-Limit-Reset"] = str(int(result.reset_after))
+        return response
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.time()
+        logging.getLogger(__name__).info(f"Request: {request.method} {request.url.path}")
+        response = await call_next(request)
+        logging.getLogger(__name__).info(f"Response: {response.status_code} {time.time() - start_time:.3f}s")
+        return response
+
+def build_app(stack, index):
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/search")
+    async def search(query: str, top_k: int = 5):
+        vector = np.random.default_rng(len(query)).standard_normal(index.dimension)
+        results = index.query(vector=vector.tolist(), top_k=top_k, include_metadata=True)
+        return {"results": [{"id": match.id, "score": match.score, **(match.metadata or {})} for match in results.matches]}
+
+    limiter = SlidingWindowRateLimiter(limit=10 ** 9)
+    if stack == "base_http":
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, limiter=limiter)
+        app.add_middleware(LegacyRequestLoggingMiddleware)
+    else:
+        app.add_middleware(SecurityHeadersMiddleware, headers={"Content-Security-Policy": CSP})
+        app.add_middleware(RateLimitMiddleware, limiter=limiter)
+        app.add_middleware(RequestLoggingMiddleware)
+    return app
+
+def build_index(size, dimension=384, seed=0):
+    rng = np.random.default_rng(seed)
+    index = LocalVectorIndex(dimension)
+    index.upsert([
+        {"id": f"product_{i}", "values": values, "metadata": {"title": f"Product {i}"}}
+        for i, values in enumerate(rng.standard_normal((size, dimension)).astype(np.float32))
+    ])
+    return index
+
+async def measure(app, path, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up routing and the index snapshot
+        for _ in range(10):
+            (await client.get(path)).raise_for_status()
+
+        remaining = requests
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                (await client.get(path)).raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return round(requests / elapsed, 1)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare BaseHTTPMiddleware and pure-ASGI middleware throughput")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests per endpoint and stack")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent in-flight requests")
+    parser.add_argument("--catalog-size", type=int, default=10_000, help="Vectors in the stub /search index")
+    parser.add_argument("--log", action="store_true", help="Keep request logging output enabled")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    index = build_index(args.catalog_size)
+    report = {}
+    for path in ("/health", "/search?query=wireless+headphones"):
+        report[path.split("?")[0]] = {
+            stack: {"rps": asyncio.run(measure(build_app(stack, index), path, args.requests, args.concurrency))}
+            for stack in ("base_http", "pure_asgi")
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Rate limiter benchmark.
+
+Replays requests from many distinct client IPs through the previous
+list-of-timestamps limiter and the sliding-window-counter limiter, and
+reports per-check latency and retained memory as JSON.
+
+Usage (from python-backend/):
+    python benchmarks/rate_limiter.py [--ips 100000] [--requests 500000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.rate_limiter import InMemoryRateLimitBackend, SlidingWindowRateLimiter
+
+class ListRateLimiter:
+    """The previous RateLimitMiddleware logic: one datetime per request, filtered on every check"""
+    def __init__(self, limit, window=60):
+        self.limit = limit
+        self.window = window
+        self.requests = {}
+
+    def check(self, ip):
+        now = datetime.now()
+        if ip not in self.requests:
+            self.requests[ip] = []
+        self.requests[ip] = [
+            timestamp for timestamp in self.requests[ip]
+            if now - timestamp < timedelta(seconds=self.window)
+        ]
+        if len(self.requests[ip]) >= self.limit:
+            return False
+        self.requests[ip].append(now)
+        return True
+
+def make_traffic(ips, requests, seed=0):
+    """Client IPs for each request; a few hot clients send most of the traffic"""
+    rng = random.Random(seed)
+    addresses = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(ips)]
+    hot = addresses[:max(1, ips // 100)]
+    traffic = [rng.choice(hot) if rng.random() < 0.5 else rng.choice(addresses) for _ in range(requests)]
+    # Make sure every address is seen at least once
+    traffic.extend(addresses)
+    rng.shuffle(traffic)
+    return traffic
+
+def summarize(name, started, finished, peak, allowed, total, keys):
+    return {
+        "limiter": name,
+        "requests": total,
+        "allowed": allowed,
+        "tracked_keys": keys,
+        "us_per_check": round((finished - started) / total * 1e6, 3),
+        "peak_memory_mb": round(peak / 2 ** 20, 1),
+    }
+
+def run_list(traffic, limit):
+    limiter = ListRateLimiter(limit)
+    tracemalloc.start()
+    started = time.perf_counter()
+    allowed = sum(limiter.check(ip) for ip in traffic)
+    finished = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize("list", started, finished, peak, allowed, len(traffic), len(limiter.requests))
+
+def run_sliding_window(traffic, limit, max_keys):
+    backend = InMemoryRateLimitBackend(max_keys=max_keys)
+    limiter = SlidingWindowRateLimiter(limit, window=60, backend=backend)
+
+    async def replay():
+        allowed = 0
+        for ip in traffic:
+            allowed += (await limiter.check(ip)).allowed
+        return allowed
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    allowed = asyncio.run(replay())
+    finished = time.perf_counter()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize("sliding_window", started, finished, peak, allowed, len(traffic), len(backend))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rate limiter with many distinct clients")
+    parser.add_argument("--ips", type=int, default=100_000, help="Distinct client IPs")
+    parser.add_argument("--requests", type=int, default=500_000, help="Requests on top of one per IP")
+    parser.add_argument("--limit", type=int, default=60, help="Requests allowed per minute")
+    parser.add_argument("--max-keys", type=int, default=100_000, help="Key bound of the in-memory backend")
+    args = parser.parse_args()
+
+    traffic = make_traffic(args.ips, args.requests)
+    report = [
+        run_list(traffic, args.limit),
+        run_sliding_window(traffic, args.limit, args.max_keys),
+    ]
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Local stand-ins for the external services, used by the offline benchmarks.
+
+    FakeLLMClient        Groq/OpenAI-compatible chat completions (plain and
+                         streaming) and embeddings, with configurable latency
+                         and token rate
+    FakeSentenceTransformer
+                         Deterministic replacement for the /search encoder
+    InMemoryMongoClient  The subset of the Motor API used by the services
+    build_catalog        A LocalVectorIndex filled with synthetic products
+    build_keyword_index  The BM25 keyword index over the same products
+    build_document_store The memory-mapped document store of the same products
+
+install_stubs() patches both FastAPI apps to use them.
+"""
+import asyncio
+import hashlib
+import itertools
+import random
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from database.document_store import DocumentStore
+from database.keyword_index import KeywordIndex
+from database.local_index import LocalVectorIndex
+
+def text_vector(text: str, dimension: int) -> np.ndarray:
+    """Deterministic unit vector for a text, so repeated queries embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+class _Completions:
+    def __init__(self, client: "FakeLLMClient"):
+        self.client = client
+
+    async def create(self, messages: List[Dict[str, str]], stream: bool = False, **kwargs):
+        await asyncio.sleep(self.client.first_token_delay())
+        self.client.requests += 1
+        if not stream:
+            # A non-streaming completion arrives once every token has been generated
+            await asyncio.sleep(self.client.token_interval * len(self.client.tokens))
+            message = SimpleNamespace(content="".join(self.client.tokens))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._stream()
+
+    async def _stream(self):
+        for token in self.client.tokens:
+            await asyncio.sleep(self.client.token_interval)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+class _Embeddings:
+    def __init__(self, client: "FakeLLMClient"):
+        self.client = client
+
+    async def create(self, model: str, input: Any, **kwargs):
+        await asyncio.sleep(self.client.embedding_latency)
+        texts = [input] if isinstance(input, str) else list(input)
+        data = [
+            SimpleNamespace(index=i, embedding=text_vector(text, self.client.dimension).tolist())
+            for i, text in enumerate(texts)
+        ]
+        return SimpleNamespace(data=data)
+
+class FakeLLMClient:
+    """
+    Stand-in for AsyncGroq and AsyncOpenAI.
+
+    Args:
+        latency_ms: Delay before the first token (and per embeddings request)
+        tokens_per_second: Generation speed; 0 means instant
+        response_tokens: Number of tokens in every completion
+        embedding_latency_ms: Delay of an embeddings request
+        dimension: Embedding dimension
+        slow_share: Fraction of completions that stall before the first token
+        slow_latency_ms: Extra delay of a stalled completion
+        seed: Seed deciding which completions stall
+    """
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        tokens_per_second: float = 100,
+        response_tokens: int = 50,
+        embedding_latency_ms: float = 30,
+        dimension: int = 384,
+        slow_share: float = 0.0,
+        slow_latency_ms: float = 0,
+        seed: int = 0
+    ):
+        self.latency = latency_ms / 1000
+        self.slow_share = slow_share
+        self.slow_latency = slow_latency_ms / 1000
+        self._random = random.Random(seed)
+        self.token_interval = 1 / tokens_per_second if tokens_per_second else 0
+        self.tokens = [f"token{i} " for i in range(response_tokens)]
+        self.embedding_latency = embedding_latency_ms / 1000
+        self.dimension = dimension
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.embeddings = _Embeddings(self)
+
+    def first_token_delay(self) -> float:
+        """Delay before the first token, occasionally stalled to simulate tail latency"""
+        if self.slow_share and self._random.random() < self.slow_share:
+            return self.latency + self.slow_latency
+        return self.latency
+
+class FakeSentenceTransformer:
+    """Deterministic encoder with the SentenceTransformer.encode signature"""
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def encode(self, texts, batch_size: int = 32, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return text_vector(texts, self.dimension)
+        return np.stack([text_vector(text, self.dimension) for text in texts])
+
+class _Cursor:
+    def __init__(self, documents: List[Dict[str, Any]]):
+        self.documents = documents
+
+    def sort(self, key: str, direction: int = 1) -> "_Cursor":
+        self.documents.sort(key=lambda document: document.get(key), reverse=direction < 0)
+        return self
+
+    def limit(self, count: int) -> "_Cursor":
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.documents[:length]
+
+def _matches(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    return all(document.get(key) == value for key, value in (query or {}).items())
+
+class InMemoryCollection:
+    """Async collection supporting the Motor calls made by the services"""
+    _ids = itertools.count(1)
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency = latency_ms / 1000
+        self.documents: List[Dict[str, Any]] = []
+
+    async def _round_trip(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def insert_one(self, document: Dict[str, Any]):
+        await self._round_trip()
+        document = {"_id": next(self._ids), **document}
+        self.documents.append(document)
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True):
+        await self._round_trip()
+        inserted = [{"_id": next(self._ids), **document} for document in documents]
+        self.documents.extend(inserted)
+        return SimpleNamespace(inserted_ids=[document["_id"] for document in inserted])
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None):
+        await self._round_trip()
+        return next((document for document in self.documents if _matches(document, query)), None)
+
+    def find(self, query: Optional[Dict[str, Any]] = None) -> _Cursor:
+        return _Cursor([document for document in self.documents if _matches(document, query)])
+
+class InMemoryMongoClient:
+    """Dictionary of databases of InMemoryCollections, indexed like a Motor client"""
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.databases: Dict[str, Dict[str, InMemoryCollection]] = {}
+
+    def __getitem__(self, database: str) -> "_Database":
+        return _Database(self, self.databases.setdefault(database, {}))
+
+    def close(self) -> None:
+        pass
+
+class _Database:
+    def __init__(self, client: InMemoryMongoClient, collections: Dict[str, InMemoryCollection]):
+        self.client = client
+        self.collections = collections
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self.collections:
+            self.collections[name] = InMemoryCollection(self.client.latency_ms)
+        return self.collections[name]
+
+def build_catalog(size: int, dimension: int = 384, seed: int = 0) -> LocalVectorIndex:
+    """A local index of `size` synthetic products with text metadata"""
+    rng = np.random.default_rng(seed)
+    index = LocalVectorIndex(dimension)
+    vectors = rng.standard_normal((size, dimension)).astype(np.float32)
+    index.upsert([
+        {
+            "id": f"product_{i}",
+            "values": vectors[i],
+            "metadata": {"text": f"Product {i}: a sample item for benchmarking", "price": float(i % 500)},
+        }
+        for i in range(size)
+    ])
+    return index
+
+def build_keyword_index(index: LocalVectorIndex, namespace: str = "") -> KeywordIndex:
+    """A keyword index over the texts of a local vector index"""
+    keywords = KeywordIndex()
+    records = index._namespace(namespace).records
+    keywords.upsert((vector_id, metadata["text"], metadata) for vector_id, (_, metadata) in records.items())
+    return keywords
+
+def build_document_store(index: LocalVectorIndex, path: str, namespace: str = "") -> DocumentStore:
+    """A document store, saved at `path`, holding the metadata of a local vector index"""
+    documents = DocumentStore(path)
+    records = index._namespace(namespace).records
+    documents.upsert((vector_id, metadata) for vector_id, (_, metadata) in records.items())
+    documents.save()
+    return documents
+
+def install_stubs(
+    llm: FakeLLMClient,
+    index: LocalVectorIndex,
+    mongo: InMemoryMongoClient,
+    vector_latency_ms: float = 0,
+    keywords: Optional[KeywordIndex] = None,
+    documents: Optional[DocumentStore] = None,
+    providers: Optional[Dict[str, FakeLLMClient]] = None
+) -> None:
+    """
+    Point both apps at the stand-ins.
+
+    Must run after main and app.main are imported. Vector queries still go
+    through run_blocking, so executor and concurrency limits are exercised.
+    A keyword index or document store, when given, replaces the one loaded
+    from disk.
+    `providers` gives individual LLM gateway providers their own fake
+    client, e.g. a slower one; the others use `llm`.
+    """
+    import time
+
+    import main
+    from app.api.v1 import chat, search
+    from app.database.mongo import mongodb
+    from app.database.vector_store import vector_store
+    from app.services.llm_gateway import llm_gateway
+
+    providers = providers or {}
+
+    class SlowIndex:
+        def query(self, **kwargs):
+            if vector_latency_ms:
+                time.sleep(vector_latency_ms / 1000)
+            return index.query(**kwargs)
+
+        def upsert(self, **kwargs):
+            return index.upsert(**kwargs)
+
+        def fetch(self, **kwargs):
+            return index.fetch(**kwargs)
+
+    # Vector queries of both apps go through the shared vector store
+    slow_index = SlowIndex()
+    vector_store.get_index = lambda: slow_index
+
+    # main.py (OpenAI embeddings)
+    main.get_openai_client = lambda: llm
+
+    # Chat completions for both apps go through the LLM gateway
+    for provider in llm_gateway.providers:
+        provider.client = lambda client=providers.get(provider.name, llm): client
+
+    # app/ package (OpenAI chat service, SentenceTransformer search)
+    encoder = FakeSentenceTransformer(index.dimension)
+    search.get_model = lambda: encoder
+    if chat.chat_service is not None:
+        chat.chat_service.openai_client = llm
+
+    mongodb.client = mongo
+
+    if keywords is not None:
+        from app.services import keyword_search
+        keyword_search.get_keyword_index = lambda: keywords
+
+    if documents is not None:
+        from app.services import keyword_search
+        vector_store.get_documents = lambda: documents
+        keyword_search.get_document_store = lambda: documents
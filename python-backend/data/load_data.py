@@ -1,18 +1,103 @@
+import argparse
+import asyncio
 import json
 import os
-from openai import OpenAI
-from database.pinecone_client import index
+import random
+import time
+import openai
+from app.core.clients import get_openai_client
+from database.document_store import DOCUMENT_STORE_ENABLED, open_document_store
+from database.pinecone_client import get_index, persist_index, upsert_in_batches, INDEX_NAME
+from embeddings.pipeline import delete_vectors
+from embeddings.sync_state import SyncState
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
 
-def get_embedding(text):
-    """Get embedding for a given text using OpenAI's API"""
-    response = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=text
-    )
-    return response.data[0].embedding
+# Content hashes of the Q&A vectors, used by incremental uploads
+SYNC_STATE_NAME = f"{INDEX_NAME}-qa"
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Batching and rate limit configuration
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "50000"))  # Token budget per embeddings request
+EMBED_BATCH_MAX_INPUTS = int(os.getenv("EMBED_BATCH_MAX_INPUTS", "2048"))  # API limit on inputs per request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))
+EMBED_BACKOFF_BASE = 0.5  # seconds
+EMBED_BACKOFF_CAP = 30.0  # seconds
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Shared OpenAI client and connection pool; retries are handled below with jittered backoff
+client = get_openai_client().with_options(max_retries=0)
+
+_encoding = tiktoken.encoding_for_model(EMBEDDING_MODEL) if tiktoken else None
+
+def count_tokens(text):
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def make_batches(items, max_tokens=EMBED_BATCH_TOKENS, max_inputs=EMBED_BATCH_MAX_INPUTS):
+    """
+    Group (vector_id, text, metadata) items into token-budgeted batches.
+
+    Args:
+        items: List of (vector_id, text, metadata) tuples
+        max_tokens: Maximum estimated tokens per batch
+        max_inputs: Maximum number of inputs per batch
+
+    Returns:
+        list: List of batches, each a list of items
+    """
+    batches, batch, batch_tokens = [], [], 0
+    for item in items:
+        tokens = count_tokens(item[1])
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def backoff_delay(attempt, error):
+    """Full-jitter exponential backoff, honouring Retry-After when the API sends it"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after) + random.uniform(0, EMBED_BACKOFF_BASE)
+        except ValueError:
+            pass
+    return random.uniform(0, min(EMBED_BACKOFF_CAP, EMBED_BACKOFF_BASE * 2 ** attempt))
+
+async def get_embeddings(texts, semaphore):
+    """Get embeddings for a batch of texts in one request, retrying rate limits and transient errors"""
+    for attempt in range(EMBED_MAX_RETRIES + 1):
+        try:
+            async with semaphore:
+                response = await client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=texts
+                )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+        except RETRYABLE_ERRORS as e:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt, e)
+            print(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
 
 def load_qa_pairs():
     """Load Q&A pairs from JSON file"""
@@ -20,35 +105,106 @@ def load_qa_pairs():
         data = json.load(file)
     return data['qa_pairs']
 
-def upload_to_pinecone():
-    """Process Q&A pairs and upload to Pinecone"""
+async def upload_to_pinecone_async(incremental=False, concurrency=EMBED_CONCURRENCY):
+    """
+    Embed Q&A pairs in concurrent batches and bulk upsert them as batches complete.
+
+    With incremental=True, pairs whose text is unchanged since the last run
+    are skipped and vectors of pairs that no longer exist are deleted. With
+    DOCUMENT_STORE_ENABLED, the metadata of every pair is written to the
+    document store first.
+    """
+    started_at = time.perf_counter()
     qa_pairs = load_qa_pairs()
-    
-    # Process each Q&A pair
+    state = SyncState(SYNC_STATE_NAME)
+    if not incremental:
+        state.hashes = {}
+
+    # Combine question and answer for context
+    current_ids = set()
+    documents = []
+    items = []
     for i, pair in enumerate(qa_pairs):
-        # Combine question and answer for context
-        combined_text = f"Question: {pair['question']}\nAnswer: {pair['answer']}"
-        
-        # Get embedding for the combined text
-        embedding = get_embedding(combined_text)
-        
-        # Prepare metadata
+        vector_id = f'qa_pair_{i}'
+        current_ids.add(vector_id)
         metadata = {
             'question': pair['question'],
             'answer': pair['answer']
         }
-        
-        # Upload to Pinecone
-        index.upsert(
-            vectors=[{
-                'id': f'qa_pair_{i}',
-                'values': embedding,
-                'metadata': metadata
-            }]
-        )
-        print(f"Uploaded Q&A pair {i + 1}/{len(qa_pairs)}")
+        documents.append((vector_id, metadata))
+        combined_text = f"Question: {pair['question']}\nAnswer: {pair['answer']}"
+        if state.is_current(vector_id, combined_text):
+            continue
+        items.append((vector_id, combined_text, metadata))
+
+    document_store = open_document_store() if DOCUMENT_STORE_ENABLED else None
+    if document_store is not None:
+        document_store.upsert(documents)
+        document_store.save()
+
+    batches = make_batches(items)
+    print(f"Embedding {len(items)}/{len(qa_pairs)} Q&A pairs in {len(batches)} batches")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    index = await loop.run_in_executor(None, get_index)
+
+    async def embed_batch(batch):
+        try:
+            return batch, await get_embeddings([text for _, text, _ in batch], semaphore)
+        except Exception as e:
+            # Skip this batch only; pairs already embedded are still uploaded and recorded
+            print(f"Error embedding batch of {len(batch)} Q&A pairs: {e}")
+            return batch, None
+
+    # Upsert each batch as soon as its embeddings arrive, while other batches are still embedding
+    uploads = []
+    uploaded = 0
+    for next_batch in asyncio.as_completed([embed_batch(batch) for batch in batches]):
+        batch, embeddings = await next_batch
+        if embeddings is None:
+            continue
+        vectors = [
+            {'id': vector_id, 'values': embedding, 'metadata': metadata}
+            for (vector_id, _, metadata), embedding in zip(batch, embeddings)
+        ]
+        uploads.append((batch, loop.run_in_executor(None, upsert_in_batches, index, vectors)))
+
+    for batch, upload in uploads:
+        try:
+            await upload
+        except Exception as e:
+            print(f"Error upserting batch of {len(batch)} Q&A pairs: {e}")
+            continue
+        for vector_id, text, _ in batch:
+            state.record(vector_id, text)
+        uploaded += len(batch)
+        print(f"Uploaded {uploaded}/{len(items)} Q&A pairs")
+
+    removed = [vector_id for vector_id in state.hashes if vector_id not in current_ids]
+    if removed:
+        delete_vectors(index, removed)
+        if document_store is not None:
+            document_store.delete(removed)
+            document_store.save()
+        state.forget(removed)
+        print(f"Deleted {len(removed)} removed Q&A pairs")
+
+    state.save()
+    persist_index(index)
+
+    elapsed = time.perf_counter() - started_at
+    print(f"Uploaded {uploaded} Q&A pairs in {elapsed:.1f}s ({uploaded / elapsed if elapsed else 0:.1f} pairs/s)")
+
+def upload_to_pinecone(incremental=False):
+    """Process Q&A pairs and upload to Pinecone"""
+    asyncio.run(upload_to_pinecone_async(incremental=incremental))
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed the sample Q&A pairs into the vector index")
+    parser.add_argument("--incremental", action="store_true", help="Only embed new or changed pairs and delete removed ones")
+    args = parser.parse_args()
+
     print("Starting data upload to Pinecone...")
-    upload_to_pinecone()
+    upload_to_pinecone(incremental=args.incremental)
     print("Data upload complete!")
@@ -1,5 +1,6 @@
-import os
+import argparse
 import sys
+import time
 from pathlib import Path
 import logging
 
@@ -7,29 +8,46 @@ import logging
 parent_dir = str(Path(__file__).resolve().parent.parent)
 sys.path.append(parent_dir)
 
-from sentence_transformers import SentenceTransformer
-from database.mongo_client import get_data_from_mongo
-from database.pinecone_client import index
+from functools import lru_cache
+from database.document_store import DOCUMENT_STORE_ENABLED, open_document_store
+from database.mongo_client import get_data_from_mongo, get_products_collection
+from database.keyword_index import PRODUCTS_KEYWORD_INDEX, open_keyword_index
+from database.pinecone_client import get_index, persist_index, INDEX_NAME, UPSERT_BATCH_SIZE, UPSERT_WORKERS
+from embeddings.pipeline import (
+    ENCODE_BATCH_SIZE, chain_callbacks, delete_vectors, document_recorder, ingest_documents, keyword_recorder,
+    mongo_vector_id, rebuild_keyword_index, state_recorder, sync_documents, update_document_store
+)
+from embeddings.sync_state import SyncState
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the sentence transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')
+@lru_cache()
+def get_model():
+    """Load the sentence transformer model on first use"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('all-MiniLM-L6-v2')
 
-def get_embedding(text):
-    """Get embedding for a given text using sentence-transformers"""
-    try:
-        # Generate embedding
-        embedding = model.encode(text, convert_to_tensor=False)
-        return embedding.tolist()
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}")
-        return None
+# Content hashes of the product vectors, used by incremental syncs
+SYNC_STATE_NAME = f"{INDEX_NAME}-products"
 
-def transfer_data_to_pinecone():
-    """Transfer data from MongoDB to Pinecone"""
+def transfer_data_to_pinecone(
+    encode_batch_size=ENCODE_BATCH_SIZE,
+    upsert_batch_size=UPSERT_BATCH_SIZE,
+    upsert_workers=UPSERT_WORKERS,
+    incremental=False
+):
+    """
+    Transfer data from MongoDB to Pinecone
+    
+    A full transfer re-embeds every document and records its content hash;
+    an incremental transfer only embeds new or changed descriptions and
+    deletes the vectors of documents removed from MongoDB. Either way the
+    BM25 keyword index is rebuilt from the same documents. With
+    DOCUMENT_STORE_ENABLED, the document store is updated before any vector
+    is written, so queries can hydrate every match they get.
+    """
     logger.info("Fetching data from MongoDB...")
     mongo_data = get_data_from_mongo()
     
@@ -38,44 +56,150 @@ def transfer_data_to_pinecone():
         return
     
     logger.info(f"Found {len(mongo_data)} documents in MongoDB")
+    ingest_options = {
+        "encode_batch_size": encode_batch_size,
+        "upsert_batch_size": upsert_batch_size,
+        "upsert_workers": upsert_workers
+    }
+    state = SyncState(SYNC_STATE_NAME)
+    model, index = get_model(), get_index()
     
-    # Process each document
-    for i, doc in enumerate(mongo_data):
-        try:
-            # Get the description text from MongoDB document
-            text = doc.get('description', '')
-            if not text:
-                logger.warning(f"Skipping document {doc['_id']} - no description found")
-                continue
-            
-            # Generate embedding for the text
-            embedding = get_embedding(text)
-            if not embedding:
-                logger.warning(f"Skipping document {doc['_id']} - embedding generation failed")
-                continue
-            
-            # Prepare metadata
-            metadata = {
-                'mongo_id': str(doc['_id']),
-                'text': text[:1000]  # Store first 1000 chars of text in metadata
-            }
-            
-            # Upload to Pinecone
-            index.upsert(
-                vectors=[{
-                    'id': f'mongo_{str(doc["_id"])}',
-                    'values': embedding,
-                    'metadata': metadata
-                }]
-            )
-            
-            logger.info(f"Processed document {i + 1}/{len(mongo_data)}")
+    if DOCUMENT_STORE_ENABLED:
+        current_ids = {mongo_vector_id(doc) for doc in mongo_data}
+        documents = open_document_store()
+        update_document_store(documents, mongo_data, removed=[vector_id for vector_id in state.hashes if vector_id not in current_ids])
+        documents.save()
+    
+    if incremental:
+        stats = sync_documents(mongo_data, model, index, state, **ingest_options)
+    else:
+        # Embed in batches and upload with concurrent bulk upserts
+        state.hashes = {}
+        stats = ingest_documents(
+            mongo_data,
+            model,
+            index,
+            on_indexed=state_recorder(state),
+            **ingest_options
+        )
+        state.save()
+    
+    persist_index(index)
+    
+    keywords = open_keyword_index(PRODUCTS_KEYWORD_INDEX)
+    rebuild_keyword_index(keywords, mongo_data)
+    keywords.save()
+    return stats
+
+def watch_for_changes(max_batch=ENCODE_BATCH_SIZE, max_wait=1.0, **ingest_options):
+    """
+    Keep the index in sync by tailing the MongoDB change stream.
+    
+    Changes are grouped for up to `max_wait` seconds or `max_batch` documents
+    and applied with one batched encode. The resume token is saved after each
+    batch so a restarted watcher continues where it stopped. Change streams
+    require MongoDB to run as a replica set.
+    
+    Documents whose upsert failed stay pending and are retried with the next
+    batch; until they are indexed the resume token is not advanced, so a
+    restart replays them rather than skipping them.
+    """
+    state = SyncState(SYNC_STATE_NAME)
+    model, index = get_model(), get_index()
+    keywords = open_keyword_index(PRODUCTS_KEYWORD_INDEX)
+    documents = open_document_store() if DOCUMENT_STORE_ENABLED else None
+    collection = get_products_collection()
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    
+    upserts = {}
+    deletes = set()
+    batch_started = None
+    
+    def apply_batch(resume_token):
+        """Apply the pending changes and return the upserts that could not be indexed"""
+        changed = [doc for doc_id, doc in upserts.items() if not state.is_current(doc_id, doc['description'])]
+        indexed = 0
+        if changed:
+            if documents is not None:
+                document_recorder(documents)(changed)
+                documents.save()
+            indexed = ingest_documents(
+                changed, model, index,
+                on_indexed=chain_callbacks(state_recorder(state), keyword_recorder(keywords)),
+                **ingest_options
+            ).indexed
+        if deletes:
+            delete_vectors(index, list(deletes))
+            keywords.delete(deletes)
+            if documents is not None:
+                documents.delete(deletes)
+                documents.save()
+            state.forget(deletes)
+        
+        failed = {doc_id: doc for doc_id, doc in upserts.items() if not state.is_current(doc_id, doc['description'])}
+        logger.info(f"Applied change batch: {len(changed) - len(failed)} upserted, {len(failed)} failed, {len(deletes)} deleted")
+        if failed:
+            logger.warning(f"Keeping the previous resume token until {len(failed)} failed documents are indexed")
+        else:
+            state.resume_token = resume_token
+        state.save()
+        persist_index(index)
+        if indexed or deletes:
+            keywords.save()
+        return failed
+    
+    logger.info("Watching MongoDB change stream...")
+    with collection.watch(
+        pipeline,
+        full_document="updateLookup",
+        resume_after=state.resume_token,
+        max_await_time_ms=int(max_wait * 1000)
+    ) as stream:
+        while stream.alive:
+            change = stream.try_next()
+            if change is not None:
+                doc_id = mongo_vector_id(change["documentKey"])
+                document = change.get("fullDocument")
+                if document and document.get('description'):
+                    upserts[doc_id] = document
+                    deletes.discard(doc_id)
+                else:
+                    upserts.pop(doc_id, None)
+                    if doc_id in state.hashes:
+                        deletes.add(doc_id)
+                batch_started = batch_started or time.monotonic()
             
-        except Exception as e:
-            logger.error(f"Error processing document {doc.get('_id', i)}: {e}")
-            continue
+            pending = len(upserts) + len(deletes)
+            if batch_started and (pending >= max_batch or change is None or time.monotonic() - batch_started >= max_wait):
+                failed = apply_batch(stream.resume_token)
+                upserts.clear()
+                upserts.update(failed)
+                deletes.clear()
+                batch_started = time.monotonic() if failed else None
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed MongoDB product descriptions into the vector index")
+    parser.add_argument("--encode-batch-size", type=int, default=ENCODE_BATCH_SIZE, help="Texts per model.encode call")
+    parser.add_argument("--upsert-batch-size", type=int, default=UPSERT_BATCH_SIZE, help="Vectors per upsert request")
+    parser.add_argument("--upsert-workers", type=int, default=UPSERT_WORKERS, help="Concurrent upsert requests")
+    parser.add_argument("--incremental", action="store_true", help="Only embed new or changed documents and delete removed ones")
+    parser.add_argument("--watch", action="store_true", help="After syncing, keep applying changes from the MongoDB change stream")
+    args = parser.parse_args()
+    
     logger.info("Starting data transfer from MongoDB to Pinecone...")
-    transfer_data_to_pinecone()
-    logger.info("Data transfer complete!")
+    stats = transfer_data_to_pinecone(
+        args.encode_batch_size,
+        args.upsert_batch_size,
+        args.upsert_workers,
+        incremental=args.incremental or args.watch
+    )
+    if stats:
+        logger.info(f"Data transfer complete! {stats.docs_per_second:.1f} documents/second")
+    
+    if args.watch:
+        watch_for_changes(
+            max_batch=args.encode_batch_size,
+            encode_batch_size=args.encode_batch_size,
+            upsert_batch_size=args.upsert_batch_size,
+            upsert_workers=args.upsert_workers
+        )
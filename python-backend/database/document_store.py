@@ -0,0 +1,270 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Document store of every vector in the index, written by the ingestion scripts
+DOCUMENT_STORE_NAME = os.getenv("DOCUMENT_STORE_NAME", "botify-index")
+
+# When enabled, ingestion keeps texts out of vector metadata and queries hydrate them from the store
+DOCUMENT_STORE_ENABLED = os.getenv("DOCUMENT_STORE_ENABLED", "false").lower() == "true"
+
+# Shortest interval between checks for a newer manifest, made when a lookup misses
+DOCUMENT_STORE_REFRESH_SECONDS = float(os.getenv("DOCUMENT_STORE_REFRESH_SECONDS", "5"))
+
+class DocumentStore:
+    """
+    Memory-mapped store of the full metadata (untruncated text included) of each vector, keyed by vector id.
+
+    Records are JSON documents appended to a data file; a JSON manifest maps
+    each id to the offset and length of its latest record. Lookups slice the
+    memory-mapped data file, so only the pages of the requested records are
+    read, and every process serving the same file shares one copy of it in
+    the page cache.
+
+    A single writer (the ingestion scripts) appends records and calls
+    save(), which publishes the manifest atomically. Readers pick up a newer
+    manifest when a lookup misses, at most once per `refresh_interval`
+    seconds; the manifest is parsed before the lock is taken, so lookups
+    keep using the previous one meanwhile. Replaced and deleted records are reclaimed by save() once they
+    take up more than half of the data file.
+
+    Ids are shared by every namespace of the index, as the ingestion scripts
+    prefix them by source ("mongo_", "qa_pair_").
+
+    Args:
+        path: Data file; the manifest is written next to it with a .json suffix
+        refresh_interval: Shortest interval in seconds between manifest checks
+    """
+    def __init__(self, path: str, refresh_interval: float = DOCUMENT_STORE_REFRESH_SECONDS):
+        self.path = path
+        self.manifest_path = f"{path}.json"
+        self.refresh_interval = refresh_interval
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._size = 0
+        self._dead_bytes = 0
+        self._manifest_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._offsets
+
+    def _load(self) -> None:
+        """Read the manifest, if saved, and map the data file it describes."""
+        if os.path.exists(self.manifest_path):
+            self._apply(*self._read_manifest())
+
+    def _read_manifest(self) -> Tuple[float, Dict[str, Tuple[int, int]], int, int]:
+        """Parse the saved manifest into its mtime, offsets, data size and dead bytes."""
+        mtime = os.path.getmtime(self.manifest_path)
+        with open(self.manifest_path, "r") as file:
+            manifest = json.load(file)
+        offsets = {doc_id: (offset, length) for doc_id, (offset, length) in manifest["documents"].items()}
+        return mtime, offsets, manifest["size"], manifest.get("dead_bytes", 0)
+
+    def _apply(self, mtime: float, offsets: Dict[str, Tuple[int, int]], size: int, dead_bytes: int) -> None:
+        with self._lock:
+            self._offsets, self._size, self._dead_bytes = offsets, size, dead_bytes
+            self._manifest_mtime = mtime
+            self._unmap()
+        logger.info(f"Loaded document store from {self.path}: {len(offsets)} documents")
+
+    def _unmap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._map, self._mapped_size = None, 0
+
+    def _view(self) -> memoryview:
+        """The data file up to the end of its last published record."""
+        if self._mapped_size < self._size:
+            self._unmap()
+            with open(self.path, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = len(self._map)
+        return memoryview(self._map)[:self._size] if self._map is not None else memoryview(b"")
+
+    def refresh_due(self) -> bool:
+        """Whether refresh() would check for a newer manifest; cheap enough to call on the event loop."""
+        return time.monotonic() - self._checked_at >= self.refresh_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the manifest if the writer saved a newer one.
+
+        Unless forced, checks at most once per refresh interval. Parsing the
+        manifest blocks, so servers call this off the event loop.
+
+        Returns:
+            bool: Whether a newer manifest was loaded
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._checked_at < self.refresh_interval:
+                return False
+            self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.manifest_path)
+            if mtime == self._manifest_mtime:
+                return False
+            manifest = self._read_manifest()
+        except OSError:
+            return False
+        self._apply(*manifest)
+        return True
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of one document, or None if it is not stored."""
+        return self.get_many([doc_id])[0]
+
+    def get_many(self, ids: List[str], refresh: bool = True) -> List[Optional[Dict[str, Any]]]:
+        """
+        Metadata of several documents, in the order of `ids`.
+
+        Unless `refresh` is False, a miss triggers a (rate-limited) check for
+        a newer manifest before giving up on the id.
+
+        Returns:
+            List of metadata dicts, None for ids that are not stored
+        """
+        if refresh and any(doc_id not in self._offsets for doc_id in ids):
+            self.refresh()
+        with self._lock:
+            view = self._view()
+            documents = []
+            for doc_id in ids:
+                location = self._offsets.get(doc_id)
+                if location is None:
+                    documents.append(None)
+                    continue
+                offset, length = location
+                documents.append(json.loads(str(view[offset:offset + length], "utf-8")))
+            view.release()
+        return documents
+
+    def upsert(self, documents: Iterable[Tuple[str, Dict[str, Any]]]) -> int:
+        """
+        Append documents, skipping those whose metadata has not changed.
+
+        The new records are visible to this process at once and to other
+        processes after save().
+
+        Args:
+            documents: (id, metadata) tuples
+
+        Returns:
+            int: Number of documents written
+        """
+        encoded = [(str(doc_id), json.dumps(metadata, separators=(",", ":")).encode("utf-8")) for doc_id, metadata in documents]
+        with self._lock:
+            view = self._view()
+            changed = [
+                (doc_id, record) for doc_id, record in encoded
+                if doc_id not in self._offsets or view[slice(self._offsets[doc_id][0], sum(self._offsets[doc_id]))] != record
+            ]
+            view.release()
+            if not changed:
+                return 0
+
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "ab") as file:
+                # Drop anything appended after the last published record by an interrupted writer
+                file.truncate(self._size)
+                offset = self._size
+                for doc_id, record in changed:
+                    file.write(record)
+                    self._forget(doc_id)
+                    self._offsets[doc_id] = (offset, len(record))
+                    offset += len(record)
+            self._size = offset
+        return len(changed)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove documents by id."""
+        with self._lock:
+            for doc_id in ids:
+                self._forget(str(doc_id))
+
+    def _forget(self, doc_id: str) -> None:
+        location = self._offsets.pop(doc_id, None)
+        if location is not None:
+            self._dead_bytes += location[1]
+
+    def clear(self) -> None:
+        """Remove every document."""
+        with self._lock:
+            self._dead_bytes += sum(length for _, length in self._offsets.values())
+            self._offsets.clear()
+
+    def save(self) -> None:
+        """Publish the manifest, first compacting the data file if it is mostly stale records."""
+        with self._lock:
+            if self._dead_bytes and self._dead_bytes * 2 > self._size:
+                self._compact()
+            if os.path.exists(self.path):
+                with open(self.path, "r+b") as file:
+                    file.truncate(self._size)
+                    os.fsync(file.fileno())
+
+            manifest = {
+                "size": self._size,
+                "dead_bytes": self._dead_bytes,
+                "documents": {doc_id: list(location) for doc_id, location in self._offsets.items()},
+            }
+            Path(self.manifest_path).parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, "w") as file:
+                json.dump(manifest, file)
+            os.replace(tmp_path, self.manifest_path)
+            self._manifest_mtime = os.path.getmtime(self.manifest_path)
+        logger.info(f"Saved document store to {self.path}: {len(self._offsets)} documents")
+
+    def _compact(self) -> None:
+        """Rewrite the data file with only the live records, in offset order."""
+        view = self._view()
+        offsets: Dict[str, Tuple[int, int]] = {}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as file:
+            position = 0
+            for doc_id, (offset, length) in sorted(self._offsets.items(), key=lambda item: item[1][0]):
+                file.write(view[offset:offset + length])
+                offsets[doc_id] = (position, length)
+                position += length
+        view.release()
+        self._unmap()
+        # Readers keep their mapping of the old file until they load the manifest saved next
+        os.replace(tmp_path, self.path)
+        logger.info(f"Compacted document store {self.path}: {self._size} -> {position} bytes")
+        self._offsets, self._size, self._dead_bytes = offsets, position, 0
+
+_document_stores: Dict[str, DocumentStore] = {}
+_document_stores_lock = threading.Lock()
+
+def open_document_store(name: str = DOCUMENT_STORE_NAME) -> DocumentStore:
+    """
+    Get the process-wide document store for a name, kept in LOCAL_INDEX_DIR.
+
+    Args:
+        name: Store name, used as the file name inside LOCAL_INDEX_DIR
+
+    Returns:
+        DocumentStore: The shared store instance, empty if never saved
+    """
+    with _document_stores_lock:
+        if name not in _document_stores:
+            directory = os.getenv("LOCAL_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "indexes"))
+            _document_stores[name] = DocumentStore(os.path.join(directory, f"{name}.docs"))
+        return _document_stores[name]
@@ -0,0 +1,284 @@
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database.local_index import LocalMatch
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Keyword index over the product descriptions ingested by data/mongo_to_pinecone.py
+PRODUCTS_KEYWORD_INDEX = os.getenv("KEYWORD_INDEX_NAME", "botify-index-products")
+
+# Shortest interval between checks for a newer saved index
+KEYWORD_INDEX_REFRESH_SECONDS = float(os.getenv("KEYWORD_INDEX_REFRESH_SECONDS", "5"))
+
+# Words too common in shopping queries to say anything about a product
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "best", "by", "can", "do", "does",
+    "for", "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or",
+    "show", "that", "the", "this", "to", "what", "which", "with", "you",
+})
+
+# Runs of letters and digits, keeping SKU-style joins such as "wh-1000xm4" or "v2.1" together
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[-./]")
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms.
+
+    Joined tokens such as "wh-1000xm4" are kept whole and also split into
+    their parts, so both the exact SKU and its pieces match.
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if _SEPARATORS.search(token):
+            terms.extend(part for part in _SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return terms
+
+class KeywordIndex:
+    """
+    In-process BM25 inverted index over product texts.
+
+    Holds the same ids and metadata as the vector index, and returns matches
+    shaped like Pinecone's, so keyword and vector results can be mixed.
+
+    Terms found in more than `common_fraction` of documents only add to the
+    scores of documents matched by rarer query terms; scanning their long
+    posting lists would cost most of the query time for almost no ranking
+    signal.
+
+    An index opened from a file picks up the file saved by another process
+    (the ingestion scripts) through refresh().
+
+    Args:
+        k1: Term frequency saturation
+        b: Document length normalization
+        common_fraction: Document frequency above which a term is common
+        path: File used by save() and load()
+        refresh_interval: Shortest interval in seconds between checks for a newer file
+    """
+    def __init__(
+        self,
+        k1: float = 1.2,
+        b: float = 0.75,
+        common_fraction: float = 0.1,
+        path: Optional[str] = None,
+        refresh_interval: float = KEYWORD_INDEX_REFRESH_SECONDS
+    ):
+        self.k1 = k1
+        self.b = b
+        self.common_fraction = common_fraction
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self._saved_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._documents: Dict[str, Tuple[Counter, Optional[Dict[str, Any]]]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def upsert(self, documents: Iterable[Tuple[str, str, Optional[Dict[str, Any]]]]) -> int:
+        """
+        Insert or replace documents.
+
+        Args:
+            documents: (id, text, metadata) tuples
+
+        Returns:
+            int: Number of documents written
+        """
+        prepared = [(str(doc_id), Counter(tokenize(text)), metadata) for doc_id, text, metadata in documents]
+        with self._lock:
+            for doc_id, terms, metadata in prepared:
+                self._remove(doc_id)
+                self._add(doc_id, terms, metadata)
+        return len(prepared)
+
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove documents by id."""
+        with self._lock:
+            for doc_id in ids:
+                self._remove(str(doc_id))
+
+    def clear(self) -> None:
+        """Remove every document."""
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._lengths.clear()
+            self._total_length = 0
+
+    def _add(self, doc_id: str, terms: Counter, metadata: Optional[Dict[str, Any]]) -> None:
+        self._documents[doc_id] = (terms, metadata)
+        self._lengths[doc_id] = sum(terms.values())
+        self._total_length += self._lengths[doc_id]
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = frequency
+
+    def _remove(self, doc_id: str) -> None:
+        existing = self._documents.pop(doc_id, None)
+        if existing is None:
+            return
+        terms = existing[0]
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+
+    def search(self, query: str, top_k: int = 10) -> Tuple[List[LocalMatch], float]:
+        """
+        Return the top_k documents by BM25 score.
+
+        Args:
+            query: Free-text query
+            top_k: Number of matches to return
+
+        Returns:
+            Tuple of (matches ordered by descending score, each with its
+            metadata, and the strength of the best match from 0 to 1: its
+            score relative to an average-length document containing every
+            query term once)
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            count = len(self._documents)
+            if not terms or not count or top_k <= 0:
+                return [], 0.0
+            average_length = self._total_length / count
+
+            scores: Dict[str, float] = {}
+            full_match = 0.0
+            common_df = self.common_fraction * count
+            # Rarest terms first, so common terms only rescore their candidates
+            postings = sorted((self._postings.get(term) or {} for term in terms), key=len)
+            for posting in postings:
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                # A query term found nowhere still counts against a full match
+                full_match += idf
+                if len(posting) > common_df and scores:
+                    candidates = [(doc_id, posting[doc_id]) for doc_id in scores if doc_id in posting]
+                else:
+                    candidates = posting.items()
+                for doc_id, frequency in candidates:
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            top = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            matches = [LocalMatch(doc_id, score, metadata=self._documents[doc_id][1]) for doc_id, score in top]
+
+        strength = min(1.0, matches[0].score / full_match) if matches and full_match > 0 else 0.0
+        return matches, strength
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Persist the documents to a JSON file; postings are rebuilt on load."""
+        path = path or self.path
+        if not path:
+            raise ValueError("No path configured for keyword index")
+
+        with self._lock:
+            documents = [
+                {"id": doc_id, "terms": dict(terms), "metadata": metadata}
+                for doc_id, (terms, metadata) in self._documents.items()
+            ]
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"k1": self.k1, "b": self.b, "common_fraction": self.common_fraction, "documents": documents}, file)
+        os.replace(tmp_path, path)
+        if path == self.path:
+            self._saved_mtime = os.path.getmtime(path)
+        logger.info(f"Saved keyword index to {path}")
+
+    def refresh_due(self) -> bool:
+        """Whether refresh() would check the file for a newer save; cheap enough to call on the event loop."""
+        return bool(self.path) and time.monotonic() - self._checked_at >= self.refresh_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Reload the index if its file was saved by another process since it was loaded.
+
+        Unless forced, checks at most once per refresh interval. Parsing the
+        file blocks for as long as a full load, so servers call this off the
+        event loop; searches keep using the current index until the loaded
+        one is swapped in under the lock.
+
+        Returns:
+            bool: Whether a newer file was loaded
+        """
+        now = time.monotonic()
+        if not self.path or (not force and now - self._checked_at < self.refresh_interval):
+            return False
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._saved_mtime:
+            return False
+
+        loaded = KeywordIndex.load(self.path)
+        with self._lock:
+            self.k1, self.b, self.common_fraction = loaded.k1, loaded.b, loaded.common_fraction
+            self._postings, self._documents = loaded._postings, loaded._documents
+            self._lengths, self._total_length = loaded._lengths, loaded._total_length
+            self._saved_mtime = loaded._saved_mtime
+        return True
+
+    @classmethod
+    def load(cls, path: str) -> "KeywordIndex":
+        """Load an index previously written with save()."""
+        mtime = os.path.getmtime(path)
+        with open(path, "r") as file:
+            data = json.load(file)
+
+        index = cls(k1=data["k1"], b=data["b"], common_fraction=data.get("common_fraction", 0.1), path=path)
+        index._saved_mtime = mtime
+        for entry in data["documents"]:
+            index._add(entry["id"], Counter(entry["terms"]), entry["metadata"])
+        logger.info(f"Loaded keyword index from {path}: {len(index)} documents")
+        return index
+
+_keyword_indexes: Dict[str, KeywordIndex] = {}
+_keyword_indexes_lock = threading.Lock()
+
+def open_keyword_index(name: str) -> KeywordIndex:
+    """
+    Get the process-wide keyword index for a name, loading it from LOCAL_INDEX_DIR if saved.
+
+    Args:
+        name: Index name, used as the file name inside LOCAL_INDEX_DIR
+
+    Returns:
+        KeywordIndex: The shared index instance
+    """
+    with _keyword_indexes_lock:
+        if name not in _keyword_indexes:
+            directory = os.getenv("LOCAL_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "indexes"))
+            path = os.path.join(directory, f"{name}.bm25.json")
+            if os.path.exists(path):
+                _keyword_indexes[name] = KeywordIndex.load(path)
+            else:
+                _keyword_indexes[name] = KeywordIndex(path=path)
+                logger.info(f"Created empty keyword index '{name}'")
+        return _keyword_indexes[name]
@@ -0,0 +1,466 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+# Catalogs at or above this size are searched with an IVF index instead of brute force
+DEFAULT_ANN_THRESHOLD = 50_000
+
+# Rows appended or masked since the last rebuild, as a fraction of the rows it built, that trigger the next one
+DEFAULT_REBUILD_DRIFT = 0.2
+
+class LocalMatch:
+    """A single query match, shaped like a Pinecone ScoredVector."""
+    __slots__ = ("id", "score", "values", "metadata")
+
+    def __init__(self, id: str, score: float, values: Optional[List[float]] = None, metadata: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.score = score
+        self.values = values or []
+        self.metadata = metadata
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"LocalMatch(id={self.id!r}, score={self.score:.4f})"
+
+class LocalQueryResponse:
+    """Query result, shaped like a Pinecone QueryResponse."""
+    __slots__ = ("matches", "namespace")
+
+    def __init__(self, matches: List[LocalMatch], namespace: str = ""):
+        self.matches = matches
+        self.namespace = namespace
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+class _Namespace:
+    """
+    Vectors and metadata of one namespace plus the search structures built from them.
+
+    Writes update the search structures in place: new vectors are appended to
+    the matrix (and to the IVF list of their closest centroid), while replaced
+    and deleted vectors keep their row, masked out of `live`. Rows below
+    `size` never change, so a query can scan them without holding the lock.
+    """
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+        self.records: Dict[str, Tuple[np.ndarray, Optional[Dict[str, Any]]]] = {}
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.matrix = np.zeros((0, dimension), dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.size = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.lists: List[np.ndarray] = []
+        # Drift since the last rebuild, and the writes made while one runs
+        self.built_rows = 0
+        self.drift = 0
+        self.rebuilding = False
+        self.touched: Set[str] = set()
+        self.generation = 0
+
+    def append(self, vectors: List[Tuple[str, np.ndarray]]) -> None:
+        """Mask out the current rows of the given ids and append their new vectors."""
+        if not vectors:
+            return
+        for vector_id, _ in vectors:
+            self.mask(vector_id)
+        start, end = self.size, self.size + len(vectors)
+        if end > len(self.matrix):
+            # Grow into a new array; rows already published stay valid in the old one
+            capacity = max(end, 2 * len(self.matrix), 1024)
+            matrix = np.empty((capacity, self.dimension), dtype=np.float32)
+            matrix[:start] = self.matrix[:start]
+            live = np.zeros(capacity, dtype=bool)
+            live[:start] = self.live[:start]
+            self.matrix, self.live = matrix, live
+        self.matrix[start:end] = np.stack([values for _, values in vectors])
+        self.live[start:end] = True
+        for row, (vector_id, _) in enumerate(vectors, start):
+            self.ids.append(vector_id)
+            self.rows[vector_id] = row
+        self.size = end
+        self.drift += len(vectors)
+
+        if self.centroids is not None:
+            rows = np.arange(start, end)
+            assignment = np.argmax(self.matrix[start:end] @ self.centroids.T, axis=1)
+            for c in np.unique(assignment):
+                self.lists[c] = np.concatenate([self.lists[c], rows[assignment == c]])
+
+    def mask(self, vector_id: str) -> None:
+        """Drop a vector from search results until the next rebuild removes its row."""
+        row = self.rows.pop(vector_id, None)
+        if row is not None:
+            self.live[row] = False
+            self.drift += 1
+
+    def clear(self) -> None:
+        """Remove every vector, discarding the result of a rebuild in progress."""
+        self.records.clear()
+        self.ids, self.rows = [], {}
+        self.matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.size = 0
+        self.centroids, self.lists = None, []
+        self.built_rows = self.drift = 0
+        self.touched = set()
+        self.generation += 1
+
+class LocalVectorIndex:
+    """
+    In-process vector index exposing the subset of the Pinecone Index API used by Botify.
+
+    Small namespaces are searched exactly with a NumPy matrix product. Namespaces
+    holding at least `ann_threshold` vectors are clustered into an IVF (inverted
+    file) index and only the `nprobe` closest clusters are scanned per query.
+
+    Writes are applied incrementally, so queries never wait for a rebuild.
+    Once `rebuild_drift` of a namespace has been appended or masked since its
+    last rebuild, it is compacted and re-clustered on a background thread and
+    the result swapped in.
+    """
+    def __init__(
+        self,
+        dimension: int,
+        metric: str = "cosine",
+        ann_threshold: int = DEFAULT_ANN_THRESHOLD,
+        nprobe: int = 8,
+        path: Optional[str] = None,
+        rebuild_drift: float = DEFAULT_REBUILD_DRIFT
+    ):
+        if metric not in ("cosine", "dotproduct"):
+            raise ValueError(f"Unsupported metric for local index: {metric}")
+
+        self.dimension = dimension
+        self.metric = metric
+        self.ann_threshold = ann_threshold
+        self.nprobe = nprobe
+        self.path = path
+        self.rebuild_drift = rebuild_drift
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._lock = threading.RLock()
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        if namespace not in self._namespaces:
+            self._namespaces[namespace] = _Namespace(self.dimension)
+        return self._namespaces[namespace]
+
+    def _prepare(self, values: Iterable[float]) -> np.ndarray:
+        vector = np.asarray(values, dtype=np.float32)
+        if vector.shape != (self.dimension,):
+            raise ValueError(f"Vector dimension {vector.shape[-1] if vector.ndim else 0} does not match index dimension {self.dimension}")
+        if self.metric == "cosine":
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+        return vector
+
+    def upsert(self, vectors: List[Any], namespace: str = "", **kwargs) -> Dict[str, int]:
+        """
+        Insert or replace vectors.
+
+        Args:
+            vectors: Dicts with "id", "values" and optional "metadata", or
+                (id, values[, metadata]) tuples, as accepted by Pinecone
+            namespace: Target namespace
+
+        Returns:
+            Dict[str, int]: {"upserted_count": n}
+        """
+        prepared = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                vector_id, values, metadata = vector["id"], vector["values"], vector.get("metadata")
+            else:
+                vector_id, values = vector[0], vector[1]
+                metadata = vector[2] if len(vector) > 2 else None
+            prepared.append((str(vector_id), self._prepare(values), metadata))
+
+        with self._lock:
+            ns = self._namespace(namespace)
+            changed: Dict[str, np.ndarray] = {}
+            for vector_id, values, metadata in prepared:
+                current = ns.records.get(vector_id)
+                ns.records[vector_id] = (values, metadata)
+                # A metadata-only update keeps the vector's row
+                if current is None or not np.array_equal(current[0], values):
+                    changed[vector_id] = values
+            ns.append(list(changed.items()))
+            if ns.rebuilding:
+                ns.touched.update(changed)
+            self._maybe_rebuild(ns)
+
+        return {"upserted_count": len(prepared)}
+
+    def delete(self, ids: Optional[List[str]] = None, delete_all: bool = False, namespace: str = "", **kwargs) -> Dict[str, Any]:
+        """Delete vectors by id, or every vector of the namespace."""
+        with self._lock:
+            ns = self._namespace(namespace)
+            if delete_all:
+                ns.clear()
+            else:
+                for vector_id in map(str, ids or []):
+                    if ns.records.pop(vector_id, None) is not None:
+                        ns.mask(vector_id)
+                        if ns.rebuilding:
+                            ns.touched.add(vector_id)
+            self._maybe_rebuild(ns)
+        return {}
+
+    def fetch(self, ids: List[str], namespace: str = "", **kwargs) -> Dict[str, Any]:
+        """Fetch stored vectors and metadata by id."""
+        with self._lock:
+            records = self._namespace(namespace).records
+            found = {
+                vector_id: {"id": vector_id, "values": records[vector_id][0].tolist(), "metadata": records[vector_id][1]}
+                for vector_id in ids if vector_id in records
+            }
+        return {"vectors": found, "namespace": namespace}
+
+    def describe_index_stats(self, **kwargs) -> Dict[str, Any]:
+        """Return vector counts per namespace, like Pinecone's describe_index_stats."""
+        with self._lock:
+            namespaces = {name: {"vector_count": len(ns.records)} for name, ns in self._namespaces.items()}
+        return {
+            "dimension": self.dimension,
+            "namespaces": namespaces,
+            "total_vector_count": sum(ns["vector_count"] for ns in namespaces.values()),
+        }
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int = 10,
+        include_metadata: bool = False,
+        include_values: bool = False,
+        namespace: str = "",
+        **kwargs
+    ) -> LocalQueryResponse:
+        """
+        Return the top_k most similar vectors.
+
+        Args:
+            vector: Query embedding
+            top_k: Number of matches to return
+            include_metadata: Whether to attach stored metadata to each match
+            include_values: Whether to attach stored vector values to each match
+            namespace: Namespace to search
+
+        Returns:
+            LocalQueryResponse: Matches ordered by descending score
+        """
+        query = self._prepare(vector)
+        with self._lock:
+            ns = self._namespace(namespace)
+            size, ids, matrix, live = ns.size, ns.ids, ns.matrix, ns.live[:ns.size].copy()
+            centroids, lists = ns.centroids, list(ns.lists)
+            records = ns.records if (include_metadata or include_values) else None
+
+        if size == 0 or top_k <= 0:
+            return LocalQueryResponse([], namespace)
+
+        if centroids is not None:
+            # Scan only the live rows of the closest clusters
+            probe = min(self.nprobe, len(centroids))
+            closest = np.argpartition(-(centroids @ query), probe - 1)[:probe]
+            candidates = np.concatenate([lists[c] for c in closest])
+            candidates = candidates[live[candidates]]
+            scores = matrix[candidates] @ query
+        else:
+            scores = matrix[:size] @ query
+            candidates = None
+            if not live.all():
+                candidates = np.flatnonzero(live)
+                scores = scores[candidates]
+
+        if len(scores) == 0:
+            return LocalQueryResponse([], namespace)
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        matches = []
+        for position in top:
+            row = int(candidates[position]) if candidates is not None else int(position)
+            vector_id = ids[row]
+            match = LocalMatch(vector_id, float(scores[position]))
+            if records is not None and vector_id in records:
+                values, metadata = records[vector_id]
+                if include_values:
+                    match.values = values.tolist()
+                if include_metadata:
+                    match.metadata = metadata
+            matches.append(match)
+
+        return LocalQueryResponse(matches, namespace)
+
+    def _maybe_rebuild(self, ns: _Namespace) -> None:
+        """Start a background rebuild if the namespace crossed the ANN threshold or drifted too far."""
+        if ns.rebuilding:
+            return
+        crossed = (len(ns.rows) >= self.ann_threshold) != (ns.centroids is not None)
+        if ns.centroids is not None:
+            drifted = ns.drift > self.rebuild_drift * ns.built_rows
+        else:
+            # Exact search only pays for masked rows
+            drifted = ns.size - len(ns.rows) > self.rebuild_drift * max(ns.size, 1024)
+        if crossed or drifted:
+            self._start_rebuild(ns, background=True)
+
+    def _start_rebuild(self, ns: _Namespace, background: bool) -> None:
+        ns.rebuilding = True
+        ns.touched = set()
+        snapshot = (ns.generation, ns.matrix, ns.live[:ns.size].copy(), ns.ids[:ns.size])
+        if background:
+            threading.Thread(target=self._rebuild, args=(ns, *snapshot), name="local-index-rebuild", daemon=True).start()
+        else:
+            self._rebuild(ns, *snapshot)
+
+    def _rebuild(self, ns: _Namespace, generation: int, matrix: np.ndarray, live: np.ndarray, ids: List[str]) -> None:
+        """
+        Compact a snapshot of the namespace's rows and re-cluster them above the ANN threshold.
+
+        Runs without the lock; writes made meanwhile are replayed onto the
+        result before it is swapped in.
+        """
+        try:
+            rows = np.flatnonzero(live)
+            headroom = max(1024, int(len(rows) * self.rebuild_drift))
+            built = np.empty((len(rows) + headroom, self.dimension), dtype=np.float32)
+            np.take(matrix, rows, axis=0, out=built[:len(rows)])
+            built_ids = [ids[row] for row in rows]
+            centroids, lists = None, []
+            if len(rows) >= self.ann_threshold:
+                centroids, lists = _build_ivf(built[:len(rows)])
+                logger.info(f"Built IVF index with {len(centroids)} lists over {len(rows)} vectors")
+        except Exception as e:
+            logger.error(f"Rebuilding local index namespace failed: {e}")
+            with self._lock:
+                ns.rebuilding = False
+                ns.touched = set()
+            return
+
+        with self._lock:
+            ns.rebuilding = False
+            touched, ns.touched = ns.touched, set()
+            if ns.generation == generation:
+                live_rows = np.zeros(len(built), dtype=bool)
+                live_rows[:len(rows)] = True
+                ns.ids, ns.rows = built_ids, {vector_id: row for row, vector_id in enumerate(built_ids)}
+                ns.matrix, ns.live, ns.size = built, live_rows, len(rows)
+                ns.centroids, ns.lists = centroids, lists
+                ns.built_rows, ns.drift = len(rows), 0
+                # Replay the writes made while the snapshot was being rebuilt
+                for vector_id in touched:
+                    if vector_id not in ns.records:
+                        ns.mask(vector_id)
+                ns.append([(vector_id, ns.records[vector_id][0]) for vector_id in touched if vector_id in ns.records])
+            self._maybe_rebuild(ns)
+
+    def save(self, path: Optional[str] = None) -> None:
+        """Persist all namespaces to a .npz file."""
+        path = path or self.path
+        if not path:
+            raise ValueError("No path configured for local index")
+
+        with self._lock:
+            arrays: Dict[str, np.ndarray] = {}
+            manifest = {"dimension": self.dimension, "metric": self.metric, "namespaces": {}}
+            for i, (name, ns) in enumerate(self._namespaces.items()):
+                ids = list(ns.records)
+                arrays[f"vectors_{i}"] = (
+                    np.stack([ns.records[vector_id][0] for vector_id in ids])
+                    if ids else np.zeros((0, self.dimension), dtype=np.float32)
+                )
+                manifest["namespaces"][name] = {
+                    "key": f"vectors_{i}",
+                    "ids": ids,
+                    "metadata": [ns.records[vector_id][1] for vector_id in ids],
+                }
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, manifest=np.array(json.dumps(manifest)), **arrays)
+        logger.info(f"Saved local index to {path}")
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "LocalVectorIndex":
+        """Load an index previously written with save()."""
+        with np.load(path, allow_pickle=False) as data:
+            manifest = json.loads(str(data["manifest"]))
+            index = cls(manifest["dimension"], metric=manifest["metric"], path=path, **kwargs)
+            for name, entry in manifest["namespaces"].items():
+                ns = index._namespace(name)
+                for vector_id, values, metadata in zip(entry["ids"], data[entry["key"]], entry["metadata"]):
+                    ns.records[vector_id] = (values, metadata)
+                ns.append([(vector_id, values) for vector_id, (values, _) in ns.records.items()])
+                # Build the IVF lists now rather than answering the first queries with exact search
+                index._start_rebuild(ns, background=False)
+        logger.info(f"Loaded local index from {path}: {index.describe_index_stats()['total_vector_count']} vectors")
+        return index
+
+def _build_ivf(matrix: np.ndarray, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Cluster rows with spherical k-means and return centroids and per-cluster row ids.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = max(1, int(np.sqrt(len(matrix))))
+
+    # Train on a sample to keep build time bounded for large catalogs
+    sample_size = min(len(matrix), nlist * 64)
+    sample = matrix[rng.choice(len(matrix), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(nlist):
+            members = sample[assignment == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                norm = np.linalg.norm(centroid)
+                centroids[c] = centroid / norm if norm > 0 else centroid
+
+    assignment = np.argmax(matrix @ centroids.T, axis=1)
+    lists = [np.flatnonzero(assignment == c) for c in range(nlist)]
+    return centroids, lists
+
+_local_indexes: Dict[str, LocalVectorIndex] = {}
+_local_indexes_lock = threading.Lock()
+
+def open_local_index(name: str, dimension: int, metric: str = "cosine") -> LocalVectorIndex:
+    """
+    Get the process-wide local index for a name, loading it from LOCAL_INDEX_DIR if saved.
+
+    Args:
+        name: Index name, used as the file name inside LOCAL_INDEX_DIR
+        dimension: Vector dimension of a new index
+        metric: Similarity metric of a new index
+
+    Returns:
+        LocalVectorIndex: The shared index instance
+    """
+    with _local_indexes_lock:
+        if name not in _local_indexes:
+            directory = os.getenv("LOCAL_INDEX_DIR", str(Path(__file__).resolve().parent.parent / "data" / "indexes"))
+            path = os.path.join(directory, f"{name}.npz")
+            options = {
+                "ann_threshold": int(os.getenv("LOCAL_INDEX_ANN_THRESHOLD", str(DEFAULT_ANN_THRESHOLD))),
+                "rebuild_drift": float(os.getenv("LOCAL_INDEX_REBUILD_DRIFT", str(DEFAULT_REBUILD_DRIFT))),
+            }
+            if os.path.exists(path):
+                _local_indexes[name] = LocalVectorIndex.load(path, **options)
+            else:
+                _local_indexes[name] = LocalVectorIndex(dimension, metric=metric, path=path, **options)
+                logger.info(f"Created empty local index '{name}' ({dimension} dims)")
+        return _local_indexes[name]
@@ -24,12 +24,15 @@ def get_mongo_client():
         raise ValueError("MONGO_DB_URI environment variable not set")
     return MongoClient(mongo_uri)
 
+def get_products_collection():
+    """Get the collection holding the product descriptions that get embedded"""
+    client = get_mongo_client()
+    return client["botify"]["conversations"]
+
 def get_data_from_mongo():
     """Get data from MongoDB collection"""
     try:
-        client = get_mongo_client()
-        db = client["botify"]
-        collection = db["conversations"]
+        collection = get_products_collection()
         data = list(collection.find({}, {"_id": 1, "description": 1}))
         logger.info(f"Retrieved {len(data)} documents from MongoDB")
         return data
@@ -1,7 +1,8 @@
 import os
-from pinecone import Pinecone, ServerlessSpec
 import logging
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Add parent directory to Python path to import load_env
@@ -12,24 +13,73 @@ from load_env import load_environment
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Index configuration
+INDEX_NAME = "botify-index"
+DIMENSION = 384  # dimension for all-MiniLM-L6-v2 model
+METRIC = "cosine"
+
+# "pinecone" (default) or "local" for the in-process index in database/local_index.py
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+
+# Bulk upsert configuration (Pinecone recommends batches of about 100 vectors)
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+
+# Connections kept open to an index host; defaults to the number of concurrent Pinecone calls
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", os.getenv("PINECONE_MAX_CONCURRENCY", "32")))
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_pinecone_client():
+    """
+    Get the shared Pinecone control-plane client, creating it on first use.
+    
+    Every index wrapper uses this one client instead of building its own.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                # Imported here so that importing this module stays cheap
+                from pinecone import Pinecone
+                
+                # Load environment variables
+                load_environment(required_vars=['PINECONE_API_KEY'])
+                api_key = os.getenv("PINECONE_API_KEY")
+                if not api_key:
+                    raise ValueError("PINECONE_API_KEY environment variable not set")
+                _client = Pinecone(api_key=api_key)
+    return _client
+
+def open_pinecone_index(name, client=None):
+    """
+    Connect to a Pinecone index through a keep-alive pool of PINECONE_POOL_SIZE connections.
+    
+    The SDK otherwise sizes each index's urllib3 pool from the CPU count, so
+    executor threads beyond that open a new TLS connection for every call
+    and throw it away afterwards.
+    
+    Args:
+        name: Index name
+        client: Pinecone client, the shared one by default
+        
+    Returns:
+        The index, ready for data operations
+    """
+    from pinecone.config.openapi import OpenApiConfigFactory
+    from pinecone.utils import normalize_host
+    
+    client = client or get_pinecone_client()
+    host = normalize_host(client.describe_index(name).host)
+    openapi_config = OpenApiConfigFactory.build(api_key=client.config.api_key, host=host)
+    openapi_config.connection_pool_maxsize = PINECONE_POOL_SIZE
+    return client.Index(host=host, openapi_config=openapi_config)
+
 # Initialize Pinecone client
 def init_pinecone():
     try:
-        # Load environment variables
-        load_environment()
-        
-        # Get environment variables
-        api_key = os.getenv("PINECONE_API_KEY")
-        if not api_key:
-            raise ValueError("PINECONE_API_KEY environment variable not set")
-
-        # Create an instance of the Pinecone class
-        pinecone_client = Pinecone(api_key=api_key)
-        
-        # Index configuration
-        INDEX_NAME = "botify-index"
-        DIMENSION = 384  # dimension for all-MiniLM-L6-v2 model
-        METRIC = "cosine"
+        pinecone_client = get_pinecone_client()
 
         # List existing indexes
         existing_indexes = [index.name for index in pinecone_client.list_indexes()]
@@ -72,8 +122,8 @@ def init_pinecone():
                 }
             )
         
-        # Get index
-        index = pinecone_client.Index(INDEX_NAME)
+        # Get index; describing its stats also opens the first pooled connection
+        index = open_pinecone_index(INDEX_NAME, pinecone_client)
         stats = index.describe_index_stats()
         logger.info(f"Successfully connected to Pinecone index '{INDEX_NAME}'. Vector count: {stats.total_vector_count}")
         
@@ -83,6 +133,54 @@ def init_pinecone():
         logger.error(f"Error initializing Pinecone: {e}")
         raise
 
+def init_index():
+    """Initialize the vector index for the configured backend."""
+    if VECTOR_BACKEND == "local":
+        from database.local_index import open_local_index
+        return open_local_index(INDEX_NAME, DIMENSION, METRIC)
+    return init_pinecone()
+
+def upsert_in_batches(target, vectors, batch_size=UPSERT_BATCH_SIZE, max_workers=UPSERT_WORKERS):
+    """
+    Upsert vectors in chunks, sending several chunks concurrently.
+    
+    Args:
+        target: Pinecone (or local) index to write to
+        vectors: List of dicts with id/values/metadata, or (id, values, metadata) tuples
+        batch_size: Number of vectors per upsert request
+        max_workers: Number of concurrent upsert requests
+        
+    Returns:
+        int: Number of vectors upserted
+    """
+    batches = [vectors[i:i + batch_size] for i in range(0, len(vectors), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(target.upsert, vectors=batch) for batch in batches]
+        for future in futures:
+            future.result()
+    return len(vectors)
+
+def upsert_to_pinecone(vectors, batch_size=UPSERT_BATCH_SIZE, max_workers=UPSERT_WORKERS):
+    """
+    Bulk upsert vectors into the configured index.
+    
+    Args:
+        vectors: List of (id, values, metadata) tuples or Pinecone vector dicts
+        batch_size: Number of vectors per upsert request
+        max_workers: Number of concurrent upsert requests
+        
+    Returns:
+        int: Number of vectors upserted
+    """
+    count = upsert_in_batches(get_index(), vectors, batch_size=batch_size, max_workers=max_workers)
+    logger.info(f"Upserted {count} vectors in batches of {batch_size}")
+    return count
+
+def persist_index(index):
+    """Write the local index to disk; Pinecone persists upserts itself."""
+    if VECTOR_BACKEND == "local":
+        index.save()
+
 def test_pinecone_operations(index):
     """Test Pinecone operations with sample data."""
     try:
@@ -119,18 +217,41 @@ def test_pinecone_operations(index):
         logger.error(f"Error testing Pinecone operations: {str(e)}")
         return False
 
-# Initialize Pinecone when the module is imported
-try:
-    index = init_pinecone()
-    # Uncomment the following line to test operations
-    # test_success = test_pinecone_operations(index)
-except Exception as e:
-    logger.error(f"Failed to initialize Pinecone index: {str(e)}")
-    raise
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """
+    Get the shared vector index, connecting on first use.
+    
+    Connecting lists, describes and possibly creates the Pinecone index, so it
+    is deferred until the first request or an explicit warm-up rather than
+    happening when this module is imported.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    _index = init_index()
+                except Exception as e:
+                    logger.error(f"Failed to initialize Pinecone index: {str(e)}")
+                    raise
+    return _index
+
+def query_index(**kwargs):
+    """Query the shared index, connecting first if needed."""
+    return get_index().query(**kwargs)
+
+def __getattr__(name):
+    # Backwards compatibility for `database.pinecone_client.index`
+    if name == "index":
+        return get_index()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     # Test the Pinecone connection and operations
-    test_success = test_pinecone_operations(index)
+    test_success = test_pinecone_operations(get_index())
     if test_success:
         print(" Pinecone connection and operations test successful!")
     else:
@@ -1,17 +1,32 @@
-from sentence_transformers import SentenceTransformer
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from functools import lru_cache
+from database.document_store import DOCUMENT_STORE_ENABLED, open_document_store
 from database.mongo_client import get_data_from_mongo
-from database.pinecone_client import upsert_to_pinecone
+from database.pinecone_client import get_index, persist_index
+from embeddings.pipeline import ingest_documents, update_document_store
 
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
+@lru_cache()
+def get_model():
+    """Load the sentence transformer model on first use"""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
 
 def embed_and_store():
+    """Embed every MongoDB description and bulk upsert the vectors, storing their documents first if enabled"""
     data = get_data_from_mongo()
-    pinecone_data = []
-
-    for item in data:
-        doc_id = str(item["_id"])
-        description = item["description"]
-        embedding = model.encode(description).tolist()
-        pinecone_data.append((doc_id, embedding, {"description": description}))
+    if DOCUMENT_STORE_ENABLED:
+        documents = open_document_store()
+        update_document_store(documents, data)
+        documents.save()
+    index = get_index()
+    stats = ingest_documents(data, get_model(), index)
+    persist_index(index)
+    return stats
 
-    upsert_to_pinecone(pinecone_data)
+if __name__ == "__main__":
+    embed_and_store()
@@ -0,0 +1,288 @@
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from database.document_store import DOCUMENT_STORE_ENABLED
+from database.pinecone_client import UPSERT_BATCH_SIZE, UPSERT_WORKERS
+from embeddings.sync_state import SyncState
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+ENCODE_BATCH_SIZE = int(os.getenv("ENCODE_BATCH_SIZE", "64"))
+
+def mongo_vector_id(doc: Dict[str, Any]) -> str:
+    """Vector id used for a Mongo product document"""
+    return f'mongo_{str(doc["_id"])}'
+
+def mongo_metadata(doc: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Metadata stored alongside a Mongo product vector"""
+    metadata = {'mongo_id': str(doc['_id'])}
+    if not DOCUMENT_STORE_ENABLED:
+        metadata['text'] = text[:1000]  # Store first 1000 chars of text in metadata
+    return metadata
+
+def mongo_document(doc: Dict[str, Any], text: str) -> Dict[str, Any]:
+    """Full metadata of a Mongo product kept in the document store, untruncated text included"""
+    return {
+        'mongo_id': str(doc['_id']),
+        'text': text
+    }
+
+class IngestionStats:
+    """Counters reported at the end of an ingestion run"""
+    def __init__(self):
+        self.documents = 0
+        self.indexed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.indexed / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.indexed}/{self.documents} documents indexed "
+            f"({self.skipped} skipped, {self.failed} failed) "
+            f"in {self.seconds:.1f}s - {self.docs_per_second:.1f} docs/s"
+        )
+
+def ingest_documents(
+    docs: Iterable[Dict[str, Any]],
+    model,
+    index,
+    text_field: str = 'description',
+    encode_batch_size: int = ENCODE_BATCH_SIZE,
+    upsert_batch_size: int = UPSERT_BATCH_SIZE,
+    upsert_workers: int = UPSERT_WORKERS,
+    vector_id: Callable[[Dict[str, Any]], str] = mongo_vector_id,
+    metadata: Callable[[Dict[str, Any], str], Dict[str, Any]] = mongo_metadata,
+    on_indexed: Optional[Callable[[List[Dict[str, Any]]], None]] = None
+) -> IngestionStats:
+    """
+    Embed documents in batches and bulk upsert them, overlapping encode and upload.
+    
+    Each encode batch is handed to a pool of upsert workers while the next
+    batch is being encoded, so network time hides behind model time. At most
+    two upserts per worker are kept in flight to bound memory.
+    
+    Args:
+        docs: Documents carrying `_id` and the text field
+        model: SentenceTransformer (anything with a batched `encode`)
+        index: Pinecone or local index to upsert into
+        text_field: Document field holding the text to embed
+        encode_batch_size: Number of texts per `model.encode` call
+        upsert_batch_size: Number of vectors per upsert request
+        upsert_workers: Number of concurrent upsert requests
+        vector_id: Maps a document to its vector id
+        metadata: Builds vector metadata from a document and its text
+        on_indexed: Called with the documents of every successfully upserted chunk
+        
+    Returns:
+        IngestionStats: Counts and throughput of the run
+    """
+    stats = IngestionStats()
+    in_flight: Deque[Tuple[List[Dict[str, Any]], Future]] = deque()
+    
+    def wait_oldest():
+        chunk_docs, future = in_flight.popleft()
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Error upserting batch of {len(chunk_docs)} vectors: {e}")
+            stats.indexed -= len(chunk_docs)
+            stats.failed += len(chunk_docs)
+            return
+        if on_indexed is not None:
+            on_indexed(chunk_docs)
+    
+    def flush(batch: List[Dict[str, Any]], pool: ThreadPoolExecutor):
+        texts = [doc[text_field] for doc in batch]
+        try:
+            embeddings = model.encode(texts, batch_size=encode_batch_size, convert_to_numpy=True)
+        except Exception as e:
+            logger.error(f"Error generating embeddings for batch of {len(batch)}: {e}")
+            stats.failed += len(batch)
+            return
+        
+        vectors = [
+            {'id': vector_id(doc), 'values': embedding.tolist(), 'metadata': metadata(doc, text)}
+            for doc, text, embedding in zip(batch, texts, embeddings)
+        ]
+        stats.indexed += len(batch)
+        for i in range(0, len(vectors), upsert_batch_size):
+            chunk = vectors[i:i + upsert_batch_size]
+            in_flight.append((batch[i:i + upsert_batch_size], pool.submit(index.upsert, vectors=chunk)))
+            while len(in_flight) > upsert_workers * 2:
+                wait_oldest()
+        logger.info(f"Encoded {stats.indexed} documents")
+    
+    with ThreadPoolExecutor(max_workers=upsert_workers) as pool:
+        batch: List[Dict[str, Any]] = []
+        for doc in docs:
+            stats.documents += 1
+            if not doc.get(text_field):
+                logger.warning(f"Skipping document {doc.get('_id')} - no {text_field} found")
+                stats.skipped += 1
+                continue
+            batch.append(doc)
+            if len(batch) >= encode_batch_size:
+                flush(batch, pool)
+                batch = []
+        if batch:
+            flush(batch, pool)
+        
+        while in_flight:
+            wait_oldest()
+    
+    stats.finished_at = time.perf_counter()
+    logger.info(f"Ingestion complete: {stats}")
+    return stats
+
+def state_recorder(
+    state: SyncState,
+    text_field: str = 'description',
+    vector_id: Callable[[Dict[str, Any]], str] = mongo_vector_id
+) -> Callable[[List[Dict[str, Any]]], None]:
+    """Build an on_indexed callback that records indexed documents in the sync state"""
+    def record(indexed_docs: List[Dict[str, Any]]):
+        for doc in indexed_docs:
+            state.record(vector_id(doc), doc[text_field])
+    return record
+
+def keyword_recorder(
+    keyword_index,
+    text_field: str = 'description',
+    vector_id: Callable[[Dict[str, Any]], str] = mongo_vector_id,
+    metadata: Callable[[Dict[str, Any], str], Dict[str, Any]] = mongo_metadata
+) -> Callable[[List[Dict[str, Any]]], None]:
+    """Build an on_indexed callback that adds indexed documents to the BM25 keyword index"""
+    def record(indexed_docs: List[Dict[str, Any]]):
+        keyword_index.upsert(
+            (vector_id(doc), doc[text_field], metadata(doc, doc[text_field])) for doc in indexed_docs
+        )
+    return record
+
+def document_recorder(
+    document_store,
+    text_field: str = 'description',
+    vector_id: Callable[[Dict[str, Any]], str] = mongo_vector_id,
+    document: Callable[[Dict[str, Any], str], Dict[str, Any]] = mongo_document
+) -> Callable[[List[Dict[str, Any]]], None]:
+    """Build an on_indexed callback that writes indexed documents to the document store"""
+    def record(indexed_docs: List[Dict[str, Any]]):
+        document_store.upsert((vector_id(doc), document(doc, doc[text_field])) for doc in indexed_docs)
+    return record
+
+def chain_callbacks(*callbacks: Callable[[List[Dict[str, Any]]], None]) -> Callable[[List[Dict[str, Any]]], None]:
+    """Combine on_indexed callbacks into one that calls each in turn"""
+    def call_all(indexed_docs: List[Dict[str, Any]]):
+        for callback in callbacks:
+            callback(indexed_docs)
+    return call_all
+
+def rebuild_keyword_index(
+    keyword_index,
+    docs: Iterable[Dict[str, Any]],
+    text_field: str = 'description',
+    **recorder_options
+) -> int:
+    """
+    Replace the contents of the keyword index with the given documents.
+    
+    Tokenizing is cheap compared to embedding, so the whole catalog is
+    re-indexed on every sync rather than tracked by content hash.
+    
+    Returns:
+        int: Number of documents indexed
+    """
+    docs = [doc for doc in docs if doc.get(text_field)]
+    keyword_index.clear()
+    keyword_recorder(keyword_index, text_field, **recorder_options)(docs)
+    logger.info(f"Rebuilt keyword index with {len(docs)} documents")
+    return len(docs)
+
+def update_document_store(
+    document_store,
+    docs: Iterable[Dict[str, Any]],
+    removed: Iterable[str] = (),
+    text_field: str = 'description',
+    **recorder_options
+) -> int:
+    """
+    Write the given documents to the document store and drop removed ids.
+    
+    Unchanged records are skipped by the store, so the whole catalog is
+    passed on every sync, like the keyword index rebuild.
+    
+    Returns:
+        int: Number of documents stored
+    """
+    docs = [doc for doc in docs if doc.get(text_field)]
+    document_recorder(document_store, text_field, **recorder_options)(docs)
+    document_store.delete(removed)
+    logger.info(f"Updated document store with {len(docs)} documents")
+    return len(docs)
+
+def delete_vectors(index, ids: List[str], batch_size: int = UPSERT_BATCH_SIZE) -> int:
+    """Delete vectors by id in chunks"""
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i:i + batch_size])
+    return len(ids)
+
+def sync_documents(
+    docs: Iterable[Dict[str, Any]],
+    model,
+    index,
+    state: SyncState,
+    text_field: str = 'description',
+    vector_id: Callable[[Dict[str, Any]], str] = mongo_vector_id,
+    **ingest_options
+) -> IngestionStats:
+    """
+    Incrementally sync the index with the current set of documents.
+    
+    Only documents whose text hash differs from the recorded state are
+    embedded and upserted; vectors of documents that disappeared from the
+    source are deleted. The state is saved at the end of the run.
+    
+    Args:
+        docs: Every document currently in the source
+        model: SentenceTransformer used for new or changed texts
+        index: Pinecone or local index
+        state: Hashes recorded by the previous run
+        text_field: Document field holding the text to embed
+        vector_id: Maps a document to its vector id
+        **ingest_options: Batch size and worker options for ingest_documents
+        
+    Returns:
+        IngestionStats: Counts and throughput for the changed documents
+    """
+    docs = list(docs)
+    changed, removed = state.diff(docs, vector_id, lambda doc: doc.get(text_field) or '')
+    logger.info(f"Sync: {len(changed)} new or changed, {len(removed)} removed, {len(docs) - len(changed)} unchanged")
+    
+    stats = ingest_documents(
+        changed, model, index,
+        text_field=text_field, vector_id=vector_id,
+        on_indexed=state_recorder(state, text_field, vector_id),
+        **ingest_options
+    )
+    
+    if removed:
+        delete_vectors(index, removed)
+        state.forget(removed)
+        logger.info(f"Deleted {len(removed)} vectors for removed documents")
+    
+    state.save()
+    return stats
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Initialize logging
+logger = logging.getLogger(__name__)
+
+SYNC_STATE_DIR = os.getenv("SYNC_STATE_DIR", str(Path(__file__).resolve().parent.parent / "data" / "sync_state"))
+
+def content_hash(text: str) -> str:
+    """Stable hash of the text that gets embedded"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class SyncState:
+    """
+    Content hash per indexed vector id, persisted as JSON between ingestion runs.
+    
+    Also keeps the last Mongo change stream resume token so a watcher can pick
+    up where it stopped.
+    """
+    def __init__(self, name: str, directory: str = SYNC_STATE_DIR):
+        self.path = Path(directory) / f"{name}.json"
+        self.hashes: Dict[str, str] = {}
+        self.resume_token: Optional[Dict[str, Any]] = None
+        if self.path.exists():
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            self.hashes = data.get("hashes", {})
+            self.resume_token = data.get("resume_token")
+            logger.info(f"Loaded sync state for {len(self.hashes)} vectors from {self.path}")
+
+    def diff(
+        self,
+        docs: Iterable[Dict[str, Any]],
+        vector_id: Callable[[Dict[str, Any]], str],
+        text: Callable[[Dict[str, Any]], str]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        Compare the current documents against the recorded hashes.
+        
+        Args:
+            docs: Every document currently in the source
+            vector_id: Maps a document to its vector id
+            text: Extracts the text that gets embedded
+            
+        Returns:
+            Tuple of (new or changed documents, vector ids to delete)
+        """
+        changed = []
+        seen = set()
+        for doc in docs:
+            doc_id = vector_id(doc)
+            doc_text = text(doc)
+            if not doc_text:
+                # A document whose text was cleared loses its vector
+                continue
+            seen.add(doc_id)
+            if self.hashes.get(doc_id) != content_hash(doc_text):
+                changed.append(doc)
+        removed = [doc_id for doc_id in self.hashes if doc_id not in seen]
+        return changed, removed
+
+    def record(self, doc_id: str, text: str) -> None:
+        """Mark a vector as indexed with the given text"""
+        self.hashes[doc_id] = content_hash(text)
+
+    def is_current(self, doc_id: str, text: str) -> bool:
+        """Whether the vector is already indexed with exactly this text"""
+        return self.hashes.get(doc_id) == content_hash(text)
+
+    def forget(self, doc_ids: Iterable[str]) -> None:
+        """Drop vectors that were deleted from the index"""
+        for doc_id in doc_ids:
+            self.hashes.pop(doc_id, None)
+
+    def save(self) -> None:
+        """Write the state atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"hashes": self.hashes, "resume_token": self.resume_token}, file)
+        os.replace(tmp_path, self.path)
@@ -1,48 +1,57 @@
 import os
+import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
-def load_environment():
-    """Load environment variables from .env file"""
-    # Print current directory for debugging
-    print(f"Current directory: {os.getcwd()}")
-    
-    # Get the directory containing this script
-    current_dir = Path(__file__).parent
-    env_file = current_dir / '.ENV'
+logger = logging.getLogger(__name__)
+
+REQUIRED_VARS = [
+    'PINECONE_API_KEY',
+    'OPENAI_API_KEY',
+    'GROQ_API_KEY',
+    'MONGODB_URI'
+]
+
+_loaded = False
+
+def load_environment(validate=True, required_vars=REQUIRED_VARS):
+    """
+    Load environment variables from the .ENV file next to this script.
     
-    print(f"Looking for env file at: {env_file}")
-    print(f"File exists: {env_file.exists()}")
+    The file is read only once per process. Values already present in the
+    environment take precedence, so the file is optional when variables are
+    injected by the deployment.
     
-    if not env_file.exists():
-        raise ValueError(f"Environment file not found at {env_file}")
+    Args:
+        validate: Raise if any of `required_vars` is still unset
+        required_vars: Variables checked when validating
+    """
+    global _loaded
+    if not _loaded:
+        env_file = Path(__file__).parent / '.ENV'
+        if env_file.exists():
+            load_dotenv(env_file)
+            logger.debug(f"Loaded environment from {env_file}")
+        else:
+            logger.debug(f"No environment file at {env_file}, using process environment")
         
-    # Load the environment variables
-    load_dotenv(env_file)
+        # Handle MongoDB URI variations
+        if not os.getenv('MONGODB_URI') and os.getenv('MONGO_DB_URI'):
+            os.environ['MONGODB_URI'] = os.getenv('MONGO_DB_URI')
+        _loaded = True
     
-    # Handle MongoDB URI variations
-    if not os.getenv('MONGODB_URI') and os.getenv('MONGO_DB_URI'):
-        os.environ['MONGODB_URI'] = os.getenv('MONGO_DB_URI')
+    if not validate:
+        return
     
     # Verify loaded variables
-    required_vars = [
-        'PINECONE_API_KEY',
-        'OPENAI_API_KEY',
-        'GROQ_API_KEY',
-        'MONGODB_URI'
-    ]
-    
-    print("\nChecking environment variables:")
     for var in required_vars:
         value = os.getenv(var)
-        if value:
-            print(f"{var}: {'*' * 5}{value[-5:] if value else 'Not Set'}")
-        else:
-            print(f"{var}: Not Set")
+        logger.debug(f"{var}: {'*' * 5 + value[-5:] if value else 'Not Set'}")
     
     missing_vars = [var for var in required_vars if not os.getenv(var)]
     if missing_vars:
         raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
     load_environment()
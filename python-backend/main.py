@@ -1,42 +1,60 @@
 from fastapi import FastAPI, HTTPException, Request, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from groq import Groq
 from typing import Optional, Dict, Any, List
-import os
 import logging
 import json
+import time
 from datetime import datetime
-from openai import OpenAI
-from database.pinecone_client import index
+from database.pinecone_client import get_index
 from load_env import load_environment
+from app.core.cache import embedding_cache
+from app.core.clients import close_clients, get_groq_client, get_openai_client, warm_connections
+from app.core.concurrency import dependency_slot, fan_out, shutdown_executor
+from app.core.config import settings
+from app.core.exceptions import DependencyUnavailable
+from app.api.metrics import router as metrics_router
+from app.core.logger import configure_logging, redact_headers
+from app.core.metrics import errors
+from app.core.middleware import DeadlineMiddleware, ServerTimingMiddleware
+from app.core.resilience import guarded
+from app.core.tracing import span
+from app.core.resources import warm_up
+from app.database.mongo import mongodb
+from app.database.vector_store import VectorMatch, get_document_store, vector_store
+from app.services.conversation_service import conversation_service
+from app.services.conversation_writer import conversation_writer
+from app.services.llm_gateway import llm_gateway
+from app.services.keyword_search import get_keyword_index, keyword_search, reciprocal_rank_fusion
+from app.services.prompt_builder import Passage, PromptBuilder
+from app.services.response_cache import response_cache
+from app.utils.streaming import SSE_HEADERS, single_chunk, sse_token_stream
 
-# Load environment variables
-load_environment()
+# Load environment variables (validated at startup)
+load_environment(validate=False)
 
-# Initialize logging with more detailed format
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Initialize queue-based structured logging (see app/core/logger.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 class Config:
     """Application configuration."""
     ALLOWED_ORIGINS = ["chrome-extension://*", "http://localhost:3000"]
-    MODEL_NAME = "mixtral-8x7b-32768"  # Updated to latest GROQ model
+    EMBEDDING_MODEL = "text-embedding-3-small"
     DEFAULT_TOP_K = 3
 
 class ChatMessage(BaseModel):
     """Schema for chat messages."""
     message: str = Field(..., description="The user's message")
     context: Optional[Dict[str, Any]] = Field(None, description="Additional context for the chat")
+    user_id: Optional[str] = Field(None, description="Identifies the user for personalized context and history")
 
 class ChatResponse(BaseModel):
     """Schema for chat responses."""
     response: str = Field(..., description="The AI's response")
     status: str = Field("success", description="Response status")
+    cached: bool = Field(False, description="Whether the response was served from the response cache")
 
 class ErrorResponse(BaseModel):
     """Schema for error responses."""
@@ -53,17 +71,15 @@ app = FastAPI(
 # Configure CORS and security headers middleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from starlette.requests import Request
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        response.headers["Content-Security-Policy"] = "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline'; connect-src 'self' http://localhost:8000"
-        return response
+from app.core.middleware import add_middleware_stack
 
-app.add_middleware(SecurityHeadersMiddleware)
+# Security headers, request logging and per-IP rate limiting
+add_middleware_stack(
+    app,
+    security_headers={
+        "Content-Security-Policy": "default-src 'self'; script-src 'self' 'unsafe-inline' 'unsafe-eval'; style-src 'self' 'unsafe-inline'; connect-src 'self' http://localhost:8000"
+    }
+)
 
 # Configure CORS with specific extension ID
 app.add_middleware(
@@ -79,47 +95,121 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-# Initialize clients
-try:
-    openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    if not groq_api_key:
-        raise ValueError("GROQ_API_KEY environment variable not set")
-    groq_client = Groq(api_key=groq_api_key)
-    logger.info("Successfully initialized API clients")
-except Exception as e:
-    logger.error(f"Client initialization error: {e}")
-    raise RuntimeError(f"Failed to initialize API clients: {str(e)}")
-
-async def get_relevant_context(query: str, k: int = Config.DEFAULT_TOP_K) -> str:
+# Prometheus metrics for each request stage
+app.include_router(metrics_router)
+
+# Per-request stage breakdown (embed, vector, format, llm) in a Server-Timing header
+app.add_middleware(ServerTimingMiddleware, paths=["/chat", "/chat/stream"], debug=settings.SERVER_TIMING_DEBUG)
+
+# Per-request deadline, optionally shortened by the client's X-Request-Deadline-Ms header
+app.add_middleware(DeadlineMiddleware, default_ms=settings.REQUEST_DEADLINE_MS)
+
+async def embed_query(query: str) -> List[float]:
+    """
+    Get the OpenAI embedding for a query, served from the shared embedding cache when possible.
+    
+    Cache misses go through the OpenAI circuit breaker within the embed stage's budget.
+    
+    Args:
+        query: The user's query string
+        
+    Returns:
+        List[float]: The query embedding
+    """
+    async def _embed(text: str) -> List[float]:
+        async def call():
+            async with dependency_slot("openai"):
+                return await get_openai_client().embeddings.create(
+                    model=Config.EMBEDDING_MODEL,
+                    input=text
+                )
+        response = await guarded("openai", "embed", call)
+        return response.data[0].embedding
+    
+    return await embedding_cache.get_or_embed(query, Config.EMBEDDING_MODEL, _embed)
+
+async def cache_embedding(query: str) -> Optional[List[float]]:
+    """Embed a query for the response cache; None when the cache is off or embeddings are unavailable."""
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    try:
+        return await embed_query(query)
+    except DependencyUnavailable as e:
+        logger.warning(f"Skipping the response cache: {e.message}")
+        return None
+
+async def query_namespace(query_embedding: List[float], k: int, namespace: str) -> List[VectorMatch]:
+    """
+    Query one namespace of the vector index through the Pinecone circuit breaker.
+    
+    A query gets at most NAMESPACE_QUERY_TIMEOUT_MS.
+    
+    Returns:
+        List[VectorMatch]: Matches ordered by descending score
+    """
+    return await guarded(
+        "pinecone",
+        "vector",
+        lambda: vector_store.query(query_embedding, top_k=k, namespace=namespace),
+        timeout=settings.NAMESPACE_QUERY_TIMEOUT_MS / 1000
+    )
+
+async def get_relevant_context(query: str, k: int = Config.DEFAULT_TOP_K) -> List[Passage]:
     """
     Get relevant context from Pinecone based on the query.
     
+    With the keyword index enabled, a strong lexical match (an exact product
+    name or SKU) is answered from it without an embedding or vector query;
+    otherwise its candidates are fused with the vector matches.
+    
+    Every namespace in CONTEXT_NAMESPACES is queried concurrently; a namespace
+    that does not answer within NAMESPACE_QUERY_TIMEOUT_MS is left out. When
+    OpenAI or Pinecone is unavailable the chat is answered without retrieval.
+    
     Args:
         query: The user's query string
         k: Number of similar contexts to retrieve
         
     Returns:
-        str: Combined relevant contexts
+        List[Passage]: Retrieved passages with their relevance scores
     """
     try:
-        response = openai_client.embeddings.create(
-            model=Config.MODEL_NAME,
-            input=query
-        )
-        query_embedding = response.data[0].embedding
+        keyword_matches = []
+        if settings.KEYWORD_INDEX_ENABLED:
+            keyword_matches, strong = keyword_search(query, max(k, settings.KEYWORD_CANDIDATES), endpoint="chat")
+            if strong:
+                return _passages(keyword_matches[:k])
         
-        search_response = index.query(
-            vector=query_embedding,
-            top_k=k,
-            include_metadata=True
-        )
+        query_embedding = await embed_query(query)
+        
+        namespaces = {f"vector:{namespace or 'default'}": namespace for namespace in settings.context_namespaces()}
+        with span("vector"):
+            results = await fan_out(
+                {name: query_namespace(query_embedding, k, namespace) for name, namespace in namespaces.items()},
+                timeouts={},  # query_namespace enforces NAMESPACE_QUERY_TIMEOUT_MS itself
+                defaults={name: [] for name in namespaces}
+            )
         
-        contexts = [match.metadata.get('text', '') for match in search_response.matches]
-        return "\n".join(contexts)
+        # Keep the best k matches across namespaces
+        matches = sorted(
+            (match for namespace_matches in results.values() for match in namespace_matches),
+            key=lambda match: match.score,
+            reverse=True
+        )[:k]
+        if keyword_matches:
+            matches = reciprocal_rank_fusion([matches, keyword_matches], k)
+        return _passages(matches)
+    except DependencyUnavailable as e:
+        logger.warning(f"Answering without retrieved context: {e.message}")
+        return []
     except Exception as e:
+        errors.labels(stage="context").inc()
         logger.error(f"Error getting relevant context: {e}")
-        return ""
+        return []
+
+def _passages(matches: List[Any]) -> List[Passage]:
+    """Turn index matches into prompt passages."""
+    return [Passage(match.metadata.get('text', ''), match.score) for match in matches]
 
 def format_context(context: Optional[Dict[str, Any]]) -> str:
     """
@@ -147,6 +237,98 @@ def format_context(context: Optional[Dict[str, Any]]) -> str:
     
     return "\n".join(formatted)
 
+def format_user_context(user_context: Optional[Dict[str, Any]]) -> str:
+    """
+    Format a stored user context document into a string for the AI model.
+    
+    Args:
+        user_context: Document from the user_context collection
+        
+    Returns:
+        str: One "key: value" line per field
+    """
+    if not user_context:
+        return ""
+    
+    return "\n".join(
+        f"{key}: {value}" for key, value in user_context.items() if key not in ("_id", "user_id")
+    )
+
+async def build_chat_messages(request: ChatMessage) -> List[Dict[str, str]]:
+    """
+    Assemble the system and user messages for a chat request.
+    
+    Vector retrieval and, when personalization is enabled, the user-context
+    and recent-history lookups run concurrently, each under its own timeout.
+    A branch that overruns is left out of the prompt instead of delaying it.
+    
+    Args:
+        request: The incoming chat message with optional page context
+        
+    Returns:
+        List[Dict[str, str]]: Messages ready to send to the LLM
+    """
+    branches = {"retrieval": get_relevant_context(request.message)}
+    if settings.CHAT_PERSONALIZATION_ENABLED and request.user_id:
+        # The MongoDB lookups enforce their timeouts themselves, so they count against its circuit breaker
+        branches["user_context"] = conversation_service.get_user_context(
+            request.user_id, timeout=settings.USER_CONTEXT_TIMEOUT_MS / 1000
+        )
+        branches["history"] = conversation_service.get_recent_conversations(
+            settings.CHAT_HISTORY_TURNS, request.user_id, timeout=settings.HISTORY_TIMEOUT_MS / 1000
+        )
+    
+    results = await fan_out(
+        branches,
+        timeouts={"retrieval": settings.RETRIEVAL_TIMEOUT_MS / 1000},
+        defaults={"retrieval": [], "history": []}
+    )
+    
+    with span("format"):
+        return _assemble_messages(
+            request,
+            results["retrieval"],
+            results.get("user_context"),
+            results.get("history") or []
+        )
+
+# Prepare system message with e-commerce focus
+SYSTEM_PROMPT = """You are a helpful AI shopping assistant. Your role is to:
+    1. Help users find products they're looking for
+    2. Compare prices and features
+    3. Make product recommendations
+    4. Answer questions about products
+    5. Provide shopping advice
+    
+    Always be concise, accurate, and helpful. If you're unsure about something, say so."""
+
+# Keeps retrieved, page and user context within PROMPT_CONTEXT_TOKEN_BUDGET
+prompt_builder = PromptBuilder(SYSTEM_PROMPT)
+
+# Sampling parameters for every provider behind the LLM gateway
+LLM_PARAMS = {"temperature": 0.7, "max_tokens": 1024, "top_p": 0.9}
+
+def cache_user(request: ChatMessage) -> Optional[str]:
+    """User whose response-cache partition a request uses: set when its prompt is personalized, else shared."""
+    return request.user_id if settings.CHAT_PERSONALIZATION_ENABLED else None
+
+def _assemble_messages(
+    request: ChatMessage,
+    passages: List[Passage],
+    user_context: Optional[Dict[str, Any]] = None,
+    history: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, str]]:
+    """Combine retrieved, page and user context into the system prompt, followed by recent turns."""
+    messages, stats = prompt_builder.build(
+        request.message,
+        passages,
+        page_context=format_context(request.context),
+        user_context=format_user_context(user_context),
+        history=history or []
+    )
+    logger.info("Assembled prompt", extra={**stats._asdict(), "sample_key": "/chat"})
+    return messages
+
 @app.post(
     "/chat",
     response_model=ChatResponse,
@@ -157,64 +339,141 @@ def format_context(context: Optional[Dict[str, Any]]) -> str:
     }
 )
 async def chat_endpoint(request: ChatMessage, request_obj: Request):
-    # Log request details
-    logger.info(f"Received request from: {request_obj.headers.get('origin', 'Unknown origin')}")
-    logger.info(f"Request headers: {dict(request_obj.headers)}")
+    # Log request details; verbose lines are sampled per route (LOG_SAMPLE_RATES)
+    origin = request_obj.headers.get('origin', 'Unknown origin')
+    logger.info("Received chat request", extra={"origin": origin, "sample_key": "/chat"})
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers", extra={"headers": redact_headers(request_obj.headers), "sample_key": "/chat"})
     
     try:
-        # Get relevant context from Pinecone
-        relevant_context = await get_relevant_context(request.message)
+        # Serve semantically equivalent questions about the same page from the cache
+        query_embedding = await cache_embedding(request.message)
+        if query_embedding is not None:
+            cached = response_cache.lookup(query_embedding, request.context, cache_user(request))
+            if cached:
+                logger.info("Response cache hit (similarity %.3f)", cached.similarity, extra={"sample_key": "/chat"})
+                return ChatResponse(response=cached.response, cached=True)
         
-        # Format the context information from the request
-        request_context = format_context(request.context) if request.context else ""
+        messages = await build_chat_messages(request)
         
-        # Combine both contexts
-        full_context = f"{relevant_context}\n{request_context}".strip()
+        # Generate the response with the fastest healthy provider (Groq or OpenAI)
+        with span("llm"):
+            response_content = await llm_gateway.complete(messages, **LLM_PARAMS)
         
-        # Prepare system message with e-commerce focus
-        system_message = """You are a helpful AI shopping assistant. Your role is to:
-        1. Help users find products they're looking for
-        2. Compare prices and features
-        3. Make product recommendations
-        4. Answer questions about products
-        5. Provide shopping advice
+        if query_embedding is not None and response_content:
+            response_cache.store(query_embedding, request.context, response_content, cache_user(request))
         
-        Always be concise, accurate, and helpful. If you're unsure about something, say so."""
-        
-        if full_context:
-            system_message += f"\n\nRelevant Context:\n{full_context}"
-        
-        # Generate response from Groq
-        response = groq_client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": request.message}
-            ],
-            temperature=0.7,
-            max_tokens=1024,
-            top_p=0.9,
-            stream=False
-        )
-
-        # Extract response content
-        response_content = response.choices[0].message.content
+        if settings.CONVERSATION_PERSISTENCE_ENABLED:
+            conversation_service.queue_conversation(request.message, response_content, request.context, request.user_id)
         
         # Log the successful interaction
-        logger.info(f"Successfully processed chat request from {request_obj.headers.get('origin', 'Unknown origin')}")
-        logger.info(f"Chat interaction - User: {request.message[:100]}... Response: {response_content[:100]}...")
+        logger.info(
+            "Chat interaction",
+            extra={"origin": origin, "user_message": request.message[:100], "response": response_content[:100], "sample_key": "/chat"}
+        )
         
         return ChatResponse(response=response_content)
 
+    except DependencyUnavailable as e:
+        # Every LLM provider is failing fast or out of time: answer now instead of hanging
+        errors.labels(stage="chat").inc()
+        logger.warning("Chat request from %s failed fast: %s", origin, e.message)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
+        errors.labels(stage="chat").inc()
         error_msg = f"Error processing chat request: {str(e)}"
-        logger.error(f"Error for request from {request_obj.headers.get('origin', 'Unknown origin')}: {error_msg}")
-        logger.exception(e)
+        logger.exception("Error for chat request from %s: %s", origin, error_msg)
         raise HTTPException(
             status_code=500,
             detail=error_msg
         )
 
+@app.post(
+    "/chat/stream",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {"content": {"text/event-stream": {}}},
+        status.HTTP_500_INTERNAL_SERVER_ERROR: {"model": ErrorResponse}
+    }
+)
+async def chat_stream_endpoint(request: ChatMessage, request_obj: Request):
+    """
+    Stream the chat response as Server-Sent Events.
+    
+    Each generated token is sent as a `data: {"token": ...}` frame as soon as
+    the LLM emits it, followed by a final `done` event carrying time-to-first-token.
+    Errors raised once streaming has started are sent as an `error` event.
+    """
+    started_at = time.perf_counter()
+    origin = request_obj.headers.get('origin', 'Unknown origin')
+    logger.info("Received streaming chat request", extra={"origin": origin, "sample_key": "/chat/stream"})
+    
+    try:
+        query_embedding = await cache_embedding(request.message)
+        if query_embedding is not None:
+            cached = response_cache.lookup(query_embedding, request.context, cache_user(request))
+            if cached:
+                logger.info("Response cache hit (similarity %.3f)", cached.similarity, extra={"sample_key": "/chat/stream"})
+                return StreamingResponse(
+                    sse_token_stream(single_chunk(cached.response), started_at),
+                    media_type="text/event-stream",
+                    headers=SSE_HEADERS
+                )
+        
+        messages = await build_chat_messages(request)
+    except DependencyUnavailable as e:
+        errors.labels(stage="chat").inc()
+        logger.warning("Streaming request from %s failed fast: %s", origin, e.message)
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        errors.labels(stage="chat").inc()
+        error_msg = f"Error processing chat request: {str(e)}"
+        logger.exception("Error for streaming request from %s: %s", origin, error_msg)
+        raise HTTPException(
+            status_code=500,
+            detail=error_msg
+        )
+    
+    def on_complete(text: str) -> None:
+        if query_embedding is not None:
+            response_cache.store(query_embedding, request.context, text, cache_user(request))
+        if settings.CONVERSATION_PERSISTENCE_ENABLED:
+            conversation_service.queue_conversation(request.message, text, request.context, request.user_id)
+    
+    return StreamingResponse(
+        sse_token_stream(llm_gateway.stream(messages, **LLM_PARAMS), started_at, on_complete),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+@app.on_event("startup")
+async def startup_event():
+    """Validate configuration, connect MongoDB if used, pre-load upstream clients and open warm connections."""
+    load_environment()
+    if settings.CONVERSATION_PERSISTENCE_ENABLED or settings.CHAT_PERSONALIZATION_ENABLED:
+        await mongodb.connect_to_database()
+    if settings.CONVERSATION_PERSISTENCE_ENABLED:
+        conversation_writer.start()
+    if settings.WARMUP_ON_STARTUP:
+        await warm_up({
+            "pinecone index": get_index,
+            "openai client": get_openai_client,
+            "groq client": get_groq_client,
+            **({"keyword index": get_keyword_index} if settings.KEYWORD_INDEX_ENABLED else {}),
+            **({"document store": get_document_store} if settings.DOCUMENT_STORE_ENABLED else {}),
+        })
+        await warm_connections()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush queued conversations and release MongoDB, upstream connections and the executor used for blocking SDK calls."""
+    if settings.CONVERSATION_PERSISTENCE_ENABLED:
+        await conversation_writer.stop()
+    if settings.CONVERSATION_PERSISTENCE_ENABLED or settings.CHAT_PERSONALIZATION_ENABLED:
+        await mongodb.close_database_connection()
+    await close_clients()
+    shutdown_executor()
+
 @app.get("/health")
 async def health_check() -> Dict[str, str]:
     """Health check endpoint to verify API status."""
@@ -0,0 +1,75 @@
+import asyncio
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+# Add the parent directory to the Python path
+parent_dir = str(Path(__file__).resolve().parent.parent)
+sys.path.append(parent_dir)
+
+from app.core.rate_limiter import InMemoryRateLimitBackend, RedisRateLimitBackend, SlidingWindowRateLimiter
+
+class InProcessRedis:
+    """The subset of the redis.asyncio client used by RedisRateLimitBackend, backed by a dict"""
+    def __init__(self):
+        self.values: Dict[str, int] = {}
+        self.expiries: Dict[str, int] = {}
+
+    def pipeline(self, transaction: bool = True) -> "_Pipeline":
+        return _Pipeline(self)
+
+    async def incr(self, key: str) -> int:
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def decr(self, key: str) -> int:
+        self.values[key] = self.values.get(key, 0) - 1
+        return self.values[key]
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        self.expiries[key] = seconds
+        return True
+
+    async def get(self, key: str):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+class _Pipeline:
+    def __init__(self, client: InProcessRedis):
+        self.client = client
+        self.commands: List = []
+
+    def __getattr__(self, name: str):
+        def queue(*args):
+            self.commands.append((name, args))
+            return self
+        return queue
+
+    async def execute(self) -> List:
+        return [await getattr(self.client, name)(*args) for name, args in self.commands]
+
+async def allowed_in_window(limiter: SlidingWindowRateLimiter, requests: int, now: float) -> int:
+    results = [await limiter.check("203.0.113.7", now=now) for _ in range(requests)]
+    return sum(result.allowed for result in results)
+
+def test_rejected_requests_do_not_count():
+    limiter = SlidingWindowRateLimiter(limit=5, window=60, backend=InMemoryRateLimitBackend())
+    # A client retrying far above the limit for a whole window...
+    assert asyncio.run(allowed_in_window(limiter, 50, now=60.0)) == 5
+    # ...is let back in once the allowed requests have slid out of the window
+    assert asyncio.run(allowed_in_window(limiter, 50, now=180.0)) == 5
+
+def test_redis_backend_limits_and_uncounts_rejections():
+    redis = InProcessRedis()
+    limiter = SlidingWindowRateLimiter(limit=3, window=60, backend=RedisRateLimitBackend(redis, prefix="test"))
+
+    assert asyncio.run(allowed_in_window(limiter, 10, now=120.0)) == 3
+    assert redis.values["test:203.0.113.7:2"] == 3
+    assert redis.expiries["test:203.0.113.7:2"] == 120
+    # Half of the previous window still overlaps: 3 * 0.5 + 1 request fits a limit of 3
+    assert asyncio.run(allowed_in_window(limiter, 10, now=210.0)) == 1
+
+def test_redis_backend_from_url():
+    backend = RedisRateLimitBackend.from_url("redis://localhost:6379/0", prefix="botify")
+    assert backend.prefix == "botify"
+    assert hasattr(backend.client, "pipeline")
@@ -0,0 +1,42 @@
+import os
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+parent_dir = str(Path(__file__).resolve().parent.parent)
+sys.path.append(parent_dir)
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("GROQ_API_KEY", "test")
+
+import main
+from app.core.config import settings
+from app.services.response_cache import SemanticResponseCache
+
+PAGE = {"title": "Wireless Headphones", "url": "https://shop.example.com/headphones"}
+EMBEDDING = [0.1, 0.2, 0.3]
+
+def make_cache() -> SemanticResponseCache:
+    return SemanticResponseCache(threshold=0.95, maxsize=100, ttl=60, max_per_context=10)
+
+def test_personalized_answers_are_not_shared_between_users(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_PERSONALIZATION_ENABLED", True)
+    cache = make_cache()
+    alice = main.ChatMessage(message="Which headphones suit me?", context=PAGE, user_id="alice")
+    bob = main.ChatMessage(message="Which headphones suit me?", context=PAGE, user_id="bob")
+
+    cache.store(EMBEDDING, alice.context, "Alice prefers Acme, budget mid-range", main.cache_user(alice))
+
+    assert cache.lookup(EMBEDDING, bob.context, main.cache_user(bob)) is None
+    assert cache.lookup(EMBEDDING, PAGE) is None
+    assert cache.lookup(EMBEDDING, alice.context, main.cache_user(alice)).response == "Alice prefers Acme, budget mid-range"
+
+def test_unpersonalized_answers_are_shared(monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_PERSONALIZATION_ENABLED", False)
+    cache = make_cache()
+    alice = main.ChatMessage(message="Which headphones are best?", context=PAGE, user_id="alice")
+    bob = main.ChatMessage(message="Which headphones are best?", context=PAGE, user_id="bob")
+
+    cache.store(EMBEDDING, alice.context, "The Acme X1", main.cache_user(alice))
+
+    assert cache.lookup(EMBEDDING, bob.context, main.cache_user(bob)).response == "The Acme X1"
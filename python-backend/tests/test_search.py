@@ -7,7 +7,7 @@ parent_dir = str(Path(__file__).resolve().parent.parent)
 sys.path.append(parent_dir)
 
 from sentence_transformers import SentenceTransformer
-from database.pinecone_client import index
+from database.pinecone_client import get_index
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
@@ -32,7 +32,7 @@ def semantic_search(query, top_k=3):
         query_embedding = model.encode(query).tolist()
         
         # Search in Pinecone
-        results = index.query(
+        results = get_index().query(
             vector=query_embedding,
             top_k=top_k,
             include_metadata=True